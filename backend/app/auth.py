@@ -1,14 +1,28 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from typing import Optional
 from datetime import datetime, timedelta
 
 from jose import jwt
 from passlib.context import CryptContext
+from passlib.hash import pbkdf2_sha256
 
 from .config import settings
 
 pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
 
 
+class PasswordHashingBusy(RuntimeError):
+    """Raised when the hashing pool already has its maximum of pending jobs."""
+
+
+_hash_executor: Optional[ProcessPoolExecutor] = None
+_hash_executor_lock = threading.Lock()
+_hash_slots = threading.BoundedSemaphore(max(1, settings.PASSWORD_HASH_MAX_PENDING))
+
+
 def create_access_token(data: dict, expires_minutes: Optional[int] = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(
@@ -24,3 +38,50 @@ def verify_password(plain, hashed):
 
 def hash_password(pw: str) -> str:
     return pwd_context.hash(pw)
+
+
+def _get_hash_executor() -> ProcessPoolExecutor:
+    global _hash_executor
+    if _hash_executor is None:
+        with _hash_executor_lock:
+            if _hash_executor is None:
+                # "spawn" keeps workers free of the parent's threads and open
+                # database connections; they only need passlib.
+                _hash_executor = ProcessPoolExecutor(
+                    max_workers=settings.PASSWORD_HASH_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _hash_executor
+
+
+def shutdown_hash_executor() -> None:
+    global _hash_executor
+    with _hash_executor_lock:
+        if _hash_executor is not None:
+            _hash_executor.shutdown(wait=False, cancel_futures=True)
+            _hash_executor = None
+
+
+async def _run_hashing(fn, *args):
+    if not _hash_slots.acquire(blocking=False):
+        raise PasswordHashingBusy("Too many concurrent password operations")
+    try:
+        loop = asyncio.get_running_loop()
+        executor = _get_hash_executor() if settings.PASSWORD_HASH_WORKERS > 0 else None
+        return await loop.run_in_executor(executor, fn, *args)
+    finally:
+        _hash_slots.release()
+
+
+async def hash_password_offloaded(pw: str) -> str:
+    """Hash ``pw`` in the dedicated process pool.
+
+    At most ``PASSWORD_HASH_MAX_PENDING`` calls may be in flight per worker;
+    beyond that :class:`PasswordHashingBusy` is raised immediately so a login
+    storm cannot queue up behind CPU-bound hashing.
+    """
+    return await _run_hashing(pbkdf2_sha256.hash, pw)
+
+
+async def verify_password_offloaded(plain: str, hashed: str) -> bool:
+    return await _run_hashing(pbkdf2_sha256.verify, plain, hashed)
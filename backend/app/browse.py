@@ -0,0 +1,213 @@
+"""Filtered, sorted and faceted storefront listing behind ``GET /products/browse``.
+
+``BrowseIndex`` is built once per catalog snapshot. Every filter value
+(category, dry/fresh, in stock) is held as a bitset over the active products,
+so applying filters and counting facets is a handful of integer ANDs and
+``bit_count()`` calls rather than a GROUP BY per page view. Products are
+numbered in ascending price order, which makes a price range a contiguous run
+of bits and lets the price sorts walk the filtered bitset directly.
+
+Pagination is keyset based. The cursor carries the sort key and id of the
+last product on the page, so a page stays correct across snapshot rebuilds
+where an offset would skip or repeat products.
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+from uuid import UUID
+
+from .schemas import CategoryOut, ProductOut
+
+SORTS = ("name_asc", "name_desc", "price_asc", "price_desc")
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class BrowseFilters:
+    categories: Tuple[str, ...] = ()
+    is_dry: Optional[bool] = None
+    in_stock: bool = False
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+
+
+def _bitset(docs: Iterable[int], size: int) -> int:
+    # Set bits in a bytearray first: OR-ing into a big int copies it every time
+    bits = bytearray(size // 8 + 1)
+    for doc in docs:
+        bits[doc >> 3] |= 1 << (doc & 7)
+    return int.from_bytes(bits, "little")
+
+
+def encode_cursor(sort: str, key: tuple) -> str:
+    raw = json.dumps([sort, *key], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, value, product_id = json.loads(raw)
+    except (binascii.Error, ValueError, TypeError):
+        raise InvalidCursor("Invalid cursor") from None
+    if cursor_sort != sort:
+        raise InvalidCursor("Cursor belongs to a different sort order")
+    if sort.startswith("price") and not isinstance(value, (int, float)):
+        raise InvalidCursor("Invalid cursor")
+    if sort.startswith("name") and not isinstance(value, str):
+        raise InvalidCursor("Invalid cursor")
+    return value, str(product_id)
+
+
+class BrowseIndex:
+    """Bitset index over the active catalog, rebuilt with each snapshot."""
+
+    def __init__(self, products: Sequence[ProductOut]):
+        # str(UUID) is slow enough to dominate the build, so format each id once
+        price_keys = sorted((product.price_per_kg, str(product.id), product) for product in products)
+        self.products = tuple(product for _, _, product in price_keys)
+        size = len(self.products)
+        self._size = size
+        self._all = (1 << size) - 1
+        self._prices = [price for price, _, _ in price_keys]
+        self._price_keys = [(price, product_id) for price, product_id, _ in price_keys]
+        name_keys = sorted(
+            (product.name.lower(), product_id, doc) for doc, (_, product_id, product) in enumerate(price_keys)
+        )
+        self._name_order = [doc for _, _, doc in name_keys]
+        self._name_keys = [(name, product_id) for name, product_id, _ in name_keys]
+
+        by_category: Dict[str, List[int]] = {}
+        categories: Dict[str, CategoryOut] = {}
+        for doc, product in enumerate(self.products):
+            by_category.setdefault(product.category.slug, []).append(doc)
+            categories[product.category.slug] = product.category
+        self._categories = sorted(categories.values(), key=lambda category: category.name.lower())
+        self._category_bits = {slug: _bitset(docs, size) for slug, docs in by_category.items()}
+        self._dry_bits = _bitset((doc for doc, product in enumerate(self.products) if product.is_dry), size)
+        # The available stock map it was last built from, and the bitset
+        self._in_stock: Optional[Tuple[Mapping[UUID, float], int]] = None
+
+    def __len__(self) -> int:
+        return self._size
+
+    def in_stock_bits(self, available: Mapping[UUID, float]) -> int:
+        """Products with stock free for carts. Stock levels change far more
+        often than the snapshot, so the bitset is rebuilt per ``available``
+        map rather than with the index."""
+        cached = self._in_stock
+        if cached is not None and cached[0] is available:
+            return cached[1]
+        bits = _bitset(
+            (doc for doc, product in enumerate(self.products) if available.get(product.id, 0.0) > 0), self._size
+        )
+        self._in_stock = (available, bits)
+        return bits
+
+    def _price_bits(self, min_price: Optional[float], max_price: Optional[float]) -> int:
+        low = 0 if min_price is None else bisect_left(self._prices, min_price)
+        high = self._size if max_price is None else bisect_right(self._prices, max_price)
+        if high <= low:
+            return 0
+        return ((1 << high) - 1) ^ ((1 << low) - 1)
+
+    def _sort_key(self, doc: int, sort: str) -> tuple:
+        price, product_id = self._price_keys[doc]
+        if sort.startswith("price"):
+            return price, product_id
+        return self.products[doc].name.lower(), product_id
+
+    def _page_docs(self, mask: int, sort: str, after: Optional[tuple], count: int) -> List[int]:
+        docs: List[int] = []
+        if sort == "price_asc":
+            start = bisect_right(self._price_keys, after) if after else 0
+            remaining = mask >> start << start
+            while remaining and len(docs) < count:
+                lowest = remaining & -remaining
+                docs.append(lowest.bit_length() - 1)
+                remaining ^= lowest
+        elif sort == "price_desc":
+            end = bisect_left(self._price_keys, after) if after else self._size
+            remaining = mask & ((1 << end) - 1)
+            while remaining and len(docs) < count:
+                highest = remaining.bit_length() - 1
+                docs.append(highest)
+                remaining ^= 1 << highest
+        else:
+            # Test bits on a byte copy; shifting the big int per probe costs O(n)
+            bits = mask.to_bytes(self._size // 8 + 1, "little")
+            if sort == "name_asc":
+                start = bisect_right(self._name_keys, after) if after else 0
+                positions: Iterable[int] = range(start, self._size)
+            else:
+                end = bisect_left(self._name_keys, after) if after else self._size
+                positions = range(end - 1, -1, -1)
+            for position in positions:
+                doc = self._name_order[position]
+                if bits[doc >> 3] >> (doc & 7) & 1:
+                    docs.append(doc)
+                    if len(docs) == count:
+                        break
+        return docs
+
+    def browse(
+        self,
+        filters: BrowseFilters,
+        sort: str = "name_asc",
+        limit: int = 24,
+        cursor: Optional[str] = None,
+        available: Optional[Mapping[UUID, float]] = None,
+    ) -> dict:
+        if sort not in SORTS:
+            raise ValueError(f"Unknown sort {sort!r}")
+        if filters.in_stock and available is None:
+            raise ValueError("The in stock filter needs the available stock levels")
+        after = decode_cursor(cursor, sort) if cursor else None
+
+        base = self._all & self._price_bits(filters.min_price, filters.max_price)
+        if filters.in_stock:
+            base &= self.in_stock_bits(available)
+        category_mask = self._all
+        if filters.categories:
+            category_mask = 0
+            for slug in filters.categories:
+                category_mask |= self._category_bits.get(slug, 0)
+        if filters.is_dry is None:
+            dry_mask = self._all
+        else:
+            dry_mask = self._dry_bits if filters.is_dry else self._all & ~self._dry_bits
+        mask = base & category_mask & dry_mask
+
+        docs = self._page_docs(mask, sort, after, limit + 1)
+        next_cursor = encode_cursor(sort, self._sort_key(docs[limit - 1], sort)) if len(docs) > limit else None
+
+        # Each facet is counted without its own filter, so the counts show
+        # what picking another value would return
+        by_dry = base & category_mask
+        by_category = base & dry_mask
+        return {
+            "items": [self.products[doc] for doc in docs[:limit]],
+            "total": mask.bit_count(),
+            "next_cursor": next_cursor,
+            "facets": {
+                "categories": [
+                    {
+                        "slug": category.slug,
+                        "name": category.name,
+                        "count": (by_category & self._category_bits[category.slug]).bit_count(),
+                    }
+                    for category in self._categories
+                ],
+                "fresh": (by_dry & ~self._dry_bits).bit_count(),
+                "dry": (by_dry & self._dry_bits).bit_count(),
+            },
+        }
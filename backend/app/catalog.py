@@ -0,0 +1,290 @@
+"""In-process snapshot of the storefront catalog.
+
+``GET /products/``, ``GET /products/{slug}``, ``GET /categories/``,
+``GET /products/cut-clean-options`` and ``GET /site/next-delivery`` are
+answered from an immutable snapshot, so a page view costs no database I/O.
+Each response (including the per-category slices behind
+``GET /products/?category=<slug>``) is kept as a ``PreparedBody``: JSON bytes
+plus a gzip copy, serialised once per rebuild and written out verbatim, with a
+strong ETag hashed from the bytes that is identical across workers holding
+the same data. Writes that change what the storefront
+shows call ``catalog_cache.invalidate()`` after committing, which bumps the
+version; the next read rebuilds the snapshot once (concurrent readers wait
+for that single rebuild rather than each querying).
+
+Stock that is free for carts changes with every cart, checkout and
+cancellation, so it is kept out of the snapshot (whose ``stock_kg`` is as of
+the last rebuild). ``GET /products/availability`` serves it from a separate
+``StockLevels`` map built by one narrow query. Stock writes call
+``catalog_cache.stock_changed()``, which drops only that map; ``invalidate()``
+drops both.
+
+The versions live in this process only. Other workers pick up a change when
+their copy reaches ``CATALOG_CACHE_TTL_SECONDS``, which bounds how stale a
+catalog page or stock level can be after a write elsewhere.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+import weakref
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+from uuid import UUID
+
+from pydantic import TypeAdapter
+from sqlalchemy import select
+
+from . import database, queries
+from .browse import BrowseIndex
+from .config import settings
+from .http_cache import PreparedBody
+from .models import Category, CutCleanOption, Product
+from .schemas import CategoryOut, CutCleanOptionOut, NextDeliveryResponse, ProductOut
+from .search import SearchIndex
+from .site_settings import get_next_delivery
+
+T = TypeVar("T")
+
+_products_adapter = TypeAdapter(List[ProductOut])
+_categories_adapter = TypeAdapter(List[CategoryOut])
+_options_adapter = TypeAdapter(List[CutCleanOptionOut])
+_availability_adapter = TypeAdapter(Dict[UUID, float])
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    version: int
+    built_at: float
+    products: Tuple[ProductOut, ...]
+    categories: Tuple[CategoryOut, ...]
+    cut_clean_options: Tuple[CutCleanOptionOut, ...]
+    next_delivery: NextDeliveryResponse
+    # Section name ("products", "categories", "cut_clean_options",
+    # "next_delivery") -> serialised response
+    bodies: Dict[str, PreparedBody] = field(repr=False)
+    # Category slug -> that category's active products
+    category_bodies: Dict[str, PreparedBody] = field(repr=False)
+    # Product slug -> product detail
+    product_bodies: Dict[str, PreparedBody] = field(repr=False)
+
+
+@dataclass(frozen=True)
+class StockLevels:
+    version: int
+    built_at: float
+    # Active product id -> kilos not held for carts
+    available: Dict[UUID, float]
+    body: PreparedBody = field(repr=False)
+
+
+class CatalogCache:
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = float(ttl_seconds)
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._indexes: Dict[str, Tuple[CatalogSnapshot, Any]] = {}
+        self._version = 0
+        self._stock: Optional[StockLevels] = None
+        self._stock_version = 0
+        self._lock = threading.Lock()
+        self._rebuild_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.rebuilds = 0
+        self.rebuild_seconds_total = 0.0
+        self.rebuild_seconds_last = 0.0
+        self.rebuild_seconds_max = 0.0
+        self.stock_changes = 0
+        self.stock_rebuilds = 0
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def _current(self) -> Optional[CatalogSnapshot]:
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.version != self._version:
+            return None
+        if time.monotonic() - snapshot.built_at >= self.ttl_seconds:
+            return None
+        return snapshot
+
+    def _current_stock(self) -> Optional[StockLevels]:
+        levels = self._stock
+        if levels is None or levels.version != self._stock_version:
+            return None
+        if time.monotonic() - levels.built_at >= self.ttl_seconds:
+            return None
+        return levels
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._version += 1
+            self._stock_version += 1
+            self.invalidations += 1
+
+    def stock_changed(self) -> None:
+        """Stock or holds changed: only the availability map is rebuilt."""
+        with self._lock:
+            self._stock_version += 1
+            self.stock_changes += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._snapshot = None
+            self._indexes = {}
+            self._stock = None
+            self._version += 1
+            self._stock_version += 1
+
+    async def get(self) -> CatalogSnapshot:
+        snapshot = self._current()
+        if snapshot is not None:
+            self.hits += 1
+            return snapshot
+
+        lock = self._rebuild_locks.setdefault(asyncio.get_running_loop(), asyncio.Lock())
+        async with lock:
+            # Another request may have rebuilt it while this one waited
+            snapshot = self._current()
+            if snapshot is not None:
+                self.hits += 1
+                return snapshot
+            self.misses += 1
+            return await self._rebuild()
+
+    async def stock_levels(self) -> StockLevels:
+        levels = self._current_stock()
+        if levels is not None:
+            return levels
+        lock = self._rebuild_locks.setdefault(asyncio.get_running_loop(), asyncio.Lock())
+        async with lock:
+            levels = self._current_stock()
+            if levels is not None:
+                return levels
+            version = self._stock_version
+            async with database.AsyncSessionLocal() as db:
+                rows = await db.execute(
+                    select(Product.id, Product.stock_kg - Product.reserved_kg).where(Product.is_active.is_(True))
+                )
+                available = {product_id: max(kg or 0.0, 0.0) for product_id, kg in rows.all()}
+            levels = StockLevels(
+                version=version,
+                built_at=time.monotonic(),
+                available=available,
+                # Rebuilt after every cart change, so the cheapest gzip level
+                body=PreparedBody.from_json(_availability_adapter.dump_json(available), compresslevel=1),
+            )
+            with self._lock:
+                self._stock = levels
+                self.stock_rebuilds += 1
+            return levels
+
+    async def _derived(self, name: str, build: Callable[[Tuple[ProductOut, ...]], T]) -> T:
+        """An index over the current snapshot's products, built on first use in
+        a worker thread so a large catalog does not stall the event loop."""
+        snapshot = await self.get()
+        cached = self._indexes.get(name)
+        if cached is not None and cached[0] is snapshot:
+            return cached[1]
+        lock = self._rebuild_locks.setdefault(asyncio.get_running_loop(), asyncio.Lock())
+        async with lock:
+            cached = self._indexes.get(name)
+            if cached is not None and cached[0] is snapshot:
+                return cached[1]
+            index = await asyncio.to_thread(build, snapshot.products)
+            self._indexes[name] = (snapshot, index)
+            return index
+
+    async def search_index(self) -> SearchIndex:
+        return await self._derived("search", SearchIndex)
+
+    async def browse_index(self) -> BrowseIndex:
+        return await self._derived("browse", BrowseIndex)
+
+    async def _rebuild(self) -> CatalogSnapshot:
+        version = self._version
+        started = time.perf_counter()
+        # Always the primary: a lagging replica could pin pre-edit data in
+        # the snapshot until the TTL runs out.
+        async with database.AsyncSessionLocal() as db:
+            products = (await db.scalars(queries.active_products)).all()
+            categories = (await db.scalars(select(Category).where(Category.is_active.is_(True)))).all()
+            options = (
+                await db.scalars(
+                    select(CutCleanOption)
+                    .where(CutCleanOption.is_active.is_(True))
+                    .order_by(CutCleanOption.sort_order, CutCleanOption.label)
+                )
+            ).all()
+            next_delivery = NextDeliveryResponse.model_validate(await get_next_delivery(db))
+        product_items = [ProductOut.model_validate(product) for product in products]
+        category_items = [CategoryOut.model_validate(category) for category in categories]
+        option_items = [CutCleanOptionOut.model_validate(option) for option in options]
+        by_category: Dict[str, List[ProductOut]] = {category.slug: [] for category in category_items}
+        for product in product_items:
+            by_category.setdefault(product.category.slug, []).append(product)
+        snapshot = CatalogSnapshot(
+            version=version,
+            built_at=time.monotonic(),
+            products=tuple(product_items),
+            categories=tuple(category_items),
+            cut_clean_options=tuple(option_items),
+            next_delivery=next_delivery,
+            bodies={
+                "products": PreparedBody.from_json(_products_adapter.dump_json(product_items)),
+                "categories": PreparedBody.from_json(_categories_adapter.dump_json(category_items)),
+                "cut_clean_options": PreparedBody.from_json(_options_adapter.dump_json(option_items)),
+                "next_delivery": PreparedBody.from_json(next_delivery.model_dump_json().encode()),
+            },
+            category_bodies={
+                slug: PreparedBody.from_json(_products_adapter.dump_json(items)) for slug, items in by_category.items()
+            },
+            product_bodies={
+                product.slug: PreparedBody.from_json(product.model_dump_json().encode()) for product in product_items
+            },
+        )
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._snapshot = snapshot
+            self.rebuilds += 1
+            self.rebuild_seconds_last = elapsed
+            self.rebuild_seconds_total += elapsed
+            self.rebuild_seconds_max = max(self.rebuild_seconds_max, elapsed)
+        return snapshot
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        lookups = self.hits + self.misses
+        return {
+            "version": self._version,
+            "snapshot_version": snapshot.version if snapshot else None,
+            "snapshot_age_seconds": round(time.monotonic() - snapshot.built_at, 3) if snapshot else None,
+            "products": len(snapshot.products) if snapshot else 0,
+            "categories": len(snapshot.categories) if snapshot else 0,
+            "products_body_bytes": len(snapshot.bodies["products"].body) if snapshot else 0,
+            "products_gzip_bytes": len(snapshot.bodies["products"].gzipped or b"") if snapshot else 0,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "stock_changes": self.stock_changes,
+            "stock_rebuilds": self.stock_rebuilds,
+            "rebuilds": self.rebuilds,
+            "rebuild_ms_last": round(self.rebuild_seconds_last * 1000, 3),
+            "rebuild_ms_max": round(self.rebuild_seconds_max * 1000, 3),
+            "rebuild_ms_avg": (
+                round(self.rebuild_seconds_total * 1000 / self.rebuilds, 3) if self.rebuilds else 0.0
+            ),
+        }
+
+
+EMPTY_PRODUCT_LIST = PreparedBody.from_json(b"[]")
+
+catalog_cache = CatalogCache(ttl_seconds=settings.CATALOG_CACHE_TTL_SECONDS)
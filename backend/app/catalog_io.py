@@ -0,0 +1,467 @@
+"""Bulk product import and export behind ``/admin/products/import`` and ``/export``.
+
+Imports are keyed on ``slug`` and stream the request body (CSV with a header
+row, or NDJSON) into a temporary staging table: through ``COPY`` on
+PostgreSQL, in batched INSERTs elsewhere. Rows are checked field by field
+while they stream in. The checks that need the database (unknown categories,
+slugs repeated in the file, new products missing required fields) then run
+as set-based queries over the staging table, and the catalog is updated by
+one ``UPDATE ... FROM`` and one ``INSERT ... SELECT``. A row that would set
+``stock_kg`` below what customers' carts hold is rejected after the update.
+All of this happens in the caller's transaction, so a file with any error
+changes nothing.
+
+A column that a row leaves out (a missing CSV column or NDJSON key) keeps
+its current value, so a supplier price list only needs ``slug`` and
+``price_per_kg``. New products need ``name``, ``price_per_kg`` and
+``category`` (a category slug). Exports use the same columns, so an export
+can be edited and imported again.
+"""
+
+from __future__ import annotations
+
+import codecs
+import csv
+import io
+import json
+import math
+import uuid
+from typing import AsyncIterable, AsyncIterator, Dict, List, Optional, Tuple
+
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Float,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    Text,
+    case,
+    exists,
+    func,
+    insert,
+    null,
+    or_,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import GUID, Category, Product
+from .stock import locked_products
+
+COLUMNS = (
+    "slug",
+    "name",
+    "description",
+    "price_per_kg",
+    "stock_kg",
+    "category",
+    "image_url",
+    "is_active",
+    "is_dry",
+)
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+_MEDIA_TYPES = {"text/csv": "csv", "application/x-ndjson": "ndjson", "application/jsonl": "ndjson"}
+MAX_ERRORS = 100
+_BATCH_SIZE = 1000
+_EXPORT_BATCH_SIZE = 1000
+
+_TRUE = {"true", "t", "yes", "y", "1"}
+_FALSE = {"false", "f", "no", "n", "0"}
+
+_staging = Table(
+    "product_import",
+    MetaData(),
+    Column("line", Integer, nullable=False),
+    Column("id", GUID, nullable=False),
+    Column("slug", String(180), nullable=False),
+    Column("name", String(160)),
+    Column("description", Text),
+    Column("set_description", Boolean, nullable=False),
+    Column("price_per_kg", Float),
+    Column("stock_kg", Float),
+    Column("category", String(140)),
+    Column("image_url", String(500)),
+    Column("set_image_url", Boolean, nullable=False),
+    Column("is_active", Boolean),
+    Column("is_dry", Boolean),
+    Column("category_id", GUID),
+    prefixes=["TEMPORARY"],
+)
+# Everything but category_id, which is resolved in SQL once the rows are in
+_STAGED = [column.name for column in _staging.columns if column.name != "category_id"]
+
+
+class ImportRejected(ValueError):
+    def __init__(self, errors: List[dict]):
+        super().__init__(f"{len(errors)} invalid rows")
+        self.errors = errors
+
+
+def import_format(content_type: Optional[str]) -> Optional[str]:
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    return _MEDIA_TYPES.get(media_type)
+
+
+async def _lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    # utf-8-sig drops the byte order mark spreadsheet exports like to add
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    try:
+        async for chunk in chunks:
+            pending += decoder.decode(chunk)
+            *lines, pending = pending.split("\n")
+            for line in lines:
+                yield line + "\n"
+        pending += decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        raise ImportRejected([{"line": None, "msg": "File is not valid UTF-8"}]) from None
+    if pending:
+        yield pending
+
+
+async def _csv_rows(chunks: AsyncIterable[bytes]) -> AsyncIterator[Tuple[int, object]]:
+    header: Optional[List[str]] = None
+    record: List[str] = []
+    quotes = 0
+    number = start = 0
+    async for line in _lines(chunks):
+        number += 1
+        if not record:
+            start = number
+        record.append(line)
+        # A quoted field can span lines; the record ends once quotes balance
+        quotes += line.count('"')
+        if quotes % 2:
+            continue
+        fields = next(csv.reader(record), [])
+        record, quotes = [], 0
+        if not any(field.strip() for field in fields):
+            continue
+        if header is None:
+            header = [field.strip().lower() for field in fields]
+            _check_header(header)
+            continue
+        if len(fields) != len(header):
+            yield start, f"Expected {len(header)} fields, found {len(fields)}"
+            continue
+        yield start, dict(zip(header, fields))
+    if record:
+        yield start, "Unterminated quoted field"
+    if header is None:
+        raise ImportRejected([{"line": None, "msg": "File has no header row"}])
+
+
+def _check_header(header: List[str]) -> None:
+    unknown = [name for name in header if name not in COLUMNS]
+    if unknown:
+        raise ImportRejected([{"line": 1, "msg": f"Unknown columns: {', '.join(unknown)}"}])
+    if len(set(header)) != len(header):
+        raise ImportRejected([{"line": 1, "msg": "Duplicate columns"}])
+    if "slug" not in header:
+        raise ImportRejected([{"line": 1, "msg": "A slug column is required"}])
+
+
+async def _ndjson_rows(chunks: AsyncIterable[bytes]) -> AsyncIterator[Tuple[int, object]]:
+    number = 0
+    async for line in _lines(chunks):
+        number += 1
+        if not line.strip():
+            continue
+        try:
+            fields = json.loads(line)
+        except ValueError:
+            yield number, "Invalid JSON"
+            continue
+        if not isinstance(fields, dict):
+            yield number, "Each line must be a JSON object"
+            continue
+        unknown = [name for name in fields if name not in COLUMNS]
+        if unknown:
+            yield number, f"Unknown fields: {', '.join(unknown)}"
+            continue
+        yield number, fields
+
+
+def _text(name: str, max_length: Optional[int], nullable: bool = False):
+    def convert(raw):
+        if isinstance(raw, str):
+            raw = raw.strip()
+        elif raw is not None:
+            raise ValueError(f"{name}: must be a string")
+        if not raw:
+            if nullable:
+                return None
+            raise ValueError(f"{name}: a value is required")
+        if max_length is not None and len(raw) > max_length:
+            raise ValueError(f"{name}: longer than {max_length} characters")
+        return raw
+
+    return convert
+
+
+def _number(name: str):
+    def convert(raw):
+        if isinstance(raw, bool) or not isinstance(raw, (str, int, float)):
+            raise ValueError(f"{name}: a value is required" if raw is None else f"{name}: must be a number")
+        try:
+            number = float(raw)
+        except ValueError:
+            raise ValueError(f"{name}: {'must be a number' if raw.strip() else 'a value is required'}") from None
+        if not math.isfinite(number) or number < 0:
+            raise ValueError(f"{name}: must be zero or more")
+        return number
+
+    return convert
+
+
+def _flag(name: str):
+    def convert(raw):
+        if isinstance(raw, bool):
+            return raw
+        flag = raw.strip().lower() if isinstance(raw, str) else None
+        if flag in _TRUE:
+            return True
+        if flag in _FALSE:
+            return False
+        if raw is None or flag == "":
+            raise ValueError(f"{name}: a value is required")
+        raise ValueError(f"{name}: must be true or false")
+
+    return convert
+
+
+_CONVERTERS = {
+    "slug": _text("slug", 180),
+    "name": _text("name", 160),
+    "description": _text("description", None, nullable=True),
+    "price_per_kg": _number("price_per_kg"),
+    "stock_kg": _number("stock_kg"),
+    "category": _text("category", 140),
+    "image_url": _text("image_url", 500, nullable=True),
+    "is_active": _flag("is_active"),
+    "is_dry": _flag("is_dry"),
+}
+
+
+def _staged_row(line: int, fields: Dict[str, object]) -> tuple:
+    values = {name: _CONVERTERS[name](raw) for name, raw in fields.items()}
+    if "slug" not in values:
+        raise ValueError("slug: a value is required")
+    return (
+        line,
+        uuid.uuid4(),
+        values["slug"],
+        values.get("name"),
+        values.get("description"),
+        "description" in values,
+        values.get("price_per_kg"),
+        values.get("stock_kg"),
+        values.get("category"),
+        values.get("image_url"),
+        "image_url" in values,
+        values.get("is_active"),
+        values.get("is_dry"),
+    )
+
+
+async def _valid_rows(rows: AsyncIterator[Tuple[int, object]], errors: List[dict]) -> AsyncIterator[tuple]:
+    async for line, fields in rows:
+        if isinstance(fields, str):
+            errors.append({"line": line, "msg": fields})
+        else:
+            try:
+                row = _staged_row(line, fields)
+            except ValueError as exc:
+                errors.append({"line": line, "msg": str(exc)})
+            else:
+                # Once a row has failed nothing will be written, so the
+                # rest of the file is only checked
+                if not errors:
+                    yield row
+        if len(errors) >= MAX_ERRORS:
+            return
+
+
+async def _copy_rows(db: AsyncSession, rows: AsyncIterator[tuple]) -> None:
+    connection = await (await db.connection()).get_raw_connection()
+    statement = f"COPY {_staging.name} ({', '.join(_STAGED)}) FROM STDIN"
+    async with connection.driver_connection.cursor() as cursor:
+        async with cursor.copy(statement) as copy:
+            async for row in rows:
+                await copy.write_row(row)
+
+
+async def _insert_rows(db: AsyncSession, rows: AsyncIterator[tuple]) -> None:
+    batch = []
+    async for row in rows:
+        batch.append(dict(zip(_STAGED, row)))
+        if len(batch) == _BATCH_SIZE:
+            await db.execute(insert(_staging), batch)
+            batch = []
+    if batch:
+        await db.execute(insert(_staging), batch)
+
+
+async def _database_errors(db: AsyncSession) -> List[dict]:
+    staged = _staging.c
+    existing = exists().where(Product.slug == staged.slug)
+    repeats = select(
+        staged.line, func.row_number().over(partition_by=staged.slug, order_by=staged.line).label("seen")
+    ).subquery()
+    checks = [
+        (
+            select(staged.line).where(staged.category.is_not(None), staged.category_id.is_(None)),
+            "category: no category with this slug",
+        ),
+        (select(repeats.c.line).where(repeats.c.seen > 1), "slug: repeats an earlier row"),
+        (
+            select(staged.line).where(
+                ~existing, or_(staged.name.is_(None), staged.price_per_kg.is_(None), staged.category.is_(None))
+            ),
+            "New product: name, price_per_kg and category are required",
+        ),
+    ]
+    errors = []
+    for query, message in checks:
+        lines = await db.scalars(query.order_by(query.selected_columns[0]).limit(MAX_ERRORS))
+        errors.extend({"line": line, "msg": message} for line in lines)
+    return sorted(errors, key=lambda error: error["line"])[:MAX_ERRORS]
+
+
+async def _apply(db: AsyncSession) -> Tuple[int, int]:
+    staged = _staging.c
+    products = Product.__table__.c
+    values = {
+        "name": func.coalesce(staged.name, products.name),
+        "description": case((staged.set_description, staged.description), else_=products.description),
+        "price_per_kg": func.coalesce(staged.price_per_kg, products.price_per_kg),
+        "stock_kg": func.coalesce(staged.stock_kg, products.stock_kg),
+        "category_id": func.coalesce(staged.category_id, products.category_id),
+        "image_url": case((staged.set_image_url, staged.image_url), else_=products.image_url),
+        "is_active": func.coalesce(staged.is_active, products.is_active),
+        "is_dry": func.coalesce(staged.is_dry, products.is_dry),
+    }
+    # Rows that would not change anything are left alone rather than rewritten
+    changed = or_(*(products[name].is_distinct_from(value) for name, value in values.items()))
+    # Variants belong to the old image; `python -m app.media backfill-variants` renders the new one's
+    values["image_variants"] = case(
+        (products.image_url.is_distinct_from(values["image_url"]), null()), else_=products.image_variants
+    )
+    # Products locked in key order, as every stock change locks them
+    imported = locked_products(select(products.id).where(products.slug.in_(select(staged.slug))))
+    updated = await db.execute(
+        update(Product.__table__).where(products.slug == staged.slug, products.id.in_(imported), changed).values(values)
+    )
+    created = await db.execute(
+        insert(Product.__table__).from_select(
+            ["id", "slug", "name", "description", "price_per_kg", "stock_kg", "category_id", "image_url",
+             "is_active", "is_dry"],
+            select(
+                staged.id,
+                staged.slug,
+                staged.name,
+                staged.description,
+                staged.price_per_kg,
+                func.coalesce(staged.stock_kg, 0),
+                staged.category_id,
+                staged.image_url,
+                func.coalesce(staged.is_active, True),
+                func.coalesce(staged.is_dry, False),
+            ).where(~exists().where(products.slug == staged.slug)),
+        ),
+        # rowcount of an INSERT is otherwise not kept for every driver
+        execution_options={"preserve_rowcount": True},
+    )
+    return updated.rowcount, created.rowcount
+
+
+async def import_products(db: AsyncSession, chunks: AsyncIterable[bytes], fmt: str) -> dict:
+    """Stage, check and apply an import in ``db``'s transaction.
+
+    Raises ``ImportRejected`` with up to ``MAX_ERRORS`` line-numbered errors
+    when any row is invalid; the caller then rolls back. On success the
+    caller commits.
+    """
+    conn = await db.connection()
+    await conn.run_sync(_staging.create)
+    errors: List[dict] = []
+    rows = _valid_rows(_csv_rows(chunks) if fmt == "csv" else _ndjson_rows(chunks), errors)
+    if db.bind.dialect.name == "postgresql":
+        await _copy_rows(db, rows)
+        # Temporary tables are never auto-analyzed; without statistics the
+        # planner would guess at the joins below
+        await db.execute(text(f"ANALYZE {_staging.name}"))
+    else:
+        await _insert_rows(db, rows)
+    if errors:
+        raise ImportRejected(errors)
+
+    staged = _staging.c
+    await db.execute(
+        update(_staging)
+        .where(staged.category.is_not(None))
+        .values(category_id=select(Category.id).where(Category.slug == staged.category).scalar_subquery())
+    )
+    errors = await _database_errors(db)
+    if errors:
+        raise ImportRejected(errors)
+
+    total = await db.scalar(select(func.count()).select_from(_staging))
+    updated, created = await _apply(db)
+    # Checked after the update, whose row locks keep holds from growing meanwhile
+    lines = await db.scalars(
+        select(staged.line)
+        .join(Product, Product.slug == staged.slug)
+        .where(staged.stock_kg.is_not(None), Product.stock_kg < Product.reserved_kg)
+        .order_by(staged.line)
+        .limit(MAX_ERRORS)
+    )
+    errors = [{"line": line, "msg": "stock_kg: below the kilos held for customers' carts"} for line in lines]
+    if errors:
+        raise ImportRejected(errors)
+    await conn.run_sync(_staging.drop)
+    db.info["pending_writes"] = True
+    return {"rows": total, "created": created, "updated": updated, "unchanged": total - created - updated}
+
+
+def _csv_value(value) -> object:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return value
+
+
+async def export_products(db: AsyncSession, fmt: str) -> AsyncIterator[bytes]:
+    """Yield the whole catalog, active or not, ordered by slug."""
+    query = (
+        select(
+            Product.slug,
+            Product.name,
+            Product.description,
+            Product.price_per_kg,
+            Product.stock_kg,
+            Category.slug.label("category"),
+            Product.image_url,
+            Product.is_active,
+            Product.is_dry,
+        )
+        .join(Category, Product.category_id == Category.id)
+        .order_by(Product.slug)
+        .execution_options(yield_per=_EXPORT_BATCH_SIZE)
+    )
+    if fmt == "csv":
+        yield (",".join(COLUMNS) + "\r\n").encode()
+    result = await db.stream(query)
+    async for rows in result.partitions():
+        buffer = io.StringIO()
+        if fmt == "csv":
+            writer = csv.writer(buffer)
+            writer.writerows([_csv_value(value) for value in row] for row in rows)
+        else:
+            for row in rows:
+                buffer.write(json.dumps(dict(zip(COLUMNS, row)), separators=(",", ":")))
+                buffer.write("\n")
+        yield buffer.getvalue().encode()
@@ -1,29 +1,336 @@
+import asyncio
 import logging
+import threading
+import time
+import weakref
 
-from sqlalchemy import create_engine, text
+from fastapi import Request
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import URL, make_url
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.util import await_only
 
+from .cache import TTLCache
 from .config import settings
 
 logger = logging.getLogger("tarel.database")
-def _initialise_engine():
-    url = settings.DATABASE_URL
-    engine = create_engine(url, pool_pre_ping=True)
 
+_ASYNC_DRIVERS = {
+    "postgres": "postgresql+psycopg",
+    "postgresql": "postgresql+psycopg",
+    "postgresql+psycopg2": "postgresql+psycopg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+def async_database_url(url: str) -> URL:
+    """Map a sync ``DATABASE_URL`` onto the equivalent asyncio driver."""
+    parsed = make_url(url)
+    drivername = _ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername)
+    return parsed.set(drivername=drivername)
+
+
+class PoolStats:
+    """Checkout counters and wait times collected by an instrumented pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_checkout(self, waited: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self, pool) -> dict:
+        with self._lock:
+            checkouts = self.checkouts
+            stats = {
+                "checkouts": checkouts,
+                "timeouts": self.timeouts,
+                "wait_ms_total": round(self.wait_seconds_total * 1000, 3),
+                "wait_ms_max": round(self.wait_seconds_max * 1000, 3),
+                "wait_ms_avg": round(self.wait_seconds_total * 1000 / checkouts, 3) if checkouts else 0.0,
+            }
+        if isinstance(pool, QueuePool):
+            stats.update(
+                pool_size=pool.size(),
+                checked_out=pool.checkedout(),
+                checked_in=pool.checkedin(),
+                overflow=max(0, pool.overflow()),
+                max_overflow=pool._max_overflow,
+            )
+        return stats
+
+
+class _InstrumentedPoolMixin:
+    stats: PoolStats
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.record_timeout()
+            raise
+        self.stats.record_checkout(time.perf_counter() - started)
+        return connection
+
+
+def _instrumented(pool_class, stats: PoolStats):
+    # A class per engine keeps the stats attached across ``pool.recreate()``.
+    return type(f"Instrumented{pool_class.__name__}", (_InstrumentedPoolMixin, pool_class), {"stats": stats})
+
+
+sync_pool_stats = PoolStats()
+async_pool_stats = PoolStats()
+read_pool_stats = PoolStats()
+
+
+def _is_sqlite_memory(url: URL) -> bool:
+    return url.database in (None, "", ":memory:") or url.query.get("mode") == "memory"
+
+
+def _engine_options(url: URL, pool_class, stats: PoolStats) -> dict:
+    options = {"pool_pre_ping": True}
+    backend = url.get_backend_name()
+    if backend == "sqlite":
+        if _is_sqlite_memory(url):
+            return options
+        # A local file needs neither liveness checks nor recycling, and WAL
+        # lets pooled readers run alongside the single writer.
+        return {
+            "poolclass": _instrumented(pool_class, stats),
+            "pool_size": settings.DB_POOL_SIZE,
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "pool_timeout": settings.DB_POOL_TIMEOUT,
+        }
+
+    options.update(
+        poolclass=_instrumented(pool_class, stats),
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+    )
+    connect_args = {}
+    if backend == "postgresql" and settings.DB_STATEMENT_TIMEOUT_MS > 0:
+        connect_args["options"] = f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"
+    if url.get_driver_name() == "psycopg":
+        # Statements executed this many times on a connection become
+        # server-side prepared statements; None disables (e.g. for PgBouncer
+        # in transaction pooling mode).
+        connect_args["prepare_threshold"] = settings.DB_PREPARE_THRESHOLD
+    if connect_args:
+        options["connect_args"] = connect_args
+    return options
+
+
+def _sqlite_pragmas() -> list[str]:
+    return [
+        f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}",
+        f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}",
+        f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}",
+        f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}",
+    ]
+
+
+def _configure_sqlite(engine, is_async: bool = False) -> None:
+    """Apply the single-node SQLite profile to a (sync) engine.
+
+    The driver's implicit transaction handling is switched off so that BEGIN
+    is emitted here: write sessions (``get_async_db``) open with BEGIN
+    IMMEDIATE, and read-only ones (``get_primary_read_db``, ``get_read_db``)
+    stay deferred. Writers need IMMEDIATE because a deferred transaction that
+    reads and then writes gets SQLITE_BUSY without waiting if another writer
+    committed in between.
+
+    Those writers first queue on an in-process lock. SQLite's busy handler
+    polls with growing sleeps and leaves the write lock idle between writers;
+    ``busy_timeout`` still arbitrates between processes.
+    """
+    gate_timeout = settings.SQLITE_BUSY_TIMEOUT_MS / 1000
+    thread_gate = threading.Lock()
+    loop_gates: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+    def _acquire_gate():
+        if not is_async:
+            return thread_gate if thread_gate.acquire(timeout=gate_timeout) else None
+        # Event handlers of an asyncio engine run on the event loop inside
+        # SQLAlchemy's greenlet, so the wait must not block the thread.
+        gate = loop_gates.setdefault(asyncio.get_running_loop(), asyncio.Lock())
+        try:
+            await_only(asyncio.wait_for(gate.acquire(), gate_timeout))
+        except asyncio.TimeoutError:
+            return None
+        return gate
+
+    def _release_gate(conn):
+        gate = conn.info.pop("sqlite_write_gate", None)
+        if gate is not None:
+            gate.release()
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        for pragma in _sqlite_pragmas():
+            cursor.execute(pragma)
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def _on_begin(conn):
+        mode = conn.get_execution_options().get("sqlite_begin", "DEFERRED")
+        if mode == "IMMEDIATE":
+            conn.info["sqlite_write_gate"] = _acquire_gate()
+        try:
+            conn.exec_driver_sql(f"BEGIN {mode}")
+        except Exception:
+            _release_gate(conn)
+            raise
+
+    event.listen(engine, "commit", _release_gate)
+    event.listen(engine, "rollback", _release_gate)
+
+
+Base = declarative_base()
+
+# Engines are created on first use (normally from the app lifespan) so that
+# importing the application performs no database I/O.
+_engines: dict = {}
+
+
+def get_engine():
+    if "sync" not in _engines:
+        url = make_url(settings.DATABASE_URL)
+        _engines["sync"] = create_engine(url, **_engine_options(url, QueuePool, sync_pool_stats))
+        if url.get_backend_name() == "sqlite":
+            _configure_sqlite(_engines["sync"])
+    return _engines["sync"]
+
+
+def get_async_engine():
+    # Request handlers use the asyncio engine so that concurrency is bounded by
+    # the connection pool rather than the threadpool; the sync engine remains
+    # for scripts, seeding and tests.
+    if "async" not in _engines:
+        url = async_database_url(settings.DATABASE_URL)
+        _engines["async"] = create_async_engine(
+            url, **_engine_options(url, AsyncAdaptedQueuePool, async_pool_stats)
+        )
+        if url.get_backend_name() == "sqlite":
+            _configure_sqlite(_engines["async"].sync_engine, is_async=True)
+    return _engines["async"]
+
+
+def get_write_async_engine():
+    """The primary engine as used by write sessions; on SQLite their
+    transactions take the write lock up front (BEGIN IMMEDIATE)."""
+    if "write" not in _engines:
+        engine = get_async_engine()
+        if engine.dialect.name == "sqlite":
+            engine = engine.execution_options(sqlite_begin="IMMEDIATE")
+        _engines["write"] = engine
+    return _engines["write"]
+
+
+def get_read_async_engine():
+    if not settings.DATABASE_READ_URL:
+        return None
+    if "read" not in _engines:
+        url = async_database_url(settings.DATABASE_READ_URL)
+        _engines["read"] = create_async_engine(
+            url, **_engine_options(url, AsyncAdaptedQueuePool, read_pool_stats)
+        )
+        if url.get_backend_name() == "sqlite":
+            _configure_sqlite(_engines["read"].sync_engine, is_async=True)
+    return _engines["read"]
+
+
+class _LazySession(Session):
+    def __init__(self, bind=None, **kwargs):
+        super().__init__(bind=bind if bind is not None else get_engine(), **kwargs)
+
+
+class _LazyAsyncSession(AsyncSession):
+    def __init__(self, bind=None, **kwargs):
+        super().__init__(bind=bind if bind is not None else get_async_engine(), **kwargs)
+
+
+class _LazyReadSession(AsyncSession):
+    def __init__(self, bind=None, **kwargs):
+        super().__init__(bind=bind if bind is not None else get_read_async_engine(), **kwargs)
+
+
+SessionLocal = sessionmaker(class_=_LazySession, autocommit=False, autoflush=False)
+AsyncSessionLocal = async_sessionmaker(
+    class_=_LazyAsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+ReadSessionLocal = None
+if settings.DATABASE_READ_URL:
+    ReadSessionLocal = async_sessionmaker(
+        class_=_LazyReadSession,
+        autoflush=False,
+        expire_on_commit=False,
+    )
+
+
+async def init_database() -> None:
+    """Verify connectivity and warm the pool; called from the app lifespan."""
     try:
-        with engine.connect() as conn:
-            conn.execute(text("SELECT 1"))
-        logger.info("Database engine initialised")
-        return engine
+        async with get_async_engine().connect() as conn:
+            await conn.execute(text("SELECT 1"))
     except SQLAlchemyError:
         logger.error("Failed to initialise database engine", exc_info=True)
         raise
+    logger.info("Database engine initialised")
+    if settings.DB_POOL_PREFILL:
+        await prefill_async_pool()
 
 
-engine = _initialise_engine()
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
+async def dispose_engines() -> None:
+    for name, engine in _engines.items():
+        if name == "write":
+            continue  # shares the "async" engine's pool
+        if isinstance(engine, AsyncEngine):
+            await engine.dispose()
+        else:
+            engine.dispose()
+
+
+READ_PRIMARY_HEADER = "X-Read-Primary"
+
+# Principals that committed a write recently; their replica-eligible reads go
+# to the primary until the entry expires so they see their own changes.
+recent_writers: TTLCache[bool] = TTLCache(
+    max_size=10000, ttl_seconds=settings.READ_YOUR_WRITES_SECONDS
+)
+
+
+@event.listens_for(Session, "after_flush")
+def _note_pending_writes(session, flush_context):
+    session.info["pending_writes"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _note_committed_writes(session):
+    if session.info.pop("pending_writes", False):
+        session.info["committed_writes"] = True
 
 
 def get_db():
@@ -32,3 +339,76 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db(request: Request):
+    async with AsyncSessionLocal(bind=get_write_async_engine()) as db:
+        yield db
+        principal_id = getattr(request.state, "principal_id", None)
+        if principal_id is not None and db.info.get("committed_writes"):
+            recent_writers.set(principal_id, True)
+
+
+def read_session_factory(prefer_primary: bool = False):
+    if ReadSessionLocal is None or prefer_primary:
+        return AsyncSessionLocal
+    return ReadSessionLocal
+
+
+def primary_requested(request: Request) -> bool:
+    return request.headers.get(READ_PRIMARY_HEADER, "").lower() in {"1", "true"}
+
+
+async def get_read_db(request: Request):
+    """Session on the read replica when one is configured.
+
+    Clients can force the primary with ``X-Read-Primary: 1``; authenticated
+    handlers should use ``deps.get_user_read_db`` which also honours the
+    read-your-writes window.
+    """
+    async with read_session_factory(primary_requested(request))() as db:
+        yield db
+
+
+async def get_primary_read_db():
+    """Session on the primary for reads that must see the latest commit, such
+    as logins and principal lookups.
+
+    Unlike ``get_async_db`` it begins deferred, so on SQLite it neither takes
+    the write lock nor queues behind writers.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def prefill_async_pool() -> int:
+    """Open ``DB_POOL_SIZE`` connections up front so the first requests after
+    boot do not pay for connection setup."""
+    async_engine = get_async_engine()
+    if not isinstance(async_engine.pool, QueuePool):
+        return 0
+    connections = await asyncio.gather(
+        *(async_engine.connect() for _ in range(settings.DB_POOL_SIZE))
+    )
+    for connection in connections:
+        await connection.close()
+    logger.info("Prefilled async pool with %d connections", len(connections))
+    return len(connections)
+
+
+def pool_metrics() -> dict:
+    metrics = {
+        "async": async_pool_stats.snapshot(get_async_engine().pool),
+        "sync": sync_pool_stats.snapshot(get_engine().pool),
+        "settings": {
+            "pool_size": settings.DB_POOL_SIZE,
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "pool_timeout": settings.DB_POOL_TIMEOUT,
+            "pool_recycle": settings.DB_POOL_RECYCLE,
+            "statement_timeout_ms": settings.DB_STATEMENT_TIMEOUT_MS,
+        },
+    }
+    read_engine = get_read_async_engine()
+    if read_engine is not None:
+        metrics["read"] = read_pool_stats.snapshot(read_engine.pool)
+    return metrics
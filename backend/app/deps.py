@@ -1,17 +1,70 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
 from uuid import UUID
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from .cache import TTLCache
 from .config import settings
-from .database import get_db
+from .database import get_primary_read_db, primary_requested, read_session_factory, recent_writers
 from .models import RoleEnum, User
 
 reuse_oauth = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
 
+@dataclass(frozen=True)
+class Principal:
+    """Detached, read-only snapshot of the authenticated user.
+
+    Handlers that need to modify the user must load the ``User`` row through
+    their own session and call :func:`invalidate_principal` after committing.
+    """
+
+    id: UUID
+    name: str
+    email: str
+    role: RoleEnum
+    created_at: datetime
+    phone: Optional[str]
+    address_line1: Optional[str]
+    locality: Optional[str]
+    city: Optional[str]
+    postcode: Optional[str]
+    user_code: Optional[str]
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(
+            id=user.id,
+            name=user.name,
+            email=user.email,
+            role=user.role,
+            created_at=user.created_at,
+            phone=user.phone,
+            address_line1=user.address_line1,
+            locality=user.locality,
+            city=user.city,
+            postcode=user.postcode,
+            user_code=user.user_code,
+        )
+
+
+# Per-worker cache: invalidation is explicit for writes made through this
+# process, the TTL bounds staleness for writes made by other workers.
+principal_cache: TTLCache[Principal] = TTLCache(
+    max_size=settings.PRINCIPAL_CACHE_SIZE,
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+)
+
+
+def invalidate_principal(user_id: UUID) -> None:
+    principal_cache.invalidate(user_id)
+
+
 def _credentials_exception() -> HTTPException:
     return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -20,8 +73,10 @@ def _credentials_exception() -> HTTPException:
 
 
 async def get_current_user(
-    token: str = Depends(reuse_oauth), db: Session = Depends(get_db)
-) -> User:
+    request: Request,
+    token: str = Depends(reuse_oauth),
+    db: AsyncSession = Depends(get_primary_read_db),
+) -> Principal:
     cred_exc = _credentials_exception()
     try:
         payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALG])
@@ -32,13 +87,30 @@ async def get_current_user(
     except (JWTError, ValueError, TypeError):
         raise cred_exc from None
 
-    user = db.query(User).filter(User.id == user_id).first()
+    request.state.principal_id = user_id
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+
+    user = await db.get(User, user_id)
     if not user:
         raise cred_exc
-    return user
+    principal = Principal.from_user(user)
+    # End the lookup's transaction; the handler may await slow work first
+    await db.close()
+    principal_cache.set(user_id, principal)
+    return principal
+
+
+async def get_user_read_db(request: Request, user: Principal = Depends(get_current_user)):
+    """Replica session for authenticated reads, unless the user committed a
+    write within ``READ_YOUR_WRITES_SECONDS`` (or asked for the primary)."""
+    prefer_primary = primary_requested(request) or recent_writers.get(user.id) is not None
+    async with read_session_factory(prefer_primary)() as db:
+        yield db
 
 
-async def require_admin(user: User = Depends(get_current_user)) -> User:
+async def require_admin(user: Principal = Depends(get_current_user)) -> Principal:
     if user.role != RoleEnum.admin:
         raise HTTPException(status_code=403, detail="Admins only")
     return user
@@ -0,0 +1,92 @@
+"""Conditional GET helpers: strong ETags, ``If-None-Match`` and Cache-Control.
+
+Catalog and settings responses are serialised once into a ``PreparedBody``
+(JSON bytes, a gzip copy and their ETags) and written out as a raw
+``Response``, bypassing response-model validation and JSON encoding.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import Request, Response
+
+from .config import settings
+
+
+def etag_for(body: bytes) -> str:
+    """Strong validator for a response body (quoted, as sent on the wire)."""
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def cache_control() -> str:
+    return (
+        f"public, max-age={settings.HTTP_CACHE_MAX_AGE_SECONDS}, "
+        f"stale-while-revalidate={settings.HTTP_CACHE_STALE_WHILE_REVALIDATE_SECONDS}"
+    )
+
+
+def etag_matches(request: Request, *etags: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, so W/"x" matches "x"
+    return any(candidate.strip().removeprefix("W/") in etags for candidate in header.split(","))
+
+
+def accepts_gzip(request: Request) -> bool:
+    for coding in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = coding.partition(";")
+        if name.strip().lower() not in ("gzip", "*"):
+            continue
+        quality = params.strip().removeprefix("q=")
+        try:
+            return not params or float(quality) > 0
+        except ValueError:
+            return False
+    return False
+
+
+@dataclass(frozen=True)
+class PreparedBody:
+    """A JSON body encoded once and served as-is on every request."""
+
+    body: bytes
+    etag: str
+    gzipped: Optional[bytes] = None
+    gzip_etag: Optional[str] = None
+
+    @classmethod
+    def from_json(cls, body: bytes, compresslevel: int = 9) -> "PreparedBody":
+        etag = etag_for(body)
+        minimum = settings.HTTP_GZIP_MIN_BYTES
+        if minimum <= 0 or len(body) < minimum:
+            return cls(body=body, etag=etag)
+        # Compressed once per catalog rebuild, so the slowest level is free
+        gzipped = gzip.compress(body, compresslevel=compresslevel, mtime=0)
+        if len(gzipped) >= len(body):
+            return cls(body=body, etag=etag)
+        # A content coding is a different representation and needs its own strong ETag
+        return cls(body=body, etag=etag, gzipped=gzipped, gzip_etag=f'{etag[:-1]}-gzip"')
+
+
+def prepared_response(request: Request, prepared: PreparedBody, directives: Optional[str] = None) -> Response:
+    """Send ``prepared`` as-is: gzip when the client accepts it, 304 when it
+    already holds the current representation. ``directives`` replaces the
+    default Cache-Control."""
+    use_gzip = prepared.gzipped is not None and accepts_gzip(request)
+    etag = prepared.gzip_etag if use_gzip else prepared.etag
+    headers = {"ETag": etag, "Cache-Control": directives or cache_control()}
+    if prepared.gzipped is not None:
+        headers["Vary"] = "Accept-Encoding"
+    if etag_matches(request, prepared.etag, prepared.gzip_etag or prepared.etag):
+        return Response(status_code=304, headers=headers)
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=prepared.gzipped, media_type="application/json", headers=headers)
+    return Response(content=prepared.body, media_type="application/json", headers=headers)
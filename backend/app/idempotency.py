@@ -0,0 +1,143 @@
+"""``Idempotency-Key`` for order writes that clients retry.
+
+``POST /orders/`` and ``POST /orders/{id}/cancel`` accept the header. The
+first request with a key claims it by inserting a row in ``idempotency_keys``
+as the first write of its transaction. It stores its response in the same
+transaction, so the key and the order commit or roll back together. Then:
+
+* a retry after that commit is answered from the stored row with one
+  primary-key lookup. Stock is not touched, and the response carries
+  ``Idempotent-Replayed: true``;
+* a duplicate arriving while the first is still running waits on the claim
+  (the primary key on PostgreSQL, the write lock on SQLite) until the first
+  commits, then replays its response. If the first failed, the duplicate
+  runs in its place;
+* a key reused with a different request is rejected with 422.
+
+Only successful responses are stored. A rejected request rolls its claim back
+with everything else, so its retry is checked again against current stock.
+Keys are scoped per user and expire after ``IDEMPOTENCY_TTL_SECONDS``; the
+maintenance sweeper (``app.maintenance``) deletes expired rows.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import HTTPException, Response
+from pydantic import BaseModel
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import settings
+from .models import IdempotencyKey
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+
+def _expires_at(now: datetime) -> datetime:
+    return now + timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS)
+
+
+class IdempotentRequest:
+    """One order write and the key it was sent with, if any.
+
+    Without a key ``claim`` does nothing and the route runs as usual.
+    """
+
+    def __init__(self, user_id, key: Optional[str], scope: str, body: str = ""):
+        if key is not None and not (0 < len(key) <= MAX_KEY_LENGTH and key.isprintable()):
+            raise HTTPException(
+                status_code=400,
+                detail=f"{IDEMPOTENCY_KEY_HEADER} must be 1 to {MAX_KEY_LENGTH} printable characters",
+            )
+        self.user_id = user_id
+        self.key = key
+        self.request_hash = hashlib.sha256(f"{scope}\n{body}".encode()).hexdigest()
+
+    def _this_key(self):
+        return (IdempotencyKey.user_id == self.user_id, IdempotencyKey.key == self.key)
+
+    async def _stored(self, db: AsyncSession):
+        return (
+            await db.execute(
+                select(
+                    IdempotencyKey.request_hash,
+                    IdempotencyKey.status_code,
+                    IdempotencyKey.response_body,
+                    IdempotencyKey.expires_at,
+                ).where(*self._this_key())
+            )
+        ).one_or_none()
+
+    def _replay(self, stored) -> Response:
+        if stored.request_hash != self.request_hash:
+            raise HTTPException(
+                status_code=422, detail=f"{IDEMPOTENCY_KEY_HEADER} was already used for a different request"
+            )
+        return Response(
+            content=stored.response_body,
+            status_code=stored.status_code,
+            media_type="application/json",
+            headers={REPLAYED_HEADER: "true"},
+        )
+
+    async def claim(self, db: AsyncSession) -> Optional[Response]:
+        """The stored response when this key has been used; otherwise claim it in ``db``'s transaction."""
+        if self.key is None:
+            return None
+        now = datetime.utcnow()
+        stored = await self._stored(db)
+        if stored is not None:
+            if stored.expires_at > now:
+                return self._replay(stored)
+            await db.execute(delete(IdempotencyKey).where(*self._this_key(), IdempotencyKey.expires_at <= now))
+
+        dialect = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+        claimed = await db.scalar(
+            dialect.insert(IdempotencyKey)
+            .values(
+                user_id=self.user_id,
+                key=self.key,
+                request_hash=self.request_hash,
+                created_at=now,
+                expires_at=_expires_at(now),
+            )
+            .on_conflict_do_nothing(index_elements=["user_id", "key"])
+            .returning(IdempotencyKey.key)
+        )
+        db.info["pending_writes"] = True
+        if claimed is not None:
+            return None
+        # Waited for another request with this key, which has since committed
+        stored = await self._stored(db)
+        if stored is None or stored.status_code is None:
+            raise HTTPException(status_code=409, detail="A request with this key is still in progress")
+        return self._replay(stored)
+
+    async def store(self, db: AsyncSession, result: BaseModel, status_code: int = 200) -> Response:
+        """Record ``result`` against the claimed key (the caller commits) and answer with it."""
+        body = result.model_dump_json()
+        await db.execute(
+            update(IdempotencyKey)
+            .where(*self._this_key())
+            .values(status_code=status_code, response_body=body)
+            .execution_options(synchronize_session=False)
+        )
+        return Response(content=body, status_code=status_code, media_type="application/json")
+
+
+async def sweep_expired_keys(db: AsyncSession) -> int:
+    """Delete expired keys with one DELETE over the ``expires_at`` index; returns how many."""
+    result = await db.execute(
+        delete(IdempotencyKey)
+        .where(IdempotencyKey.expires_at <= datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.info["pending_writes"] = True
+    return result.rowcount
@@ -1,26 +1,63 @@
+import logging
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 
+from .auth import shutdown_hash_executor
+from .catalog import catalog_cache
 from .config import settings
-from .database import Base, engine
-from .routers import admin, auth, categories, getaddress, orders, products, site, support
-from .seed import seed_database
+from .database import dispose_engines, get_async_engine, init_database
+from .maintenance import sweeper
+from .media import MediaFiles, cloudinary_uploads, media_cache, shutdown_image_executor, variant_jobs
+from .migrations import pending_migrations
+from .routers import admin, auth, categories, getaddress, orders, products, reservations, site, support
 
-Base.metadata.create_all(bind=engine)
+logger = logging.getLogger("tarel")
 
-app = FastAPI(title=settings.PROJECT_NAME)
+media_path = Path(settings.MEDIA_ROOT)
+media_mount = settings.MEDIA_URL if settings.MEDIA_URL.startswith("/") else f"/{settings.MEDIA_URL}"
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Connect when the worker starts serving rather than at import time.
 
+    Workers never run DDL: schema changes are applied ahead of a deploy with
+    ``python -m app.migrations upgrade`` and seeding with ``python -m app.seed``.
+    """
+    media_path.mkdir(parents=True, exist_ok=True)
+    await init_database()
+    async with get_async_engine().connect() as conn:
+        pending = await conn.run_sync(pending_migrations)
+        dialect = conn.dialect.name
+    blocking = [migration for migration in pending if migration.blocks_serving(dialect)]
+    if blocking:
+        await dispose_engines()
+        raise RuntimeError(
+            f"Migration {blocking[0].version:04d} {blocking[0].name} must be applied before serving: "
+            "run `python -m app.migrations upgrade`"
+        )
+    if pending:
+        logger.warning(
+            "Database schema is behind: %d pending migration(s), run `python -m app.migrations upgrade`",
+            len(pending),
+        )
+    sweeper.start()
+    yield
+    sweeper.cancel()
+    catalog_cache.clear()
+    # Unfinished renders are dropped; `python -m app.media backfill-variants` redoes them
+    variant_jobs.cancel()
+    # Likewise pushes to Cloudinary: `python -m app.media push-cloudinary`
+    cloudinary_uploads.cancel()
+    shutdown_image_executor()
+    shutdown_hash_executor()
+    await dispose_engines()
 
-@app.on_event("startup")
-async def startup_event():
-    """Seed database on startup if empty."""
-    try:
-        seed_database()
-    except Exception as e:
-        print(f"Warning: Could not seed database: {e}")
+
+app = FastAPI(title=settings.PROJECT_NAME, lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -34,15 +71,13 @@ app.include_router(auth.router, prefix=settings.API_PREFIX)
 app.include_router(categories.router, prefix=settings.API_PREFIX)
 app.include_router(products.router, prefix=settings.API_PREFIX)
 app.include_router(orders.router, prefix=settings.API_PREFIX)
+app.include_router(reservations.router, prefix=settings.API_PREFIX)
 app.include_router(admin.router, prefix=settings.API_PREFIX)
 app.include_router(site.router, prefix=settings.API_PREFIX)
 app.include_router(support.router, prefix=settings.API_PREFIX)
 app.include_router(getaddress.router)
 
-media_path = Path(settings.MEDIA_ROOT)
-media_path.mkdir(parents=True, exist_ok=True)
-media_mount = settings.MEDIA_URL if settings.MEDIA_URL.startswith("/") else f"/{settings.MEDIA_URL}"
-app.mount(media_mount, StaticFiles(directory=media_path), name="media")
+app.mount(media_mount, MediaFiles(media_path, media_cache), name="media")
 
 
 @app.get("/")
@@ -0,0 +1,121 @@
+"""Periodic deletion of expired rows, in every worker and from the command line.
+
+Each job takes a write session, deletes or releases what has expired with
+set-based statements and returns how many rows it touched. The sweeper
+commits after each job; a job that must act after its commit (releasing
+stock refreshes the catalog stock levels) commits itself. Every worker runs the
+sweeper from the app lifespan every ``MAINTENANCE_SWEEP_SECONDS``, starting
+at a random point in the first interval so workers do not sweep in step.
+Concurrent sweeps only find less to do. With the interval at 0, run the same jobs from cron instead::
+
+    python -m app.maintenance sweep
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import random
+import sys
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import database
+from .config import settings
+from .idempotency import sweep_expired_keys
+from .stock import release_expired
+
+logger = logging.getLogger("tarel.maintenance")
+
+SweepJob = Callable[[AsyncSession], Awaitable[int]]
+
+
+class Sweeper:
+    """Runs the registered jobs every ``interval`` seconds while the worker serves."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._jobs: Dict[str, SweepJob] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.failed = 0
+        self.swept: Dict[str, int] = {}
+        self.last_run: Optional[datetime] = None
+
+    def register(self, name: str, job: SweepJob) -> None:
+        self._jobs[name] = job
+        self.swept.setdefault(name, 0)
+
+    async def run_once(self) -> Dict[str, int]:
+        results = {}
+        for name, job in self._jobs.items():
+            try:
+                async with database.AsyncSessionLocal(bind=database.get_write_async_engine()) as db:
+                    results[name] = await job(db)
+                    await db.commit()
+            except Exception:
+                self.failed += 1
+                logger.exception("Maintenance job %s failed", name)
+                continue
+            self.swept[name] += results[name]
+        self.runs += 1
+        self.last_run = datetime.utcnow()
+        return results
+
+    async def _loop(self) -> None:
+        await asyncio.sleep(random.uniform(0, self.interval))
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self.interval > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    def cancel(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "interval_seconds": self.interval,
+            "running": self._task is not None and not self._task.done(),
+            "runs": self.runs,
+            "failed": self.failed,
+            "swept": dict(self.swept),
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+        }
+
+
+sweeper = Sweeper(settings.MAINTENANCE_SWEEP_SECONDS)
+sweeper.register("stock_reservations", release_expired)
+sweeper.register("idempotency_keys", sweep_expired_keys)
+
+
+async def _sweep() -> Dict[str, int]:
+    try:
+        return await sweeper.run_once()
+    finally:
+        await database.dispose_engines()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.maintenance", description="Tarel database maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("sweep", help="release expired stock holds and delete expired idempotency keys once")
+    parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    results = asyncio.run(_sweep())
+    for name, count in results.items():
+        print(f"{name}: {count} expired row(s) removed")
+    return 1 if sweeper.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
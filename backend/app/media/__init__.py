@@ -0,0 +1,33 @@
+"""Product media stored under ``MEDIA_ROOT``.
+
+``store`` keeps uploads under their content hash and collects the ones no
+product uses any more. ``variants`` renders resized WebP/AVIF copies of
+uploaded photos in a process pool and records them on products.
+``files`` serves them with validators, ranges and an LRU of hot files.
+``remote`` pushes them to Cloudinary in the background when it is enabled.
+Maintenance commands::
+
+    python -m app.media backfill-variants [--force]
+    python -m app.media push-cloudinary
+    python -m app.media gc [--dry-run] [--grace-hours 24]
+"""
+
+from .files import MediaFiles, media_cache
+from .remote import cloudinary_enabled, cloudinary_uploads, resolve_pushed
+from .store import UploadTooLarge, is_content_addressed, store_upload
+from .variants import adopt_rendered_variants, shutdown_image_executor, variant_jobs, variants_for
+
+__all__ = [
+    "MediaFiles",
+    "UploadTooLarge",
+    "adopt_rendered_variants",
+    "cloudinary_enabled",
+    "cloudinary_uploads",
+    "is_content_addressed",
+    "media_cache",
+    "resolve_pushed",
+    "shutdown_image_executor",
+    "store_upload",
+    "variant_jobs",
+    "variants_for",
+]
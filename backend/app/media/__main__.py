@@ -0,0 +1,77 @@
+import argparse
+import asyncio
+import logging
+import sys
+
+from .. import database
+from .remote import cloudinary_enabled, cloudinary_uploads, push_pending
+from .store import collect_garbage
+from .variants import backfill, shutdown_image_executor, variant_jobs
+
+
+async def _backfill_variants(force: bool) -> int:
+    try:
+        return await backfill(force=force)
+    finally:
+        shutdown_image_executor()
+        await database.dispose_engines()
+
+
+async def _push_cloudinary() -> int:
+    try:
+        return await push_pending()
+    finally:
+        await database.dispose_engines()
+
+
+async def _collect_garbage(grace_hours: float, dry_run: bool):
+    try:
+        return await collect_garbage(grace_seconds=grace_hours * 3600, dry_run=dry_run)
+    finally:
+        await database.dispose_engines()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.media", description="Tarel product media")
+    commands = parser.add_subparsers(dest="command", required=True)
+    backfill_parser = commands.add_parser(
+        "backfill-variants", help="render resized variants for product images that have none"
+    )
+    backfill_parser.add_argument("--force", action="store_true", help="also re-render images that have variants")
+    commands.add_parser("push-cloudinary", help="upload product photos still served from MEDIA_ROOT to Cloudinary")
+    gc_parser = commands.add_parser("gc", help="delete product photos no product refers to")
+    gc_parser.add_argument("--dry-run", action="store_true", help="list what would be deleted without deleting")
+    gc_parser.add_argument(
+        "--grace-hours", type=float, default=24, help="keep files changed more recently than this (default 24)"
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.command == "gc":
+        report = asyncio.run(_collect_garbage(args.grace_hours, args.dry_run))
+        for path in report.removed:
+            print(("would remove " if args.dry_run else "removed ") + path)
+        shared = sum(1 for count in report.references.values() if count > 1)
+        print(
+            f"{len(report.references)} photo(s) in use ({shared} shared by several products), "
+            f"{len(report.removed)} unreferenced ({report.freed_bytes / 2 ** 20:.1f} MiB), "
+            f"{report.kept_recent} kept as too recent"
+        )
+        return 0
+
+    if args.command == "push-cloudinary":
+        if not cloudinary_enabled():
+            print("Cloudinary is not configured (USE_CLOUDINARY, CLOUDINARY_CLOUD_NAME)", file=sys.stderr)
+            return 2
+        pushed = asyncio.run(_push_cloudinary())
+        print(f"Pushed {pushed} photo(s) to Cloudinary, {cloudinary_uploads.failed} failed")
+        return 1 if cloudinary_uploads.failed else 0
+
+    rendered = asyncio.run(_backfill_variants(args.force))
+    print(f"Rendered variants for {rendered} image(s), {variant_jobs.failed} failed")
+    return 1 if variant_jobs.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,350 @@
+"""The ``/media`` mount: product photos with validators, ranges and a hot-file cache.
+
+Replaces Starlette's ``StaticFiles``, which stats and opens the file on every
+request and sends no Cache-Control. Here:
+
+* content-addressed files (``store.is_content_addressed``) are sent with a
+  year-long ``immutable`` Cache-Control, so browsers and CDNs stop asking;
+* every file carries an ETag and Last-Modified, and ``If-None-Match`` /
+  ``If-Modified-Since`` are answered with 304;
+* ``Range`` (one range, with ``If-Range``) is answered with 206 or 416;
+* files up to ``MEDIA_CACHE_MAX_FILE_BYTES`` (thumbnails and card images)
+  are kept in an LRU bounded by ``MEDIA_CACHE_BYTES``. A hit on an immutable
+  file touches neither the disk nor a thread; other cached files cost a
+  single stat to check they have not changed. Compressible types (the
+  variant manifests, SVG) are gzipped once when they enter the cache.
+
+The cache is per process. A file the collector deletes (``python -m
+app.media gc``) may still be served from memory until it is evicted. Nothing
+links to such files any more.
+"""
+
+from __future__ import annotations
+
+import gzip
+import mimetypes
+import os
+import stat
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional, Tuple
+
+import anyio
+from fastapi import Request, Response
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from ..config import settings
+from ..http_cache import accepts_gzip, etag_matches
+from .store import is_content_addressed
+
+# A content-addressed URL can never change what it serves
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+STREAM_CHUNK_SIZE = 64 * 1024
+_COMPRESSIBLE = ("application/json", "image/svg+xml", "text/")
+
+
+@dataclass(frozen=True)
+class MediaFile:
+    """What a response needs to know about a file, and its bytes when cached."""
+
+    path: str
+    size: int
+    mtime: float
+    content_type: str
+    etag: str
+    body: Optional[bytes] = None
+    gzipped: Optional[bytes] = None
+    gzip_etag: Optional[str] = None
+
+    @property
+    def last_modified(self) -> str:
+        return formatdate(self.mtime, usegmt=True)
+
+    def same_file(self, stat_result: os.stat_result) -> bool:
+        return _etag(stat_result) == self.etag
+
+
+def _etag(stat_result: os.stat_result) -> str:
+    return f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+
+def _describe(path: str, stat_result: os.stat_result, body: Optional[bytes] = None) -> MediaFile:
+    content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    etag = _etag(stat_result)
+    gzipped = gzip_etag = None
+    if body is not None and content_type.startswith(_COMPRESSIBLE):
+        compressed = gzip.compress(body, compresslevel=9, mtime=0)
+        if len(compressed) < len(body):
+            gzipped, gzip_etag = compressed, f'{etag[:-1]}-gzip"'
+    return MediaFile(
+        path=path,
+        size=stat_result.st_size,
+        mtime=stat_result.st_mtime,
+        content_type=content_type,
+        etag=etag,
+        body=body,
+        gzipped=gzipped,
+        gzip_etag=gzip_etag,
+    )
+
+
+class MediaCache:
+    """Least-recently-used media files, bounded by their total size in bytes."""
+
+    def __init__(self, max_bytes: int, max_file_bytes: int):
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self._files: "OrderedDict[str, MediaFile]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def accepts(self, size: int) -> bool:
+        return 0 < self.max_bytes and size <= min(self.max_file_bytes, self.max_bytes)
+
+    @staticmethod
+    def _weight(entry: MediaFile) -> int:
+        return len(entry.body or b"") + len(entry.gzipped or b"")
+
+    def get(self, relative: str) -> Optional[MediaFile]:
+        with self._lock:
+            entry = self._files.get(relative)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._files.move_to_end(relative)
+            self.hits += 1
+            return entry
+
+    def put(self, relative: str, entry: MediaFile) -> None:
+        with self._lock:
+            previous = self._files.pop(relative, None)
+            if previous is not None:
+                self._bytes -= self._weight(previous)
+            self._files[relative] = entry
+            self._bytes += self._weight(entry)
+            while self._bytes > self.max_bytes and self._files:
+                _, evicted = self._files.popitem(last=False)
+                self._bytes -= self._weight(evicted)
+                self.evictions += 1
+
+    def discard(self, relative: str) -> None:
+        with self._lock:
+            entry = self._files.pop(relative, None)
+            if entry is not None:
+                self._bytes -= self._weight(entry)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._files.clear()
+            self._bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._files),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "max_file_bytes": self.max_file_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+media_cache = MediaCache(settings.MEDIA_CACHE_BYTES, settings.MEDIA_CACHE_MAX_FILE_BYTES)
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """``(first, last)`` for a single ``bytes=`` range.
+
+    Returns None when the header should be ignored and the whole file sent
+    (bad syntax, several ranges), and ``(size, size)`` when the range cannot
+    be satisfied.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, dash, last = spec.strip().partition("-")
+    try:
+        if not dash:
+            return None
+        if not first:
+            # bytes=-N: the last N bytes
+            suffix = int(last)
+            if suffix <= 0:
+                return (size, size)
+            return (max(size - suffix, 0), size - 1)
+        start = int(first)
+        end = int(last) if last else None
+    except ValueError:
+        return None
+    if start < 0 or (end is not None and end < start):
+        return None
+    if start >= size:
+        return (size, size)
+    return (start, size - 1 if end is None else min(end, size - 1))
+
+
+def _if_range_allows(request: Request, entry: MediaFile) -> bool:
+    validator = request.headers.get("if-range")
+    if validator is None:
+        return True
+    validator = validator.strip()
+    if validator.startswith(('"', "W/")):
+        # If-Range needs the strong comparison
+        return validator == entry.etag
+    return validator == entry.last_modified
+
+
+def _not_modified(request: Request, entry: MediaFile) -> bool:
+    if request.headers.get("if-none-match") is not None:
+        return etag_matches(request, entry.etag, entry.gzip_etag or entry.etag)
+    since = request.headers.get("if-modified-since")
+    if since is None:
+        return False
+    try:
+        return int(entry.mtime) <= parsedate_to_datetime(since).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+
+async def _stream(path: str, start: int, length: int):
+    async with await anyio.open_file(path, "rb") as handle:
+        await handle.seek(start)
+        while length > 0:
+            chunk = await handle.read(min(STREAM_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+class MediaFiles:
+    """ASGI app serving ``directory``; mounted at ``MEDIA_URL``."""
+
+    def __init__(self, directory, cache: MediaCache):
+        self.directory = os.path.realpath(directory)
+        self.cache = cache
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        request = Request(scope, receive)
+        response = await self.get_response(request)
+        await response(scope, receive, send)
+
+    def _relative_path(self, request: Request) -> Optional[str]:
+        root_path = request.scope.get("root_path", "")
+        path = request.scope["path"]
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        parts = [part for part in path.split("/") if part]
+        # No traversal, and no dotfiles (in-progress uploads are ".<uuid>.partial")
+        if not parts or any(part.startswith(".") or "\x00" in part for part in parts):
+            return None
+        return "/".join(parts)
+
+    def _stat(self, relative: str) -> Tuple[str, Optional[os.stat_result]]:
+        full_path = os.path.realpath(os.path.join(self.directory, relative))
+        if os.path.commonpath([full_path, self.directory]) != self.directory:
+            return full_path, None
+        try:
+            stat_result = os.stat(full_path)
+        except (FileNotFoundError, NotADirectoryError):
+            return full_path, None
+        return full_path, stat_result if stat.S_ISREG(stat_result.st_mode) else None
+
+    async def _lookup(self, relative: str, immutable: bool) -> Optional[MediaFile]:
+        entry = self.cache.get(relative)
+        if entry is not None:
+            if immutable:
+                return entry
+            # Mutable names can be overwritten in place; one stat (not worth a
+            # thread hop) checks the cached copy is still current
+            try:
+                current = os.stat(entry.path)
+            except OSError:
+                current = None
+            if current is not None and entry.same_file(current):
+                return entry
+            self.cache.discard(relative)
+
+        full_path, stat_result = await anyio.to_thread.run_sync(self._stat, relative)
+        if stat_result is None:
+            return None
+        if not self.cache.accepts(stat_result.st_size):
+            return _describe(full_path, stat_result)
+
+        def read() -> MediaFile:
+            with open(full_path, "rb") as handle:
+                body = handle.read()
+                # Validators from the handle that was read, so a concurrent
+                # replace can't pair new bytes with the old ETag
+                return _describe(full_path, os.fstat(handle.fileno()), body)
+
+        entry = await anyio.to_thread.run_sync(read)
+        if len(entry.body) == entry.size:
+            self.cache.put(relative, entry)
+        return entry
+
+    async def get_response(self, request: Request) -> Response:
+        if request.method not in ("GET", "HEAD"):
+            return Response(status_code=405, headers={"Allow": "GET, HEAD"})
+        relative = self._relative_path(request)
+        immutable = relative is not None and is_content_addressed(relative)
+        entry = await self._lookup(relative, immutable) if relative is not None else None
+        if entry is None:
+            return Response("Not Found", status_code=404, media_type="text/plain")
+
+        headers = {"Accept-Ranges": "bytes", "Last-Modified": entry.last_modified}
+        if immutable:
+            headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        if entry.gzipped is not None:
+            headers["Vary"] = "Accept-Encoding"
+
+        use_gzip = entry.gzipped is not None and accepts_gzip(request)
+        headers["ETag"] = entry.gzip_etag if use_gzip else entry.etag
+        if _not_modified(request, entry):
+            return Response(status_code=304, headers=headers)
+
+        range_header = request.headers.get("range")
+        byte_range = None
+        if range_header and request.method == "GET" and _if_range_allows(request, entry):
+            byte_range = _parse_range(range_header, entry.size)
+        if byte_range is not None:
+            # Ranges address the stored bytes, never a content coding
+            headers["ETag"] = entry.etag
+            first, last = byte_range
+            if first >= entry.size:
+                headers["Content-Range"] = f"bytes */{entry.size}"
+                return Response(status_code=416, headers=headers)
+            headers["Content-Range"] = f"bytes {first}-{last}/{entry.size}"
+            return self._body(entry, first, last - first + 1, 206, headers, request.method)
+
+        if use_gzip:
+            headers["Content-Encoding"] = "gzip"
+            return Response(content=entry.gzipped, media_type=entry.content_type, headers=headers)
+        return self._body(entry, 0, entry.size, 200, headers, request.method)
+
+    @staticmethod
+    def _body(entry: MediaFile, start: int, length: int, status_code: int, headers: dict, method: str) -> Response:
+        if entry.body is not None:
+            return Response(
+                content=entry.body[start : start + length],
+                status_code=status_code,
+                media_type=entry.content_type,
+                headers=headers,
+            )
+        headers["Content-Length"] = str(length)
+        if method == "HEAD":
+            return Response(status_code=status_code, media_type=entry.content_type, headers=headers)
+        return StreamingResponse(
+            _stream(entry.path, start, length), status_code=status_code, media_type=entry.content_type, headers=headers
+        )
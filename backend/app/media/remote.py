@@ -0,0 +1,251 @@
+"""Pushing uploaded product photos to Cloudinary off the request path.
+
+With ``USE_CLOUDINARY`` on, ``POST /admin/products/upload-image`` spools the
+photo into the local store (``store.store_upload``) and answers at once with
+its ``/media`` URL. That URL is provisional but works immediately. A
+background task then uploads the spooled file, retrying with exponential
+backoff. Once the upload succeeds, the Cloudinary URL is recorded in
+``remote_images`` and every product showing the provisional URL is switched
+to it, in one transaction. A product saved later with the provisional URL is
+switched as it is saved (``resolve_pushed``), whichever worker saves it. One
+saved before the push finished queues ``CloudinaryUploads.follow``. That
+waits for this worker's push, then switches the product to the recorded URL,
+or pushes the photo itself if nothing is recorded. Nothing depends on which
+worker ran the push. The spooled file stays until the collector finds it
+unreferenced.
+
+The Cloudinary public id is the photo's content hash, so uploading the same
+photo again is a no-op on their side. Pushes lost to a restart are retried
+with::
+
+    python -m app.media push-cloudinary
+
+``cloudinary_uploads.client`` is anything with ``upload(path, public_id) ->
+url``. ``LocalStandIn`` replaces the SDK in tests and local development.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import weakref
+from pathlib import Path
+from typing import Dict, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from .. import database
+from ..catalog import catalog_cache
+from ..config import settings
+from ..models import Product, RemoteImage
+from .variants import local_image_path, products_showing
+
+logger = logging.getLogger("tarel.media")
+
+CLOUDINARY_FOLDER = "tarel/products"
+
+
+def cloudinary_enabled() -> bool:
+    return bool(settings.USE_CLOUDINARY and settings.CLOUDINARY_CLOUD_NAME)
+
+
+class CloudinaryClient:
+    """The Cloudinary SDK, configured on first use."""
+
+    def __init__(self):
+        self._configured = False
+
+    def upload(self, path: str, public_id: str) -> str:
+        # Imported on demand: the SDK is only needed when Cloudinary is enabled
+        import cloudinary
+        import cloudinary.uploader
+
+        if not self._configured:
+            cloudinary.config(
+                cloud_name=settings.CLOUDINARY_CLOUD_NAME,
+                api_key=settings.CLOUDINARY_API_KEY,
+                api_secret=settings.CLOUDINARY_API_SECRET,
+                secure=True,
+            )
+            self._configured = True
+        result = cloudinary.uploader.upload(
+            path, folder=CLOUDINARY_FOLDER, public_id=public_id, resource_type="image", overwrite=False
+        )
+        return result["secure_url"]
+
+
+class LocalStandIn:
+    """Keeps "uploaded" photos in memory and hands out Cloudinary-shaped URLs.
+
+    ``failures`` makes that many calls raise first, to exercise the retries.
+    """
+
+    def __init__(self, base_url: str = "https://res.cloudinary.test/tarel/image/upload", failures: int = 0):
+        self.base_url = base_url.rstrip("/")
+        self.failures = failures
+        self.calls = 0
+        self.uploads: Dict[str, bytes] = {}
+
+    def upload(self, path: str, public_id: str) -> str:
+        self.calls += 1
+        if self.failures > 0:
+            self.failures -= 1
+            raise ConnectionError("Cloudinary stand-in: simulated failure")
+        self.uploads[public_id] = Path(path).read_bytes()
+        return f"{self.base_url}/{CLOUDINARY_FOLDER}/{public_id}{Path(path).suffix}"
+
+
+async def resolve_pushed(db, image_url: Optional[str]) -> Optional[str]:
+    """The Cloudinary URL for a provisional ``image_url`` whose push has finished, else ``image_url``."""
+    relative = local_image_path(image_url)
+    if relative is None:
+        return image_url
+    return await db.scalar(select(RemoteImage.url).where(RemoteImage.path == relative)) or image_url
+
+
+async def _pushed(relative: str) -> Optional[str]:
+    async with database.AsyncSessionLocal() as db:
+        return await db.scalar(select(RemoteImage.url).where(RemoteImage.path == relative))
+
+
+async def _swap(relative: str, remote_url: str) -> int:
+    """Record the push and point the products showing ``relative`` at ``remote_url``; returns how many."""
+    async with database.AsyncSessionLocal(bind=database.get_write_async_engine()) as db:
+        dialect = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+        # Another worker may have pushed the same photo; its URL is the same
+        await db.execute(
+            dialect.insert(RemoteImage)
+            .values(path=relative, url=remote_url)
+            .on_conflict_do_nothing(index_elements=["path"])
+        )
+        matching = await products_showing(db, relative)
+        if matching:
+            # Cloudinary resizes on delivery, so the local variants go with the local URL
+            await db.execute(
+                update(Product)
+                .where(Product.id.in_([product_id for product_id, _ in matching]))
+                .values(image_url=remote_url, image_variants=None)
+            )
+        await db.commit()
+    if matching:
+        catalog_cache.invalidate()
+    return len(matching)
+
+
+class CloudinaryUploads:
+    """Pushes in flight in this process, at most one per spooled photo."""
+
+    def __init__(self, client=None):
+        self.client = client or CloudinaryClient()
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._limits: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self.completed = 0
+        self.failed = 0
+        self.retries = 0
+
+    def submit(self, relative: str) -> asyncio.Task:
+        task = self._tasks.get(relative)
+        if task is None or task.done():
+            task = asyncio.get_running_loop().create_task(self._run(relative))
+            self._tasks[relative] = task
+            task.add_done_callback(lambda done: self._forget(relative, done))
+        return task
+
+    def _forget(self, relative: str, task: asyncio.Task) -> None:
+        if self._tasks.get(relative) is task:
+            del self._tasks[relative]
+
+    async def _upload(self, relative: str) -> str:
+        path = Path(settings.MEDIA_ROOT) / relative
+        loop = asyncio.get_running_loop()
+        limit = self._limits.setdefault(loop, asyncio.Semaphore(max(settings.CLOUDINARY_UPLOAD_CONCURRENCY, 1)))
+        attempts = max(settings.CLOUDINARY_UPLOAD_ATTEMPTS, 1)
+        attempt = 1
+        while True:
+            try:
+                async with limit:
+                    # The SDK blocks on the network; it gets a thread, not the loop
+                    return await loop.run_in_executor(None, self.client.upload, str(path), path.stem)
+            except Exception:
+                if attempt >= attempts:
+                    raise
+            delay = settings.CLOUDINARY_UPLOAD_RETRY_SECONDS * 2 ** (attempt - 1)
+            logger.warning("Cloudinary upload of %s failed (attempt %d), retrying in %.1fs", relative, attempt, delay)
+            self.retries += 1
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def _run(self, relative: str) -> None:
+        try:
+            remote_url = await _pushed(relative)
+            if remote_url is None:
+                if not (Path(settings.MEDIA_ROOT) / relative).exists():
+                    # Spooled on another worker, which pushes and switches it
+                    logger.info("Not pushing %s: the spooled file is not on this worker", relative)
+                    return
+                remote_url = await self._upload(relative)
+            await _swap(relative, remote_url)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.failed += 1
+            logger.exception("Pushing %s to Cloudinary failed; it stays served from /media", relative)
+        else:
+            self.completed += 1
+
+    async def queue(self, relative: str) -> None:
+        # Shaped for BackgroundTasks: enqueue and return without waiting
+        self.submit(relative)
+
+    async def follow(self, image_url: Optional[str]) -> None:
+        """Switch a product just saved with ``image_url`` if that is a provisional URL.
+
+        Queued after the save commits: a push still running in this worker is
+        awaited, and one that finished on any worker has recorded its URL.
+        """
+        relative = local_image_path(image_url)
+        if relative is None:
+            return
+        in_flight = self._tasks.get(relative)
+        if in_flight is not None:
+            await asyncio.wait([in_flight])
+        remote_url = await _pushed(relative)
+        if remote_url is None:
+            self.submit(relative)
+        else:
+            await _swap(relative, remote_url)
+
+    def cancel(self) -> None:
+        for task in list(self._tasks.values()):
+            task.cancel()
+        self._tasks.clear()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": cloudinary_enabled(),
+            "pending": len(self._tasks),
+            "completed": self.completed,
+            "failed": self.failed,
+            "retries": self.retries,
+        }
+
+
+cloudinary_uploads = CloudinaryUploads()
+
+
+async def push_pending() -> int:
+    """Push every product photo still served from ``MEDIA_ROOT``; returns how many."""
+    async with database.AsyncSessionLocal() as db:
+        urls = (await db.scalars(select(Product.image_url).where(Product.image_url.is_not(None)))).all()
+    pending = sorted({local_image_path(url) for url in urls} - {None})
+    present = []
+    for relative in pending:
+        if (Path(settings.MEDIA_ROOT) / relative).exists():
+            present.append(relative)
+        else:
+            logger.warning("Skipping %s: the spooled file is missing", relative)
+    await asyncio.gather(*(cloudinary_uploads.submit(relative) for relative in present))
+    return len(present)
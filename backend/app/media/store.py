@@ -0,0 +1,175 @@
+"""Content-addressed storage for product photos under ``MEDIA_ROOT/products``.
+
+An upload is hashed while it streams to a temporary file and then renamed to
+``<sha256><ext>``. Uploading the same photo again finds the file already in
+place and reuses it, so the disk holds one copy however many times it is
+uploaded or however many products show it. Because a name can only ever hold
+one content, its URL never changes meaning and ``/media`` can tell browsers
+and CDNs to cache it for good.
+
+Nothing deletes a photo when a product stops using it. ``collect_garbage``
+counts the references from ``Product.image_url`` and removes what nothing
+points at::
+
+    python -m app.media gc [--dry-run] [--grace-hours 24]
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import re
+import shutil
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO, Dict
+
+from sqlalchemy import select
+
+from .. import database
+from ..config import settings
+from ..models import Product
+from .variants import local_image_path
+
+logger = logging.getLogger("tarel.media")
+
+PRODUCTS_DIR = "products"
+CHUNK_SIZE = 1024 * 1024
+# <64 hex digits>.<ext>; uploads from before content addressing use uuid4 hex
+_HASHED_STEM = re.compile(r"[0-9a-f]{64}")
+_HASHED_NAME = re.compile(r"[0-9a-f]{64}\.[a-z0-9]+")
+_PARTIAL_SUFFIX = ".partial"
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+@dataclass
+class StoredImage:
+    path: str
+    size: int
+    deduplicated: bool
+
+
+def products_dir() -> Path:
+    target = Path(settings.MEDIA_ROOT) / PRODUCTS_DIR
+    target.mkdir(parents=True, exist_ok=True)
+    return target
+
+
+def is_content_addressed(relative: str) -> bool:
+    """True for ``products/<sha256>.<ext>`` and anything rendered from one."""
+    parts = relative.split("/")
+    if len(parts) == 2 and parts[0] == PRODUCTS_DIR:
+        return _HASHED_NAME.fullmatch(parts[1]) is not None
+    # products/variants/<sha256>/<size>.<fmt>
+    if len(parts) == 4 and parts[:2] == [PRODUCTS_DIR, "variants"]:
+        return _HASHED_STEM.fullmatch(parts[2]) is not None
+    return False
+
+
+def store_upload(source: BinaryIO, extension: str, max_bytes: int) -> StoredImage:
+    """Stream ``source`` into the store and return where it landed.
+
+    Raises ``UploadTooLarge`` once more than ``max_bytes`` have been read,
+    leaving nothing behind.
+    """
+    directory = products_dir()
+    partial = directory / f".{uuid.uuid4().hex}{_PARTIAL_SUFFIX}"
+    digest = hashlib.sha256()
+    total = 0
+    try:
+        with partial.open("wb") as buffer:
+            while True:
+                chunk = source.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                total += len(chunk)
+                if total > max_bytes:
+                    raise UploadTooLarge(f"Image exceeds {max_bytes // (1024 * 1024)} MB limit")
+                digest.update(chunk)
+                buffer.write(chunk)
+
+        filename = f"{digest.hexdigest()}{extension}"
+        destination = directory / filename
+        if destination.exists():
+            # Refresh the mtime so the collector's grace period starts over
+            # for a file that is about to be referenced again
+            os.utime(destination)
+            deduplicated = True
+        else:
+            # Atomic: a concurrent upload of the same photo either finds the
+            # complete file or replaces it with identical bytes
+            os.replace(partial, destination)
+            deduplicated = False
+    finally:
+        partial.unlink(missing_ok=True)
+    return StoredImage(path=f"{PRODUCTS_DIR}/{filename}", size=total, deduplicated=deduplicated)
+
+
+@dataclass
+class GarbageReport:
+    references: Dict[str, int] = field(default_factory=dict)
+    removed: list = field(default_factory=list)
+    kept_recent: int = 0
+    freed_bytes: int = 0
+
+
+def _size(path: Path) -> int:
+    if path.is_dir():
+        return sum(child.stat().st_size for child in path.rglob("*") if child.is_file())
+    return path.stat().st_size
+
+
+async def collect_garbage(grace_seconds: float = 24 * 3600, dry_run: bool = False) -> GarbageReport:
+    """Remove photos (and their variants) that no product's ``image_url`` points at.
+
+    Files younger than ``grace_seconds`` are kept: an admin uploads a photo
+    before saving the product that uses it.
+    """
+    async with database.AsyncSessionLocal(bind=database.get_write_async_engine()) as db:
+        urls = (await db.scalars(select(Product.image_url).where(Product.image_url.is_not(None)))).all()
+    references = Counter(relative for relative in map(local_image_path, urls) if relative)
+    report = GarbageReport(references=dict(references))
+
+    directory = Path(settings.MEDIA_ROOT) / PRODUCTS_DIR
+    if not directory.is_dir():
+        return report
+    cutoff = time.time() - grace_seconds
+    variants = directory / "variants"
+
+    candidates = []
+    for entry in directory.iterdir():
+        if entry == variants:
+            continue
+        relative = f"{PRODUCTS_DIR}/{entry.name}"
+        if entry.is_file() and references[relative] == 0:
+            candidates.append((entry, variants / entry.stem))
+    if variants.is_dir():
+        # Variants whose original is already gone
+        stems = {entry.stem for entry in directory.iterdir() if entry.is_file()}
+        candidates.extend((folder, None) for folder in variants.iterdir() if folder.name not in stems)
+
+    for path, variant_folder in candidates:
+        if path.stat().st_mtime > cutoff:
+            report.kept_recent += 1
+            continue
+        freed = _size(path) + (_size(variant_folder) if variant_folder and variant_folder.is_dir() else 0)
+        report.removed.append(str(path.relative_to(settings.MEDIA_ROOT)))
+        report.freed_bytes += freed
+        if dry_run:
+            continue
+        if variant_folder is not None:
+            shutil.rmtree(variant_folder, ignore_errors=True)
+        if path.is_dir():
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            path.unlink(missing_ok=True)
+        logger.info("Removed unreferenced %s", path)
+    return report
+
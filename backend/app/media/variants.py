@@ -0,0 +1,277 @@
+"""Resized WebP/AVIF variants of product photos stored under ``MEDIA_ROOT``.
+
+A local upload (``POST /admin/products/upload-image``) queues a render job
+once the original is on disk. The job runs ``render_variants`` in a
+dedicated process pool, so Pillow's decode/resize/encode work never holds
+the event loop or a request thread. The result is a fixed set of sizes
+(``VARIANTS``), each in every format this Pillow build can write. The files
+go to ``products/variants/<stem>/`` next to the original, together with a
+``manifest.json``.
+
+When a job finishes, the variant URLs are written to ``image_variants`` on
+every product whose ``image_url`` points at that original, and the catalog
+snapshot is invalidated. A product saved with an image that was rendered
+earlier picks its variants up from the manifest. A render that finishes
+while such a save is in flight is seen by neither side, so the save checks
+the manifest again once it has committed (``adopt_rendered_variants``).
+Listings can then send the ``card`` size rather than the full upload.
+
+Images uploaded before this existed, or whose job was lost on shutdown, can
+be rendered afterwards with::
+
+    python -m app.media backfill-variants
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Sequence
+from urllib.parse import urlsplit
+
+from PIL import Image, ImageOps, features
+from sqlalchemy import select, update
+
+from .. import database
+from ..catalog import catalog_cache
+from ..config import settings
+from ..models import Product
+
+logger = logging.getLogger("tarel.media")
+
+# Longest edge in pixels; roughly 2x the CSS size each is shown at
+VARIANTS = {"thumbnail": 200, "card": 640, "detail": 1600}
+_SAVE_OPTIONS = {
+    "avif": {"quality": 55, "speed": 8},
+    "webp": {"quality": 80, "method": 4},
+}
+MANIFEST = "manifest.json"
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def available_formats() -> list:
+    """Variant formats this Pillow build can encode, smallest output first."""
+    return [fmt for fmt in _SAVE_OPTIONS if features.check(fmt)]
+
+
+def variant_dir(original: Path) -> Path:
+    return original.parent / "variants" / original.stem
+
+
+def render_variants(source: str, target: str, formats: Sequence[str]) -> dict:
+    """Write every size of ``source`` into ``target`` and return the manifest.
+
+    Runs in a pool worker. Each file is written under a temporary name and
+    renamed into place, so a reader never sees a half-written variant.
+    """
+    os.makedirs(target, exist_ok=True)
+    largest = max(VARIANTS.values())
+    with Image.open(source) as image:
+        # JPEG can decode straight to a smaller scale, far cheaper than
+        # decoding the full photo and resizing it
+        image.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ("RGBA", "LA") or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+    manifest = {}
+    # Largest first, so each size is resized from the one before it
+    for name, edge in sorted(VARIANTS.items(), key=lambda item: -item[1]):
+        image.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+        entry = {"width": image.width, "height": image.height}
+        for fmt in formats:
+            filename = f"{name}.{fmt}"
+            partial = os.path.join(target, f".{filename}.partial")
+            image.save(partial, format=fmt.upper(), **_SAVE_OPTIONS[fmt])
+            os.replace(partial, os.path.join(target, filename))
+            entry[fmt] = filename
+        manifest[name] = entry
+
+    partial = os.path.join(target, f".{MANIFEST}.partial")
+    with open(partial, "w") as handle:
+        json.dump(manifest, handle)
+    os.replace(partial, os.path.join(target, MANIFEST))
+    return manifest
+
+
+def local_image_path(image_url: Optional[str]) -> Optional[str]:
+    """``products/<file>`` for an image served from ``MEDIA_ROOT``, else None."""
+    if not image_url:
+        return None
+    prefix = "/" + settings.MEDIA_URL.strip("/") + "/"
+    path = urlsplit(image_url).path
+    if not path.startswith(prefix):
+        return None
+    relative = path[len(prefix):]
+    return relative if relative.startswith("products/") and "/" not in relative[len("products/"):] else None
+
+
+def variant_urls(image_url: str, manifest: dict) -> Dict[str, dict]:
+    """Turn a manifest's file names into URLs alongside ``image_url``."""
+    base, _, filename = image_url.rpartition("/")
+    folder = f"{base}/variants/{Path(filename).stem}"
+    return {
+        name: {key: f"{folder}/{value}" if isinstance(value, str) else value for key, value in entry.items()}
+        for name, entry in manifest.items()
+    }
+
+
+def variants_for(image_url: Optional[str]) -> Optional[Dict[str, dict]]:
+    """Variant URLs for ``image_url`` if they have already been rendered."""
+    relative = local_image_path(image_url)
+    if relative is None:
+        return None
+    manifest_path = variant_dir(Path(settings.MEDIA_ROOT) / relative) / MANIFEST
+    try:
+        manifest = json.loads(manifest_path.read_text())
+    except (OSError, ValueError):
+        return None
+    return variant_urls(image_url, manifest)
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # "spawn", as for password hashing: workers must not inherit
+                # the parent's threads and open database connections
+                _executor = ProcessPoolExecutor(
+                    max_workers=settings.IMAGE_VARIANT_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _executor
+
+
+def shutdown_image_executor() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+async def _render(relative: str) -> dict:
+    original = Path(settings.MEDIA_ROOT) / relative
+    executor = _get_executor() if settings.IMAGE_VARIANT_WORKERS > 0 else None
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor, render_variants, str(original), str(variant_dir(original)), available_formats()
+    )
+
+
+async def adopt_rendered_variants(db, product: Product) -> bool:
+    """Store variants on ``product``, just committed without them, whose
+    render finished after ``variants_for`` was consulted but before the commit
+    (so the job's ``_record`` did not find it yet). Commits if it found any."""
+    if product.image_variants is not None:
+        return False
+    variants = variants_for(product.image_url)
+    if variants is None:
+        return False
+    product.image_variants = variants
+    await db.commit()
+    return True
+
+
+async def products_showing(db, relative: str) -> list:
+    """``(id, image_url)`` of every product whose image is ``relative`` under ``MEDIA_ROOT``."""
+    products = (
+        await db.execute(select(Product.id, Product.image_url).where(Product.image_url.endswith("/" + relative)))
+    ).all()
+    # endswith() alone would also match the same path outside MEDIA_URL
+    return [(product_id, url) for product_id, url in products if local_image_path(url) == relative]
+
+
+async def _record(relative: str, manifest: dict) -> int:
+    """Store variant URLs on the products showing ``relative``; returns how many."""
+    async with database.AsyncSessionLocal(bind=database.get_write_async_engine()) as db:
+        matching = await products_showing(db, relative)
+        for product_id, url in matching:
+            await db.execute(
+                update(Product).where(Product.id == product_id).values(image_variants=variant_urls(url, manifest))
+            )
+        await db.commit()
+    if matching:
+        catalog_cache.invalidate()
+    return len(matching)
+
+
+class VariantJobs:
+    """Render jobs in flight in this process, at most one per original."""
+
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.completed = 0
+        self.failed = 0
+
+    def submit(self, relative: str) -> asyncio.Task:
+        task = self._tasks.get(relative)
+        if task is None or task.done():
+            task = asyncio.get_running_loop().create_task(self._run(relative))
+            self._tasks[relative] = task
+            task.add_done_callback(lambda done: self._forget(relative, done))
+        return task
+
+    def _forget(self, relative: str, task: asyncio.Task) -> None:
+        if self._tasks.get(relative) is task:
+            del self._tasks[relative]
+
+    async def _run(self, relative: str) -> None:
+        try:
+            manifest = await _render(relative)
+            await _record(relative, manifest)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.failed += 1
+            logger.exception("Rendering image variants for %s failed", relative)
+        else:
+            self.completed += 1
+
+    async def queue(self, relative: str) -> None:
+        # Shaped for BackgroundTasks: enqueue and return without waiting
+        self.submit(relative)
+
+    def cancel(self) -> None:
+        for task in list(self._tasks.values()):
+            task.cancel()
+        self._tasks.clear()
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._tasks),
+            "completed": self.completed,
+            "failed": self.failed,
+            "workers": settings.IMAGE_VARIANT_WORKERS,
+            "formats": available_formats(),
+        }
+
+
+variant_jobs = VariantJobs()
+
+
+async def backfill(force: bool = False) -> int:
+    """Render variants for every product image under ``MEDIA_ROOT`` missing them."""
+    async with database.AsyncSessionLocal() as db:
+        rows = (
+            await db.execute(select(Product.image_url, Product.image_variants).where(Product.image_url.is_not(None)))
+        ).all()
+    pending = sorted({local_image_path(url) for url, variants in rows if force or not variants} - {None})
+    present = []
+    for relative in pending:
+        if (Path(settings.MEDIA_ROOT) / relative).exists():
+            present.append(relative)
+        else:
+            logger.warning("Skipping %s: the original is missing", relative)
+    # All queued at once; the pool size bounds how many render together
+    await asyncio.gather(*(variant_jobs.submit(relative) for relative in present))
+    return len(present)
@@ -0,0 +1,16 @@
+"""Versioned schema migrations.
+
+Each module in ``app/migrations/versions`` named ``v<NNNN>_<slug>.py`` defines
+``upgrade(conn)`` and optionally ``transactional = False`` for operations that
+cannot run inside a transaction, such as ``CREATE INDEX CONCURRENTLY``, and
+``required_before_serving``, the dialects on which workers refuse to start
+while it is pending.
+Applied versions are recorded in ``schema_migrations``. Run with::
+
+    python -m app.migrations upgrade
+    python -m app.migrations status
+"""
+
+from .runner import Migration, discover, pending_migrations, status, upgrade
+
+__all__ = ["Migration", "discover", "pending_migrations", "status", "upgrade"]
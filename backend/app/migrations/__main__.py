@@ -0,0 +1,30 @@
+import argparse
+import logging
+import sys
+
+from .runner import status, upgrade
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.migrations", description="Tarel schema migrations")
+    commands = parser.add_subparsers(dest="command", required=True)
+    upgrade_parser = commands.add_parser("upgrade", help="apply pending migrations")
+    upgrade_parser.add_argument("--to", type=int, default=None, help="stop after this version")
+    commands.add_parser("status", help="list migrations and whether they are applied")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.command == "upgrade":
+        applied = upgrade(target=args.to)
+        print(f"Applied {len(applied)} migration(s)" + (f": {applied}" if applied else ""))
+        return 0
+
+    for migration, is_applied in status():
+        marker = "x" if is_applied else " "
+        print(f"[{marker}] {migration.version:04d} {migration.name} - {migration.description}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
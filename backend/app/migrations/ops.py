@@ -0,0 +1,73 @@
+"""Helpers for writing migrations that are safe to run against a live database."""
+
+from __future__ import annotations
+
+from typing import Optional, Sequence
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+
+def _autocommit(conn: Connection) -> bool:
+    return conn.get_execution_options().get("isolation_level") == "AUTOCOMMIT"
+
+
+def has_column(conn: Connection, table: str, column: str) -> bool:
+    return any(col["name"] == column for col in inspect(conn).get_columns(table))
+
+
+def add_column(conn: Connection, table: str, column: str, ddl_type: str) -> bool:
+    """Add a nullable column unless it exists. Returns True when added."""
+    if has_column(conn, table, column):
+        return False
+    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}"))
+    return True
+
+
+def create_index(
+    conn: Connection,
+    name: str,
+    table: str,
+    columns: Sequence[str],
+    unique: bool = False,
+    where: Optional[str] = None,
+    using: Optional[str] = None,
+) -> None:
+    """Create an index if missing.
+
+    On PostgreSQL inside a non-transactional migration the index is built
+    ``CONCURRENTLY`` so writes to ``table`` are not blocked. A concurrent build
+    that failed part-way leaves an INVALID index behind; it is dropped and
+    rebuilt rather than silently kept.
+    """
+    concurrently = conn.dialect.name == "postgresql" and _autocommit(conn)
+    if concurrently:
+        invalid = conn.execute(
+            text(
+                "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE c.relname = :name AND NOT i.indisvalid"
+            ),
+            {"name": name},
+        ).first()
+        if invalid:
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+
+    parts = ["CREATE"]
+    if unique:
+        parts.append("UNIQUE")
+    parts.append("INDEX")
+    if concurrently:
+        parts.append("CONCURRENTLY")
+    parts.append(f"IF NOT EXISTS {name} ON {table}")
+    if using:
+        parts.append(f"USING {using}")
+    parts.append(f"({', '.join(columns)})")
+    if where:
+        parts.append(f"WHERE {where}")
+    conn.execute(text(" ".join(parts)))
+
+
+def drop_index(conn: Connection, name: str) -> None:
+    concurrently = conn.dialect.name == "postgresql" and _autocommit(conn)
+    keyword = "DROP INDEX CONCURRENTLY" if concurrently else "DROP INDEX"
+    conn.execute(text(f"{keyword} IF EXISTS {name}"))
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import importlib
+import logging
+import pkgutil
+import re
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from types import ModuleType
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from ..config import settings
+from ..database import get_engine
+from . import versions
+
+logger = logging.getLogger("tarel.migrations")
+
+_VERSION_PATTERN = re.compile(r"^v(\d{4})_(\w+)$")
+# Arbitrary constant shared by every runner so concurrent deploys serialise.
+_ADVISORY_LOCK_ID = 7_341_902_118
+
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String(200), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    module: ModuleType
+
+    @property
+    def transactional(self) -> bool:
+        return getattr(self.module, "transactional", True)
+
+    def blocks_serving(self, dialect: str) -> bool:
+        """Whether workers must not start on ``dialect`` while this is pending."""
+        return dialect in getattr(self.module, "required_before_serving", ())
+
+    @property
+    def description(self) -> str:
+        doc = (self.module.__doc__ or "").strip()
+        return doc.splitlines()[0] if doc else self.name
+
+
+def discover() -> List[Migration]:
+    found = []
+    for info in pkgutil.iter_modules(versions.__path__):
+        match = _VERSION_PATTERN.match(info.name)
+        if not match:
+            continue
+        module = importlib.import_module(f"{versions.__name__}.{info.name}")
+        found.append(Migration(int(match.group(1)), match.group(2), module))
+    found.sort(key=lambda migration: migration.version)
+    seen = set()
+    for migration in found:
+        if migration.version in seen:
+            raise RuntimeError(f"Duplicate migration version {migration.version:04d}")
+        seen.add(migration.version)
+    return found
+
+
+def _applied_versions(conn: Connection) -> set[int]:
+    schema_migrations.create(conn, checkfirst=True)
+    return set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+
+def pending_migrations(conn: Connection) -> List[Migration]:
+    """Migrations not yet recorded; read-only, safe to call at startup."""
+    if not conn.dialect.has_table(conn, schema_migrations.name):
+        return discover()
+    applied = set(conn.execute(select(schema_migrations.c.version)).scalars())
+    return [migration for migration in discover() if migration.version not in applied]
+
+
+@contextmanager
+def _migration_lock(engine: Engine) -> Iterator[None]:
+    if engine.dialect.name != "postgresql":
+        yield
+        return
+    with engine.connect() as lock_conn:
+        lock_conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": _ADVISORY_LOCK_ID})
+        lock_conn.commit()
+        try:
+            yield
+        finally:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": _ADVISORY_LOCK_ID})
+            lock_conn.commit()
+
+
+def _record(conn: Connection, migration: Migration) -> None:
+    conn.execute(
+        schema_migrations.insert().values(
+            version=migration.version,
+            name=migration.name,
+            applied_at=datetime.utcnow(),
+        )
+    )
+
+
+def _apply(engine: Engine, migration: Migration) -> None:
+    logger.info("Applying migration %04d %s", migration.version, migration.name)
+    if migration.transactional:
+        with engine.begin() as conn:
+            if conn.dialect.name == "postgresql" and settings.MIGRATION_LOCK_TIMEOUT_MS > 0:
+                # Fail fast instead of queueing behind live traffic for a lock
+                conn.execute(text(f"SET LOCAL lock_timeout = {int(settings.MIGRATION_LOCK_TIMEOUT_MS)}"))
+            migration.module.upgrade(conn)
+            _record(conn, migration)
+        return
+
+    # Non-transactional steps must be idempotent: a failure part-way is
+    # retried from the start on the next run.
+    with engine.connect() as conn:
+        autocommit = conn.execution_options(isolation_level="AUTOCOMMIT")
+        migration.module.upgrade(autocommit)
+    with engine.begin() as conn:
+        _record(conn, migration)
+
+
+def upgrade(engine: Optional[Engine] = None, target: Optional[int] = None) -> List[int]:
+    engine = engine or get_engine()
+    applied_now = []
+    with _migration_lock(engine):
+        with engine.begin() as conn:
+            applied = _applied_versions(conn)
+        for migration in discover():
+            if target is not None and migration.version > target:
+                break
+            if migration.version in applied:
+                continue
+            _apply(engine, migration)
+            applied_now.append(migration.version)
+    return applied_now
+
+
+def status(engine: Optional[Engine] = None) -> List[Tuple[Migration, bool]]:
+    """Every migration and whether it is applied; read-only, like ``pending_migrations``."""
+    engine = engine or get_engine()
+    with engine.connect() as conn:
+        pending = {migration.version for migration in pending_migrations(conn)}
+    return [(migration, migration.version not in pending) for migration in discover()]
@@ -0,0 +1,155 @@
+"""Baseline schema as created by create_all before versioned migrations.
+
+Tables are a frozen copy of the models at the time, so later model edits do
+not change what this migration builds. Only the shared ``GUID`` column type
+is imported, so new SQLite databases start with binary UUIDs (see 0003).
+Existing databases are adopted: tables that already exist are left alone and
+the contact columns from ``docs/migrations/20241113_add_user_contact_fields.sql``
+are added if missing.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    Enum,
+    Float,
+    ForeignKey,
+    MetaData,
+    String,
+    Table,
+    Text,
+)
+
+from ...models import GUID
+from ..ops import add_column, create_index
+
+metadata = MetaData()
+
+role_enum = Enum("user", "admin", name="roleenum")
+order_status_enum = Enum(
+    "pending",
+    "paid",
+    "processing",
+    "out_for_delivery",
+    "delivered",
+    "cancelled",
+    name="orderstatusenum",
+)
+support_status_enum = Enum("open", "pending", "closed", name="supportstatusenum")
+
+Table(
+    "users",
+    metadata,
+    Column("id", GUID, primary_key=True, index=True),
+    Column("name", String(120), nullable=False),
+    Column("email", String(255), unique=True, index=True, nullable=False),
+    Column("password_hash", String(255), nullable=False),
+    Column("role", role_enum, nullable=False),
+    Column("created_at", DateTime, default=datetime.utcnow),
+    Column("phone", String(30)),
+    Column("address_line1", String(255)),
+    Column("locality", String(120)),
+    Column("city", String(120)),
+    Column("postcode", String(12)),
+    Column("user_code", String(16), unique=True),
+)
+
+Table(
+    "categories",
+    metadata,
+    Column("id", GUID, primary_key=True, index=True),
+    Column("name", String(120), unique=True, nullable=False),
+    Column("slug", String(140), unique=True, index=True, nullable=False),
+    Column("description", Text),
+    Column("is_active", Boolean),
+)
+
+Table(
+    "products",
+    metadata,
+    Column("id", GUID, primary_key=True, index=True),
+    Column("name", String(160), nullable=False),
+    Column("slug", String(180), unique=True, index=True, nullable=False),
+    Column("description", Text),
+    Column("price_per_kg", Float, nullable=False),
+    Column("image_url", String(500)),
+    Column("stock_kg", Float),
+    Column("is_dry", Boolean),
+    Column("is_active", Boolean),
+    Column("category_id", GUID, ForeignKey("categories.id"), nullable=False),
+)
+
+Table(
+    "orders",
+    metadata,
+    Column("id", GUID, primary_key=True, index=True),
+    Column("user_id", GUID, ForeignKey("users.id"), nullable=False),
+    Column("total_amount", Float, nullable=False),
+    Column("status", order_status_enum),
+    Column("delivery_slot", String(50)),
+    Column("address_line", String(255), nullable=False),
+    Column("city", String(120)),
+    Column("postcode", String(12), nullable=False),
+    Column("created_at", DateTime),
+)
+
+Table(
+    "support_messages",
+    metadata,
+    Column("id", GUID, primary_key=True, index=True),
+    Column("user_id", GUID, ForeignKey("users.id"), nullable=False),
+    Column("subject", String(160), nullable=False),
+    Column("message", Text, nullable=False),
+    Column("response", Text),
+    Column("status", support_status_enum, nullable=False),
+    Column("created_at", DateTime),
+    Column("updated_at", DateTime),
+)
+
+Table(
+    "order_items",
+    metadata,
+    Column("id", GUID, primary_key=True, index=True),
+    Column("order_id", GUID, ForeignKey("orders.id"), nullable=False),
+    Column("product_id", GUID, ForeignKey("products.id"), nullable=False),
+    Column("qty_kg", Float, nullable=False),
+    Column("price_per_kg", Float, nullable=False),
+)
+
+Table(
+    "site_settings",
+    metadata,
+    Column("key", String(120), primary_key=True),
+    Column("value", String(500)),
+    Column("created_at", DateTime, nullable=False),
+    Column("updated_at", DateTime, nullable=False),
+)
+
+Table(
+    "cut_clean_options",
+    metadata,
+    Column("id", GUID, primary_key=True, index=True),
+    Column("label", String(200), nullable=False),
+    Column("is_active", Boolean, nullable=False),
+    Column("sort_order", Float, nullable=False),
+    Column("created_at", DateTime, nullable=False),
+)
+
+_CONTACT_COLUMNS = [
+    ("phone", "VARCHAR(30)"),
+    ("address_line1", "VARCHAR(255)"),
+    ("locality", "VARCHAR(120)"),
+    ("city", "VARCHAR(120)"),
+    ("postcode", "VARCHAR(12)"),
+    ("user_code", "VARCHAR(16)"),
+]
+
+
+def upgrade(conn) -> None:
+    metadata.create_all(conn, checkfirst=True)
+    added = {column for column, ddl_type in _CONTACT_COLUMNS if add_column(conn, "users", column, ddl_type)}
+    if "user_code" in added:
+        create_index(conn, "uq_users_user_code", "users", ["user_code"], unique=True)
@@ -0,0 +1,22 @@
+"""Composite indexes for order history, eager loads and catalog filters.
+
+Built concurrently so the orders and order_items tables stay writable while
+the indexes are created on a live database.
+"""
+
+from ..ops import create_index
+
+transactional = False
+
+
+def upgrade(conn) -> None:
+    create_index(conn, "ix_orders_user_id_created_at", "orders", ["user_id", "created_at"])
+    create_index(conn, "ix_order_items_order_id", "order_items", ["order_id"])
+    create_index(conn, "ix_order_items_product_id", "order_items", ["product_id"])
+    create_index(conn, "ix_products_category_id_is_active", "products", ["category_id", "is_active"])
+    create_index(
+        conn,
+        "ix_support_messages_user_id_created_at",
+        "support_messages",
+        ["user_id", "created_at"],
+    )
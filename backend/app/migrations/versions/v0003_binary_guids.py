@@ -0,0 +1,54 @@
+"""Convert text UUIDs to 16-byte binary values on SQLite.
+
+Earlier versions of ``models.GUID`` stored UUIDs as CHAR(36) text on every
+dialect but PostgreSQL. SQLite keeps the declared column types (a CHAR
+column holds BLOBs unchanged), so the conversion rewrites values in place,
+primary and foreign keys alike, inside one transaction. PostgreSQL already
+uses its native uuid type and is left untouched.
+
+Until this has run, ``models.GUID`` binds 16-byte ids that match none of the
+text ones, so workers refuse to start on SQLite while it is pending.
+"""
+
+import uuid
+
+from sqlalchemy import text
+
+GUID_COLUMNS = {
+    "users": ["id"],
+    "categories": ["id"],
+    "products": ["id", "category_id"],
+    "orders": ["id", "user_id"],
+    "order_items": ["id", "order_id", "product_id"],
+    "support_messages": ["id", "user_id"],
+    "cut_clean_options": ["id"],
+}
+
+_BATCH_SIZE = 1000
+
+required_before_serving = ("sqlite",)
+
+
+def _convert_column(conn, table: str, column: str) -> None:
+    while True:
+        rows = conn.execute(
+            text(f"SELECT rowid, {column} FROM {table} WHERE typeof({column}) = 'text' LIMIT :limit"),
+            {"limit": _BATCH_SIZE},
+        ).all()
+        if not rows:
+            return
+        conn.execute(
+            text(f"UPDATE {table} SET {column} = :value WHERE rowid = :rowid"),
+            [{"value": uuid.UUID(value).bytes, "rowid": rowid} for rowid, value in rows],
+        )
+
+
+def upgrade(conn) -> None:
+    if conn.dialect.name != "sqlite":
+        return
+    # Parent and child keys are rewritten one after the other; check the
+    # foreign keys (if enforced) at commit, when both sides match again.
+    conn.execute(text("PRAGMA defer_foreign_keys = ON"))
+    for table, columns in GUID_COLUMNS.items():
+        for column in columns:
+            _convert_column(conn, table, column)
@@ -0,0 +1,32 @@
+"""Full-text search vector behind ``GET /products/search`` on PostgreSQL.
+
+Adds ``products.search_vector``, a stored generated ``tsvector`` of the
+product name (weight A) and description (weight D) using the ``simple``
+configuration, and a GIN index over it built concurrently. Adding a stored
+column rewrites the products table under a brief exclusive lock, which a
+catalog-sized table tolerates. Both statements are idempotent, so a run that
+stops between them can simply be repeated.
+
+Other dialects search an in-memory index built from the catalog snapshot and
+need nothing here.
+"""
+
+from sqlalchemy import text
+
+from ..ops import create_index, has_column
+
+transactional = False
+
+
+def upgrade(conn) -> None:
+    if conn.dialect.name != "postgresql":
+        return
+    if not has_column(conn, "products", "search_vector"):
+        conn.execute(
+            text(
+                "ALTER TABLE products ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+                "setweight(to_tsvector('simple', name), 'A') || "
+                "setweight(to_tsvector('simple', coalesce(description, '')), 'D')) STORED"
+            )
+        )
+    create_index(conn, "ix_products_search_vector", "products", ["search_vector"], using="gin")
@@ -0,0 +1,13 @@
+"""Resized image variants recorded per product.
+
+Adds the nullable ``products.image_variants`` JSON column that
+``app.media.variants`` fills in once the WebP/AVIF copies of a product photo have
+been rendered. Adding a nullable column without a default is a metadata-only
+change on both PostgreSQL and SQLite.
+"""
+
+from ..ops import add_column
+
+
+def upgrade(conn) -> None:
+    add_column(conn, "products", "image_variants", "JSON")
@@ -0,0 +1,34 @@
+"""Stored responses for ``Idempotency-Key`` retries of order writes.
+
+Creates ``idempotency_keys`` (see ``app.idempotency``), keyed by user and
+client-chosen key, with an index on ``expires_at`` for the TTL sweep. The
+table is a frozen copy of the model, like the baseline. ``users`` appears
+only so the foreign key resolves; it already exists and is left alone.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, MetaData, String, Table, Text
+
+from ...models import GUID
+
+metadata = MetaData()
+
+Table("users", metadata, Column("id", GUID, primary_key=True))
+
+Table(
+    "idempotency_keys",
+    metadata,
+    Column("user_id", GUID, ForeignKey("users.id"), primary_key=True),
+    Column("key", String(255), primary_key=True),
+    Column("request_hash", String(64), nullable=False),
+    Column("status_code", Integer),
+    Column("response_body", Text),
+    Column("created_at", DateTime, default=datetime.utcnow, nullable=False),
+    Column("expires_at", DateTime, nullable=False),
+    Index("ix_idempotency_keys_expires_at", "expires_at"),
+)
+
+
+def upgrade(conn) -> None:
+    metadata.create_all(conn, checkfirst=True)
@@ -0,0 +1,38 @@
+"""Stock held for customers' carts.
+
+Adds ``products.reserved_kg``, the running total of kilos held per product,
+as ``NOT NULL DEFAULT 0``. A constant default makes this a metadata-only
+change on PostgreSQL 11+ and SQLite. Also creates ``stock_reservations``,
+the holds themselves, from a frozen copy of the model like the baseline.
+``users`` and ``products`` appear only so the foreign keys resolve.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Index, MetaData, Table, UniqueConstraint
+
+from ...models import GUID
+from ..ops import add_column
+
+metadata = MetaData()
+
+Table("users", metadata, Column("id", GUID, primary_key=True))
+Table("products", metadata, Column("id", GUID, primary_key=True))
+
+Table(
+    "stock_reservations",
+    metadata,
+    Column("id", GUID, primary_key=True),
+    Column("user_id", GUID, ForeignKey("users.id"), nullable=False),
+    Column("product_id", GUID, ForeignKey("products.id"), nullable=False),
+    Column("qty_kg", Float, nullable=False),
+    Column("created_at", DateTime, default=datetime.utcnow, nullable=False),
+    Column("expires_at", DateTime, nullable=False),
+    UniqueConstraint("user_id", "product_id", name="uq_stock_reservations_user_id_product_id"),
+    Index("ix_stock_reservations_expires_at", "expires_at"),
+)
+
+
+def upgrade(conn) -> None:
+    add_column(conn, "products", "reserved_kg", "FLOAT NOT NULL DEFAULT 0")
+    metadata.create_all(conn, checkfirst=True)
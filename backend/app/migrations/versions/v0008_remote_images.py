@@ -0,0 +1,25 @@
+"""Cloudinary URLs of pushed product photos.
+
+Creates ``remote_images`` (see ``app.media.remote``), keyed by the spooled
+photo's path under ``MEDIA_ROOT``, so every worker can turn a provisional
+``/media`` URL into the Cloudinary one once any of them has pushed it. The
+table is a frozen copy of the model, like the baseline.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table
+
+metadata = MetaData()
+
+Table(
+    "remote_images",
+    metadata,
+    Column("path", String(255), primary_key=True),
+    Column("url", String(500), nullable=False),
+    Column("uploaded_at", DateTime, default=datetime.utcnow, nullable=False),
+)
+
+
+def upgrade(conn) -> None:
+    metadata.create_all(conn, checkfirst=True)
@@ -9,12 +9,16 @@ from sqlalchemy import (
     Enum,
     Float,
     ForeignKey,
+    Index,
+    Integer,
+    JSON,
     String,
     Text,
+    UniqueConstraint,
 )
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 from sqlalchemy.orm import relationship
-from sqlalchemy.types import CHAR, TypeDecorator
+from sqlalchemy.types import BINARY, TypeDecorator
 
 from .database import Base
 
@@ -22,33 +26,37 @@ from .database import Base
 class GUID(TypeDecorator):
     """Platform-independent GUID/UUID type.
 
-    Uses PostgreSQL's UUID type, otherwise stores as CHAR(36).
+    Uses PostgreSQL's UUID type, otherwise stores the 16 raw bytes as
+    BINARY(16) (a BLOB on SQLite). Databases written by older versions,
+    which used CHAR(36), must run migration 0003 first: lookups bind bytes
+    and would not match their text ids, so workers refuse to start until then.
     """
 
-    impl = CHAR
+    impl = BINARY
     cache_ok = True
 
     def load_dialect_impl(self, dialect):
         if dialect.name == "postgresql":
             return dialect.type_descriptor(PG_UUID(as_uuid=True))
-        return dialect.type_descriptor(CHAR(36))
+        return dialect.type_descriptor(BINARY(16))
 
     def process_bind_param(self, value, dialect):
         if value is None:
             return value
-        if isinstance(value, uuid.UUID):
-            return value if dialect.name == "postgresql" else str(value)
-        try:
-            coerced = uuid.UUID(str(value))
-        except (TypeError, ValueError) as exc:
-            raise ValueError("Invalid UUID value") from exc
-        return coerced if dialect.name == "postgresql" else str(coerced)
+        if not isinstance(value, uuid.UUID):
+            try:
+                value = uuid.UUID(str(value))
+            except (TypeError, ValueError) as exc:
+                raise ValueError("Invalid UUID value") from exc
+        return value if dialect.name == "postgresql" else value.bytes
 
     def process_result_value(self, value, dialect):
         if value is None:
             return value
         if isinstance(value, uuid.UUID):
             return value
+        if isinstance(value, (bytes, bytearray, memoryview)) and len(value) == 16:
+            return uuid.UUID(bytes=bytes(value))
         return uuid.UUID(str(value))
 
 
@@ -90,6 +98,10 @@ class Category(Base):
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        # Catalog filters by category and activity; delete_category probes by category
+        Index("ix_products_category_id_is_active", "category_id", "is_active"),
+    )
 
     id = Column(GUID, primary_key=True, index=True, default=uuid.uuid4)
     name = Column(String(160), nullable=False)
@@ -97,7 +109,11 @@ class Product(Base):
     description = Column(Text, nullable=True)
     price_per_kg = Column(Float, nullable=False)
     image_url = Column(String(500), nullable=True)
+    # Resized copies of a locally stored image_url, filled in by media/variants.py
+    image_variants = Column(JSON, nullable=True)
     stock_kg = Column(Float, default=0)
+    # Kilos held for customers' carts (the sum of their stock_reservations rows); see stock.py
+    reserved_kg = Column(Float, default=0, server_default="0", nullable=False)
     is_dry = Column(Boolean, default=False)
     is_active = Column(Boolean, default=True)
     category_id = Column(GUID, ForeignKey("categories.id"), nullable=False)
@@ -117,6 +133,10 @@ class OrderStatusEnum(str, enum.Enum):
 
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        # my_orders and customer detail: filter by user, newest first
+        Index("ix_orders_user_id_created_at", "user_id", "created_at"),
+    )
 
     id = Column(GUID, primary_key=True, index=True, default=uuid.uuid4)
     user_id = Column(GUID, ForeignKey("users.id"), nullable=False)
@@ -142,6 +162,7 @@ class SupportStatusEnum(str, enum.Enum):
 
 class SupportMessage(Base):
     __tablename__ = "support_messages"
+    __table_args__ = (Index("ix_support_messages_user_id_created_at", "user_id", "created_at"),)
 
     id = Column(GUID, primary_key=True, index=True, default=uuid.uuid4)
     user_id = Column(GUID, ForeignKey("users.id"), nullable=False)
@@ -159,8 +180,8 @@ class OrderItem(Base):
     __tablename__ = "order_items"
 
     id = Column(GUID, primary_key=True, index=True, default=uuid.uuid4)
-    order_id = Column(GUID, ForeignKey("orders.id"), nullable=False)
-    product_id = Column(GUID, ForeignKey("products.id"), nullable=False)
+    order_id = Column(GUID, ForeignKey("orders.id"), nullable=False, index=True)
+    product_id = Column(GUID, ForeignKey("products.id"), nullable=False, index=True)
     qty_kg = Column(Float, nullable=False)
     price_per_kg = Column(Float, nullable=False)
 
@@ -185,3 +206,56 @@ class CutCleanOption(Base):
     is_active = Column(Boolean, default=True, nullable=False)
     sort_order = Column(Float, default=0, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class IdempotencyKey(Base):
+    """The stored response to an order write sent with an ``Idempotency-Key``."""
+
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        # The TTL sweep deletes by expiry
+        Index("ix_idempotency_keys_expires_at", "expires_at"),
+    )
+
+    # Keys are chosen by clients, so they are only unique per user
+    user_id = Column(GUID, ForeignKey("users.id"), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    # sha256 of the endpoint and request body the key was first used with
+    request_hash = Column(String(64), nullable=False)
+    # Null while the request holding the key is still running
+    status_code = Column(Integer, nullable=True)
+    response_body = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+
+class StockReservation(Base):
+    """Kilos of a product held for a customer's cart until ``expires_at``."""
+
+    __tablename__ = "stock_reservations"
+    __table_args__ = (
+        # One hold per product per cart; also serves the lookups by user
+        UniqueConstraint("user_id", "product_id", name="uq_stock_reservations_user_id_product_id"),
+        # The sweep releases by expiry
+        Index("ix_stock_reservations_expires_at", "expires_at"),
+    )
+
+    id = Column(GUID, primary_key=True, default=uuid.uuid4)
+    user_id = Column(GUID, ForeignKey("users.id"), nullable=False)
+    product_id = Column(GUID, ForeignKey("products.id"), nullable=False)
+    qty_kg = Column(Float, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+    product = relationship("Product")
+
+
+class RemoteImage(Base):
+    """Where a spooled product photo lives on Cloudinary once its push has finished."""
+
+    __tablename__ = "remote_images"
+
+    # products/<sha256><ext> under MEDIA_ROOT; the stem is the Cloudinary public id
+    path = Column(String(255), primary_key=True)
+    url = Column(String(500), nullable=False)
+    uploaded_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,28 @@
+"""Prebuilt statements for the hottest catalog and order queries.
+
+Each statement is constructed once at import with ``bindparam`` placeholders
+and executed with a parameter dict, e.g.
+``await db.scalars(queries.orders_by_user, {"user_id": user.id})``. Reusing the
+same object skips rebuilding the ORM construct and lets SQLAlchemy reuse its
+memoised cache key and compiled form. Because the rendered SQL is identical
+on every call, psycopg 3 can also switch it to a server-side prepared
+statement (see ``DB_PREPARE_THRESHOLD``).
+"""
+
+from sqlalchemy import bindparam, select
+from sqlalchemy.orm import selectinload
+
+from .models import Order, OrderItem, Product
+
+active_products = (
+    select(Product)
+    .options(selectinload(Product.category))
+    .where(Product.is_active.is_(True))
+)
+
+orders_by_user = (
+    select(Order)
+    .options(selectinload(Order.items).selectinload(OrderItem.product))
+    .where(Order.user_id == bindparam("user_id"))
+    .order_by(Order.created_at.desc())
+)
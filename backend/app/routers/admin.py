@@ -1,20 +1,39 @@
 import logging
 import mimetypes
-import shutil
-import uuid
-from pathlib import Path
 from typing import List, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile, status
+from fastapi import APIRouter, BackgroundTasks, Depends, File, HTTPException, Query, Request, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from math import ceil
-from sqlalchemy import asc, desc, func, or_
-from sqlalchemy.orm import Session, selectinload
-import cloudinary
-import cloudinary.uploader
-
-from ..database import get_db
-from ..deps import require_admin
+from sqlalchemy import asc, case, delete, desc, func, or_, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from ..catalog import catalog_cache
+from ..catalog_io import FORMATS, ImportRejected, export_products, import_format, import_products
+from ..database import (
+    get_async_db,
+    get_primary_read_db,
+    pool_metrics,
+    primary_requested,
+    read_session_factory,
+    recent_writers,
+)
+from ..deps import get_user_read_db, invalidate_principal, principal_cache, require_admin
+from ..maintenance import sweeper
+from ..media import (
+    UploadTooLarge,
+    adopt_rendered_variants,
+    cloudinary_enabled,
+    cloudinary_uploads,
+    media_cache,
+    resolve_pushed,
+    store_upload,
+    variant_jobs,
+    variants_for,
+)
 from ..models import (
     Category,
     CutCleanOption,
@@ -22,6 +41,7 @@ from ..models import (
     OrderItem,
     Product,
     RoleEnum,
+    StockReservation,
     SupportMessage,
     User,
 )
@@ -39,6 +59,8 @@ from ..schemas import (
     OrderStatusUpdate,
     ProductAdminCreate,
     ProductAdminUpdate,
+    ProductBatchResponse,
+    ProductBatchUpdate,
     SalesReportRequest,
     SupportMessageAdminUpdate,
     VendorReportOut,
@@ -47,6 +69,7 @@ from ..schemas import (
 )
 from ..config import settings
 from ..site_settings import get_next_delivery, set_next_delivery
+from ..stock import below_holds, locked_products
 
 logger = logging.getLogger("tarel.admin")
 
@@ -74,8 +97,10 @@ def _serialize_product(product: Product) -> dict:
         "description": product.description,
         "price_per_kg": product.price_per_kg,
         "stock_kg": product.stock_kg,
+        "reserved_kg": product.reserved_kg,
         "is_active": product.is_active,
         "image_url": product.image_url,
+        "image_variants": product.image_variants,
         "is_dry": product.is_dry,
         "category_id": product.category_id,
         "category": {
@@ -87,11 +112,13 @@ def _serialize_product(product: Product) -> dict:
     }
 
 
-def _ensure_products_media_dir() -> Path:
-    base_path = Path(settings.MEDIA_ROOT)
-    target = base_path / "products"
-    target.mkdir(parents=True, exist_ok=True)
-    return target
+async def _get_product_with_category(db: AsyncSession, product_id) -> Optional[Product]:
+    return await db.scalar(
+        select(Product)
+        .options(selectinload(Product.category))
+        .where(Product.id == product_id)
+        .execution_options(populate_existing=True)
+    )
 
 
 def _resolve_image_extension(content_type: Optional[str]) -> str:
@@ -115,88 +142,53 @@ def _resolve_image_extension(content_type: Optional[str]) -> str:
 
 
 @router.post("/products/upload-image")
-def upload_product_image(
+async def upload_product_image(
     request: Request,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_primary_read_db),
     admin=Depends(require_admin),
 ):
-    del admin
     extension = _resolve_image_extension(file.content_type)
-    
-    # Use Cloudinary if configured
-    if settings.USE_CLOUDINARY and settings.CLOUDINARY_CLOUD_NAME:
-        try:
-            # Configure Cloudinary
-            cloudinary.config(
-                cloud_name=settings.CLOUDINARY_CLOUD_NAME,
-                api_key=settings.CLOUDINARY_API_KEY,
-                api_secret=settings.CLOUDINARY_API_SECRET,
-                secure=True
-            )
-            
-            # Upload to Cloudinary (without transformation during upload)
-            filename = f"{uuid.uuid4().hex}"
-            result = cloudinary.uploader.upload(
-                file.file,
-                folder="tarel/products",
-                public_id=filename,
-                resource_type="image"
-            )
-            
-            # Build URL with transformation applied on delivery
-            base_url = result["secure_url"]
-            # Cloudinary will optimize on-the-fly when requested
-            
-            return {
-                "url": base_url,
-                "path": result["public_id"],
-                "filename": filename,
-                "content_type": file.content_type,
-                "size": result.get("bytes", 0),
-            }
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to upload to Cloudinary: {str(e)}")
-        finally:
-            file.file.close()
-    
-    # Fallback to local storage (for development)
-    media_dir = _ensure_products_media_dir()
-    filename = f"{uuid.uuid4().hex}{extension}"
-    destination = media_dir / filename
 
-    total = 0
+    # Spooled locally either way; with Cloudinary on, the push happens in the
+    # background and this local URL is provisional until it finishes
     try:
-        with destination.open("wb") as buffer:
-            while True:
-                chunk = file.file.read(1024 * 1024)
-                if not chunk:
-                    break
-                total += len(chunk)
-                if total > MAX_IMAGE_SIZE_BYTES:
-                    raise HTTPException(status_code=400, detail="Image exceeds 5 MB limit")
-                buffer.write(chunk)
-    except HTTPException:
-        if destination.exists():
-            destination.unlink()
-        raise
+        # Hashing and writing the file block, so they run in the threadpool
+        stored = await run_in_threadpool(store_upload, file.file, extension, MAX_IMAGE_SIZE_BYTES)
+    except UploadTooLarge:
+        raise HTTPException(status_code=400, detail="Image exceeds 5 MB limit")
     finally:
-        file.file.close()
+        await file.close()
 
-    public_url = request.url_for("media", path=f"products/{filename}")
-    return {
-        "url": str(public_url),
-        "path": f"products/{filename}",
-        "filename": filename,
+    public_url = str(request.url_for("media", path=stored.path))
+    upload = {
+        "url": public_url,
+        "path": stored.path,
+        "filename": stored.path.rsplit("/", 1)[1],
         "content_type": file.content_type,
-        "size": total,
+        "size": stored.size,
+        "deduplicated": stored.deduplicated,
     }
+    if cloudinary_enabled():
+        remote_url = await resolve_pushed(db, public_url)
+        if remote_url != public_url:
+            # The same photo was pushed already
+            return {**upload, "url": remote_url, "pending_upload": False}
+        background_tasks.add_task(cloudinary_uploads.queue, stored.path)
+        return {**upload, "pending_upload": True}
+
+    # Resized WebP/AVIF copies are rendered off the request path; a photo
+    # uploaded before already has them
+    if not (stored.deduplicated and variants_for(public_url)):
+        background_tasks.add_task(variant_jobs.queue, stored.path)
+    return upload
 
 
 # ============ USERS ============
 @router.get("/users", response_model=List[dict])
-def all_users(db: Session = Depends(get_db), admin=Depends(require_admin)):
-    del admin
-    users = db.query(User).order_by(User.created_at.desc()).all()
+async def all_users(db: AsyncSession = Depends(get_user_read_db), admin=Depends(require_admin)):
+    users = (await db.scalars(select(User).order_by(User.created_at.desc()))).all()
     return [
         {
             "id": user.id,
@@ -210,36 +202,35 @@ def all_users(db: Session = Depends(get_db), admin=Depends(require_admin)):
 
 
 @router.get("/site/next-delivery", response_model=NextDeliveryResponse)
-def admin_get_next_delivery(db: Session = Depends(get_db), admin=Depends(require_admin)):
-    del admin
-    return get_next_delivery(db)
+async def admin_get_next_delivery(db: AsyncSession = Depends(get_user_read_db), admin=Depends(require_admin)):
+    return await get_next_delivery(db)
 
 
 @router.put("/site/next-delivery", response_model=NextDeliveryResponse)
-def admin_update_next_delivery(
+async def admin_update_next_delivery(
     payload: NextDeliveryUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     admin=Depends(require_admin),
 ):
-    del admin
-    return set_next_delivery(
+    result = await set_next_delivery(
         db,
         payload.scheduled_for,
         payload.cutoff_at,
         payload.window_label,
     )
+    catalog_cache.invalidate()
+    return result
 
 
 @router.get("/customers", response_model=PaginatedCustomers)
-def list_customers(
-    db: Session = Depends(get_db),
+async def list_customers(
+    db: AsyncSession = Depends(get_user_read_db),
     admin=Depends(require_admin),
     page: int = Query(1, ge=1),
     page_size: int = Query(25, ge=1, le=100),
     sort: str = Query("recent_order"),
     search: Optional[str] = Query(None),
 ):
-    del admin
 
     filters = [User.role == RoleEnum.user]
 
@@ -248,27 +239,27 @@ def list_customers(
         filters.append(or_(User.name.ilike(pattern), User.email.ilike(pattern)))
 
     total_customers = (
-        db.query(func.count(User.id))
-        .filter(*filters)
-        .scalar()
+        await db.scalar(select(func.count(User.id)).where(*filters))
     ) or 0
 
     total_orders = (
-        db.query(func.count(Order.id))
-        .join(User, User.id == Order.user_id)
-        .filter(*filters)
-        .scalar()
+        await db.scalar(
+            select(func.count(Order.id))
+            .join(User, User.id == Order.user_id)
+            .where(*filters)
+        )
     ) or 0
 
     total_revenue = (
-        db.query(func.coalesce(func.sum(Order.total_amount), 0.0))
-        .join(User, User.id == Order.user_id)
-        .filter(*filters)
-        .scalar()
+        await db.scalar(
+            select(func.coalesce(func.sum(Order.total_amount), 0.0))
+            .join(User, User.id == Order.user_id)
+            .where(*filters)
+        )
     ) or 0.0
 
     stats_subquery = (
-        db.query(
+        select(
             Order.user_id.label("user_id"),
             func.count(Order.id).label("order_count"),
             func.coalesce(func.sum(Order.total_amount), 0.0).label("total_spend"),
@@ -281,7 +272,7 @@ def list_customers(
     last_activity = func.coalesce(stats_subquery.c.last_order_at, User.created_at)
 
     query = (
-        db.query(
+        select(
             User.id,
             User.name,
             User.email,
@@ -291,7 +282,7 @@ def list_customers(
             stats_subquery.c.last_order_at,
         )
         .outerjoin(stats_subquery, stats_subquery.c.user_id == User.id)
-        .filter(*filters)
+        .where(*filters)
     )
 
     sort = sort or "recent_order"
@@ -313,7 +304,7 @@ def list_customers(
         page = 1
 
     offset = (page - 1) * page_size
-    rows = query.offset(offset).limit(page_size).all()
+    rows = (await db.execute(query.offset(offset).limit(page_size))).all()
 
     items = [
         {
@@ -343,37 +334,33 @@ def list_customers(
 
 
 @router.get("/customers/{user_id}", response_model=CustomerDetailOut)
-def customer_detail(
+async def customer_detail(
     user_id: UUID,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_user_read_db),
     admin=Depends(require_admin),
     order_page: int = Query(1, ge=1),
     order_page_size: int = Query(10, ge=1, le=100),
 ):
-    del admin
 
-    customer = (
-        db.query(User)
-        .filter(User.id == user_id, User.role == RoleEnum.user)
-        .first()
+    customer = await db.scalar(
+        select(User).where(User.id == user_id, User.role == RoleEnum.user)
     )
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
 
     order_count, total_spend, last_order_at = (
-        db.query(
-            func.count(Order.id),
-            func.coalesce(func.sum(Order.total_amount), 0.0),
-            func.max(Order.created_at),
+        await db.execute(
+            select(
+                func.count(Order.id),
+                func.coalesce(func.sum(Order.total_amount), 0.0),
+                func.max(Order.created_at),
+            )
+            .where(Order.user_id == user_id)
         )
-        .filter(Order.user_id == user_id)
-        .first()
-    )
+    ).one()
 
     orders_total = (
-        db.query(func.count(Order.id))
-        .filter(Order.user_id == user_id)
-        .scalar()
+        await db.scalar(select(func.count(Order.id)).where(Order.user_id == user_id))
     ) or 0
 
     total_pages = ceil(orders_total / order_page_size) if orders_total else 0
@@ -383,21 +370,22 @@ def customer_detail(
         order_page = 1
 
     orders_query = (
-        db.query(Order)
+        select(Order)
         .options(
             selectinload(Order.items).selectinload(OrderItem.product),
             selectinload(Order.user),
         )
-        .filter(Order.user_id == user_id)
+        .where(Order.user_id == user_id)
         .order_by(Order.created_at.desc())
     )
 
     orders = (
-        orders_query
-        .offset((order_page - 1) * order_page_size)
-        .limit(order_page_size)
-        .all()
-    )
+        await db.scalars(
+            orders_query
+            .offset((order_page - 1) * order_page_size)
+            .limit(order_page_size)
+        )
+    ).all()
 
     return {
         "customer": {
@@ -420,60 +408,98 @@ def customer_detail(
 
 
 @router.patch("/users/{user_id}/role")
-def change_user_role(
+async def change_user_role(
     user_id: UUID,
     role: RoleEnum,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     admin=Depends(require_admin),
 ):
-    del admin
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     user.role = role
-    db.commit()
+    await db.commit()
+    invalidate_principal(user.id)
     return {"ok": True}
 
 
+# ============ METRICS ============
+@router.get("/metrics/principal-cache")
+async def principal_cache_metrics(admin=Depends(require_admin)):
+    return principal_cache.stats()
+
+
+@router.get("/metrics/catalog-cache")
+async def catalog_cache_metrics(admin=Depends(require_admin)):
+    return catalog_cache.stats()
+
+
+@router.get("/metrics/image-variants")
+async def image_variant_metrics(admin=Depends(require_admin)):
+    return variant_jobs.stats()
+
+
+@router.get("/metrics/cloudinary-uploads")
+async def cloudinary_upload_metrics(admin=Depends(require_admin)):
+    return cloudinary_uploads.stats()
+
+
+@router.get("/metrics/media-cache")
+async def media_cache_metrics(admin=Depends(require_admin)):
+    return media_cache.stats()
+
+
+@router.get("/metrics/maintenance")
+async def maintenance_metrics(admin=Depends(require_admin)):
+    return sweeper.stats()
+
+
+@router.get("/metrics/db-pool")
+async def db_pool_metrics(db: AsyncSession = Depends(get_primary_read_db), admin=Depends(require_admin)):
+    metrics = pool_metrics()
+    if db.bind.dialect.name == "postgresql":
+        max_connections = await db.scalar(text("SHOW max_connections"))
+        metrics["server"] = {"max_connections": int(max_connections)}
+    return metrics
+
+
 # ============ CATEGORIES ============
 @router.get("/categories", response_model=List[dict])
-def all_categories(db: Session = Depends(get_db), admin=Depends(require_admin)):
-    del admin
-    categories = db.query(Category).order_by(Category.name.asc()).all()
+async def all_categories(db: AsyncSession = Depends(get_user_read_db), admin=Depends(require_admin)):
+    categories = (await db.scalars(select(Category).order_by(Category.name.asc()))).all()
     return [_serialize_category(category) for category in categories]
 
 
 @router.post("/categories")
-def create_category(
+async def create_category(
     payload: CategoryCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     admin=Depends(require_admin),
 ):
-    del admin
-    exists = db.query(Category).filter(Category.slug == payload.slug).first()
+    exists = await db.scalar(select(Category).where(Category.slug == payload.slug))
     if exists:
         raise HTTPException(status_code=400, detail="Slug already exists")
     category = Category(name=payload.name, slug=payload.slug, description=payload.description)
     db.add(category)
-    db.commit()
-    db.refresh(category)
+    await db.commit()
+    catalog_cache.invalidate()
+    await db.refresh(category)
     return _serialize_category(category)
 
 
 @router.patch("/categories/{category_id}")
-def update_category(
+async def update_category(
     category_id: UUID,
     payload: CategoryUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     admin=Depends(require_admin),
 ):
-    del admin
-    category = db.query(Category).filter(Category.id == category_id).first()
+    category = await db.get(Category, category_id)
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
 
     if payload.slug and payload.slug != category.slug:
-        exists = db.query(Category).filter(Category.slug == payload.slug).first()
+        exists = await db.scalar(select(Category).where(Category.slug == payload.slug))
         if exists:
             raise HTTPException(status_code=400, detail="Slug already exists")
         category.slug = payload.slug
@@ -485,49 +511,60 @@ def update_category(
     if payload.is_active is not None:
         category.is_active = payload.is_active
 
-    db.commit()
-    db.refresh(category)
+    await db.commit()
+    catalog_cache.invalidate()
+    await db.refresh(category)
     return _serialize_category(category)
 
 
 @router.delete("/categories/{category_id}")
-def delete_category(
+async def delete_category(
     category_id: UUID,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     admin=Depends(require_admin),
 ):
-    del admin
-    category = db.query(Category).filter(Category.id == category_id).first()
+    category = await db.get(Category, category_id)
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
-    if category.products:
+    has_products = await db.scalar(
+        select(Product.id).where(Product.category_id == category.id).limit(1)
+    )
+    if has_products:
         raise HTTPException(status_code=400, detail="Cannot delete category with products")
-    db.delete(category)
-    db.commit()
+    await db.delete(category)
+    await db.commit()
+    catalog_cache.invalidate()
     return {"ok": True}
 
 
 # ============ PRODUCTS ============
 @router.get("/products", response_model=List[dict])
-def all_products(db: Session = Depends(get_db), admin=Depends(require_admin)):
-    del admin
-    products = db.query(Product).order_by(Product.id.desc()).all()
+async def all_products(db: AsyncSession = Depends(get_user_read_db), admin=Depends(require_admin)):
+    products = (
+        await db.scalars(
+            select(Product)
+            .options(selectinload(Product.category))
+            .order_by(Product.id.desc())
+        )
+    ).all()
     return [_serialize_product(product) for product in products]
 
 
 @router.post("/products")
-def add_product(
+async def add_product(
     payload: ProductAdminCreate,
-    db: Session = Depends(get_db),
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
     admin=Depends(require_admin),
 ):
-    del admin
-    exists = db.query(Product).filter(Product.slug == payload.slug).first()
+    exists = await db.scalar(select(Product).where(Product.slug == payload.slug))
     if exists:
         raise HTTPException(status_code=400, detail="Slug already exists")
-    category = db.query(Category).filter(Category.id == payload.category_id).first()
+    category = await db.get(Category, payload.category_id)
     if not category:
         raise HTTPException(status_code=400, detail="Invalid category")
+    # A provisional upload URL whose Cloudinary push already finished is stored as the final one
+    image_url = await resolve_pushed(db, payload.image_url)
     product = Product(
         name=payload.name,
         slug=payload.slug,
@@ -535,38 +572,42 @@ def add_product(
         stock_kg=payload.stock_kg,
         category_id=payload.category_id,
         description=payload.description,
-        image_url=payload.image_url,
+        image_url=image_url,
+        image_variants=variants_for(image_url),
         is_active=payload.is_active,
         is_dry=payload.is_dry,
     )
     db.add(product)
-    db.commit()
-    db.refresh(product)
+    await db.commit()
+    await adopt_rendered_variants(db, product)
+    catalog_cache.invalidate()
+    if cloudinary_enabled():
+        # Still provisional: the push may be finishing on any worker right now
+        background_tasks.add_task(cloudinary_uploads.follow, image_url)
+    product = await _get_product_with_category(db, product.id)
     return _serialize_product(product)
 
 
 @router.patch("/products/{product_id}")
-def edit_product(
+async def edit_product(
     product_id: UUID,
     payload: ProductAdminUpdate,
-    db: Session = Depends(get_db),
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
     admin=Depends(require_admin),
 ):
-    del admin
-    product = db.query(Product).filter(Product.id == product_id).first()
+    product = await db.get(Product, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
     if payload.slug and payload.slug != product.slug:
-        exists = db.query(Product).filter(Product.slug == payload.slug).first()
+        exists = await db.scalar(select(Product).where(Product.slug == payload.slug))
         if exists:
             raise HTTPException(status_code=400, detail="Slug already exists")
         product.slug = payload.slug
 
     if payload.category_id is not None and payload.category_id != product.category_id:
-        category = (
-            db.query(Category).filter(Category.id == payload.category_id).first()
-        )
+        category = await db.get(Category, payload.category_id)
         if not category:
             raise HTTPException(status_code=400, detail="Invalid category")
         product.category_id = payload.category_id
@@ -577,61 +618,167 @@ def edit_product(
         product.description = payload.description
     if payload.price_per_kg is not None:
         product.price_per_kg = payload.price_per_kg
-    if payload.stock_kg is not None:
-        product.stock_kg = payload.stock_kg
-    if payload.image_url is not None:
-        product.image_url = payload.image_url
+    if payload.stock_kg is not None and payload.stock_kg != product.stock_kg:
+        # Conditional, as at checkout: a hold taken since the read still counts
+        restocked = await db.scalar(
+            update(Product)
+            .where(Product.id == product.id, Product.reserved_kg <= payload.stock_kg)
+            .values(stock_kg=payload.stock_kg)
+            .returning(Product.id)
+            .execution_options(synchronize_session=False)
+        )
+        if restocked is None:
+            raise await below_holds(db, [product.id]) or HTTPException(status_code=404, detail="Product not found")
+        db.info["pending_writes"] = True
+    image_url = await resolve_pushed(db, payload.image_url)
+    image_changed = image_url is not None and image_url != product.image_url
+    if image_changed:
+        product.image_url = image_url
+        product.image_variants = variants_for(image_url)
     if payload.is_active is not None:
         product.is_active = payload.is_active
     if payload.is_dry is not None:
         product.is_dry = payload.is_dry
 
-    db.commit()
-    db.refresh(product)
+    await db.commit()
+    if image_changed:
+        await adopt_rendered_variants(db, product)
+    catalog_cache.invalidate()
+    if image_changed and cloudinary_enabled():
+        background_tasks.add_task(cloudinary_uploads.follow, image_url)
+    product = await _get_product_with_category(db, product.id)
     return _serialize_product(product)
 
 
+@router.patch("/products:batch", response_model=ProductBatchResponse)
+async def batch_update_products(
+    payload: ProductBatchUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    admin=Depends(require_admin),
+):
+    """Apply price and stock changes to many products in one UPDATE."""
+    values = {}
+    for field in ("price_per_kg", "stock_kg"):
+        # Compared through the column so the ids bind as GUIDs on every backend
+        changes = [
+            (Product.id == item.id, getattr(item, field)) for item in payload.items if getattr(item, field) is not None
+        ]
+        if changes:
+            # Products that leave a field out keep their current value
+            values[field] = case(*changes, else_=getattr(Product, field))
+    conditions = [Product.id.in_(locked_products([item.id for item in payload.items]))]
+    if "stock_kg" in values:
+        # Stock never drops below what customers' carts hold
+        conditions.append(Product.reserved_kg <= values["stock_kg"])
+    rows = await db.execute(
+        update(Product)
+        .where(*conditions)
+        .values(values)
+        .returning(Product.id, Product.price_per_kg, Product.stock_kg)
+        .execution_options(synchronize_session=False)
+    )
+    updated = {row.id: row for row in rows}
+    if "stock_kg" in values:
+        rejected = await below_holds(db, [item.id for item in payload.items if item.id not in updated])
+        if rejected is not None:
+            await db.rollback()
+            raise rejected
+    if updated:
+        db.info["pending_writes"] = True
+        await db.commit()
+        catalog_cache.invalidate()
+
+    results = []
+    for item in payload.items:
+        row = updated.get(item.id)
+        if row is None:
+            results.append({"id": item.id, "status": "not_found"})
+        else:
+            results.append(
+                {"id": item.id, "status": "updated", "price_per_kg": row.price_per_kg, "stock_kg": row.stock_kg}
+            )
+    return {"updated": len(updated), "results": results}
+
+
 @router.delete("/products/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_product(
+async def delete_product(
     product_id: UUID,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     admin=Depends(require_admin),
 ):
-    del admin
-    product = db.query(Product).filter(Product.id == product_id).first()
+    product = await db.get(Product, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    db.delete(product)
-    db.commit()
+    # Carts holding it lose it; their kilos go with the product
+    await db.execute(delete(StockReservation).where(StockReservation.product_id == product_id))
+    await db.delete(product)
+    await db.commit()
+    catalog_cache.invalidate()
+
+
+@router.post("/products/import")
+async def import_product_file(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    admin=Depends(require_admin),
+):
+    """Upsert products by slug from a streamed CSV or NDJSON body, all or nothing."""
+    fmt = import_format(request.headers.get("content-type"))
+    if fmt is None:
+        raise HTTPException(status_code=415, detail="Send text/csv or application/x-ndjson")
+    try:
+        result = await import_products(db, request.stream(), fmt)
+    except ImportRejected as exc:
+        raise HTTPException(status_code=422, detail=exc.errors)
+    await db.commit()
+    catalog_cache.invalidate()
+    return result
+
+
+@router.get("/products/export")
+async def export_product_file(
+    request: Request,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    admin=Depends(require_admin),
+):
+    prefer_primary = primary_requested(request) or recent_writers.get(admin.id) is not None
+
+    async def _stream():
+        # The session lives as long as the response body, not the handler
+        async with read_session_factory(prefer_primary)() as db:
+            async for chunk in export_products(db, format):
+                yield chunk
+
+    return StreamingResponse(
+        _stream(),
+        media_type=FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="products.{format}"'},
+    )
 
 
 # ============ ORDERS ============
 @router.get("/orders", response_model=List[OrderAdminOut])
-def all_orders(db: Session = Depends(get_db), admin=Depends(require_admin)):
-    del admin
-    orders = (
-        db.query(Order)
+async def all_orders(db: AsyncSession = Depends(get_user_read_db), admin=Depends(require_admin)):
+    orders = await db.scalars(
+        select(Order)
         .options(
             selectinload(Order.user),
             selectinload(Order.items).selectinload(OrderItem.product),
         )
         .order_by(Order.created_at.desc())
-        .all()
     )
-    return orders
+    return orders.all()
 
 
 @router.get("/orders/{order_id}", response_model=OrderAdminOut)
-def get_order(order_id: UUID, db: Session = Depends(get_db), admin=Depends(require_admin)):
-    del admin
-    order = (
-        db.query(Order)
+async def get_order(order_id: UUID, db: AsyncSession = Depends(get_user_read_db), admin=Depends(require_admin)):
+    order = await db.scalar(
+        select(Order)
         .options(
             selectinload(Order.user),
             selectinload(Order.items).selectinload(OrderItem.product),
         )
-        .filter(Order.id == order_id)
-        .first()
+        .where(Order.id == order_id)
     )
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
@@ -639,30 +786,30 @@ def get_order(order_id: UUID, db: Session = Depends(get_db), admin=Depends(requi
 
 
 @router.patch("/orders/{order_id}/status")
-def update_order_status(
+async def update_order_status(
     order_id: UUID,
     payload: OrderStatusUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     admin=Depends(require_admin),
 ):
-    del admin
-    order = db.query(Order).filter(Order.id == order_id).first()
+    order = await db.get(Order, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     order.status = payload.status
-    db.commit()
+    await db.commit()
     return {"ok": True}
 
 
 # ============ SUPPORT MESSAGES ============
 @router.get("/support/messages", response_model=List[dict])
-def list_support_messages(db: Session = Depends(get_db), admin=Depends(require_admin)):
-    del admin
+async def list_support_messages(db: AsyncSession = Depends(get_user_read_db), admin=Depends(require_admin)):
     messages = (
-        db.query(SupportMessage)
-        .order_by(SupportMessage.created_at.desc())
-        .all()
-    )
+        await db.scalars(
+            select(SupportMessage)
+            .options(selectinload(SupportMessage.user))
+            .order_by(SupportMessage.created_at.desc())
+        )
+    ).all()
     return [
         {
             "id": msg.id,
@@ -682,30 +829,28 @@ def list_support_messages(db: Session = Depends(get_db), admin=Depends(require_a
 
 
 @router.patch("/support/messages/{message_id}")
-def respond_support_message(
+async def respond_support_message(
     message_id: UUID,
     payload: SupportMessageAdminUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     admin=Depends(require_admin),
 ):
-    del admin
-    message = db.query(SupportMessage).filter(SupportMessage.id == message_id).first()
+    message = await db.get(SupportMessage, message_id)
     if not message:
         raise HTTPException(status_code=404, detail="Message not found")
     message.status = payload.status
     if payload.response is not None:
         message.response = payload.response
-    db.commit()
+    await db.commit()
     return {"ok": True}
 
 
 @router.post("/actions/send-sales-report", status_code=status.HTTP_202_ACCEPTED)
-def send_sales_report(
+async def send_sales_report(
     payload: SalesReportRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     admin=Depends(require_admin),
 ):
-    del admin
     email = payload.email or settings.REPORT_EMAIL
     if not email:
         raise HTTPException(status_code=400, detail="Email is required")
@@ -717,9 +862,9 @@ def send_sales_report(
 
 
 @router.get("/vendor-report", response_model=VendorReportOut)
-def get_vendor_report(
+async def get_vendor_report(
     delivery_date: str = Query(..., description="Delivery date in YYYY-MM-DD format"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_user_read_db),
     admin=Depends(require_admin),
 ):
     """
@@ -732,7 +877,6 @@ def get_vendor_report(
     - Product breakdown (product name + total qty)
     - All customer instructions/notes
     """
-    del admin
     
     from datetime import datetime as dt
     
@@ -746,12 +890,13 @@ def get_vendor_report(
     # Note: Orders table has delivery_slot field which contains date/time info
     # We'll filter orders where delivery_slot contains the date
     orders = (
-        db.query(Order)
-        .filter(Order.delivery_slot.contains(delivery_date))
-        .options(selectinload(Order.items).selectinload(OrderItem.product))
-        .options(selectinload(Order.user))
-        .all()
-    )
+        await db.scalars(
+            select(Order)
+            .where(Order.delivery_slot.contains(delivery_date))
+            .options(selectinload(Order.items).selectinload(OrderItem.product))
+            .options(selectinload(Order.user))
+        )
+    ).all()
     
     if not orders:
         # Return empty report
@@ -812,39 +957,39 @@ def get_vendor_report(
 
 # ============ CUT & CLEAN OPTIONS ============
 @router.get("/cut-clean-options", response_model=List[CutCleanOptionOut])
-def list_cut_clean_options(db: Session = Depends(get_db), admin=Depends(require_admin)):
-    del admin
-    options = db.query(CutCleanOption).order_by(CutCleanOption.sort_order, CutCleanOption.label).all()
-    return options
+async def list_cut_clean_options(db: AsyncSession = Depends(get_user_read_db), admin=Depends(require_admin)):
+    options = await db.scalars(
+        select(CutCleanOption).order_by(CutCleanOption.sort_order, CutCleanOption.label)
+    )
+    return options.all()
 
 
 @router.post("/cut-clean-options", response_model=CutCleanOptionOut, status_code=201)
-def create_cut_clean_option(
+async def create_cut_clean_option(
     payload: CutCleanOptionCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     admin=Depends(require_admin)
 ):
-    del admin
     option = CutCleanOption(
         label=payload.label,
         is_active=payload.is_active,
         sort_order=payload.sort_order
     )
     db.add(option)
-    db.commit()
-    db.refresh(option)
+    await db.commit()
+    catalog_cache.invalidate()
+    await db.refresh(option)
     return option
 
 
 @router.patch("/cut-clean-options/{option_id}", response_model=CutCleanOptionOut)
-def update_cut_clean_option(
+async def update_cut_clean_option(
     option_id: UUID,
     payload: CutCleanOptionUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     admin=Depends(require_admin)
 ):
-    del admin
-    option = db.query(CutCleanOption).filter(CutCleanOption.id == option_id).first()
+    option = await db.get(CutCleanOption, option_id)
     if not option:
         raise HTTPException(status_code=404, detail="Cut & Clean option not found")
     
@@ -855,22 +1000,23 @@ def update_cut_clean_option(
     if payload.sort_order is not None:
         option.sort_order = payload.sort_order
     
-    db.commit()
-    db.refresh(option)
+    await db.commit()
+    catalog_cache.invalidate()
+    await db.refresh(option)
     return option
 
 
 @router.delete("/cut-clean-options/{option_id}", status_code=204)
-def delete_cut_clean_option(
+async def delete_cut_clean_option(
     option_id: UUID,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     admin=Depends(require_admin)
 ):
-    del admin
-    option = db.query(CutCleanOption).filter(CutCleanOption.id == option_id).first()
+    option = await db.get(CutCleanOption, option_id)
     if not option:
         raise HTTPException(status_code=404, detail="Cut & Clean option not found")
     
-    db.delete(option)
-    db.commit()
+    await db.delete(option)
+    await db.commit()
+    catalog_cache.invalidate()
     return None
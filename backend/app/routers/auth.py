@@ -1,10 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-
-from ..auth import create_access_token, hash_password, verify_password
-from ..database import get_db
-from ..deps import get_current_user
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..auth import (
+    PasswordHashingBusy,
+    create_access_token,
+    hash_password_offloaded,
+    verify_password_offloaded,
+)
+from ..database import get_async_db, get_primary_read_db
+from ..deps import Principal, get_current_user, invalidate_principal
 from ..models import User
 from ..schemas import TokenOut, UserCreate, UserOut, UserUpdate
 from ..utils import generate_user_code
@@ -12,21 +18,40 @@ from ..utils import generate_user_code
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
+def _hashing_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication is busy, please retry shortly",
+        headers={"Retry-After": "1"},
+    )
+
+
 @router.post("/register", response_model=UserOut)
-def register(payload: UserCreate, db: Session = Depends(get_db)):
-    exists = db.query(User).filter(User.email == payload.email).first()
+async def register(
+    payload: UserCreate,
+    reader: AsyncSession = Depends(get_primary_read_db),
+    db: AsyncSession = Depends(get_async_db),
+):
+    exists = await reader.scalar(select(User).where(User.email == payload.email))
     if exists:
         raise HTTPException(status_code=400, detail="Email already registered")
 
     try:
-        user_code = generate_user_code(db, payload.postcode)
+        user_code = await generate_user_code(reader, payload.postcode)
     except ValueError as error:
         raise HTTPException(status_code=400, detail=str(error)) from error
+    # Hashing takes a while: hand the connection back instead of idling in transaction
+    await reader.close()
+
+    try:
+        password_hash = await hash_password_offloaded(payload.password)
+    except PasswordHashingBusy:
+        raise _hashing_busy() from None
 
     user = User(
         name=payload.name,
         email=payload.email,
-        password_hash=hash_password(payload.password),
+        password_hash=password_hash,
         phone=payload.phone,
         address_line1=payload.address_line1,
         locality=payload.locality.strip() if payload.locality else None,
@@ -35,17 +60,22 @@ def register(payload: UserCreate, db: Session = Depends(get_db)):
         user_code=user_code,
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user
 
 
 @router.post("/login", response_model=TokenOut)
-def login(
-    form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)
+async def login(
+    form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_primary_read_db)
 ):
-    user = db.query(User).filter(User.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.password_hash):
+    user = await db.scalar(select(User).where(User.email == form_data.username))
+    await db.close()
+    try:
+        valid = bool(user) and await verify_password_offloaded(form_data.password, user.password_hash)
+    except PasswordHashingBusy:
+        raise _hashing_busy() from None
+    if not valid:
         raise HTTPException(status_code=400, detail="Incorrect email or password")
 
     token = create_access_token({"sub": str(user.id), "role": user.role})
@@ -53,29 +83,42 @@ def login(
 
 
 @router.get("/me", response_model=UserOut)
-def read_current_user(current_user: User = Depends(get_current_user)) -> User:
+async def read_current_user(current_user: Principal = Depends(get_current_user)) -> Principal:
     return current_user
 
 
 @router.patch("/me", response_model=UserOut)
-def update_current_user(
+async def update_current_user(
     payload: UserUpdate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    principal: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
 ) -> User:
+    # Hash before touching the database so no transaction waits on the pool
+    password_hash = None
+    if payload.password:
+        try:
+            password_hash = await hash_password_offloaded(payload.password)
+        except PasswordHashingBusy:
+            raise _hashing_busy() from None
+
+    current_user = await db.get(User, principal.id)
+    if not current_user:
+        raise HTTPException(status_code=404, detail="User not found")
+
     updated = False
 
     if payload.name is not None and payload.name != current_user.name:
         current_user.name = payload.name
         updated = True
 
-    if payload.password:
-        current_user.password_hash = hash_password(payload.password)
+    if password_hash is not None:
+        current_user.password_hash = password_hash
         updated = True
 
     if updated:
         db.add(current_user)
-        db.commit()
-        db.refresh(current_user)
+        await db.commit()
+        await db.refresh(current_user)
+        invalidate_principal(current_user.id)
 
     return current_user
@@ -1,9 +1,11 @@
 from typing import List
 
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..database import get_db
+from ..catalog import catalog_cache
+from ..database import get_async_db
+from ..http_cache import prepared_response
 from ..models import Category
 from ..schemas import CategoryCreate, CategoryOut
 
@@ -11,14 +13,16 @@ router = APIRouter(prefix="/categories", tags=["categories"])
 
 
 @router.get("/", response_model=List[CategoryOut])
-def list_categories(db: Session = Depends(get_db)):
-    return db.query(Category).filter(Category.is_active.is_(True)).all()
+async def list_categories(request: Request):
+    snapshot = await catalog_cache.get()
+    return prepared_response(request, snapshot.bodies["categories"])
 
 
 @router.post("/", response_model=CategoryOut)
-def create_category(payload: CategoryCreate, db: Session = Depends(get_db)):
+async def create_category(payload: CategoryCreate, db: AsyncSession = Depends(get_async_db)):
     cat = Category(**payload.model_dump())
     db.add(cat)
-    db.commit()
-    db.refresh(cat)
+    await db.commit()
+    catalog_cache.invalidate()
+    await db.refresh(cat)
     return cat
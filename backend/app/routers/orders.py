@@ -1,56 +1,94 @@
-from typing import List
-
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, selectinload
-
-from ..database import get_db
-from ..deps import get_current_user
+from typing import Dict, List, Optional
+from uuid import UUID, uuid4
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from sqlalchemy import and_, func, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from .. import queries
+from ..catalog import catalog_cache
+from ..database import get_async_db
+from ..deps import get_current_user, get_user_read_db
+from ..idempotency import IDEMPOTENCY_KEY_HEADER, IdempotentRequest
 from ..models import Order, OrderItem, OrderStatusEnum, Product
 from ..schemas import OrderCreate, OrderOut
+from ..stock import AVAILABLE_KG, locked_products, per_product, rejection, take_holds
 
 router = APIRouter(prefix="/orders", tags=["orders"])
 
 
-@router.get("/my", response_model=List[OrderOut])
-def my_orders(db: Session = Depends(get_db), user=Depends(get_current_user)):
-    orders = (
-        db.query(Order)
+async def _load_order(db: AsyncSession, order_id) -> Order:
+    return await db.scalar(
+        select(Order)
         .options(selectinload(Order.items).selectinload(OrderItem.product))
-        .filter(Order.user_id == user.id)
-        .order_by(Order.created_at.desc())
-        .all()
+        .where(Order.id == order_id)
+        .execution_options(populate_existing=True)
     )
-    return orders
+
+
+@router.get("/my", response_model=List[OrderOut])
+async def my_orders(db: AsyncSession = Depends(get_user_read_db), user=Depends(get_current_user)):
+    orders = await db.scalars(queries.orders_by_user, {"user_id": user.id})
+    return orders.all()
 
 
 @router.post("/", response_model=OrderOut)
-def create_order(
-    payload: OrderCreate, db: Session = Depends(get_db), user=Depends(get_current_user)
+async def create_order(
+    payload: OrderCreate,
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_KEY_HEADER),
 ):
-    items: list[tuple[Product, float]] = []
-    subtotal = 0.0
+    idempotent = IdempotentRequest(user.id, idempotency_key, "POST /orders/", payload.model_dump_json())
+    replayed = await idempotent.claim(db)
+    if replayed is not None:
+        return replayed
+
+    quantities: Dict[UUID, float] = {}
     for it in payload.items:
-        prod = (
-            db.query(Product)
-            .filter(Product.id == it.product_id, Product.is_active.is_(True))
-            .first()
+        quantities[it.product_id] = quantities.get(it.product_id, 0.0) + it.qty_kg
+
+    # Checking out converts the customer's holds: their kilos come off
+    # reserved_kg and count as available to this order
+    held = await take_holds(db, user.id)
+    prices: Dict[UUID, float] = {}
+    if quantities or held:
+        # One conditional UPDATE checks and takes the stock for every line:
+        # rows that are inactive or short are simply not updated, so two
+        # checkouts racing for the last kilos can never both succeed
+        wanted = per_product(quantities)
+        released = per_product(held)
+        taken = await db.execute(
+            update(Product)
+            .where(
+                Product.id.in_(locked_products(list(set(quantities) | set(held)))),
+                or_(
+                    Product.id.not_in(list(quantities)),
+                    and_(Product.is_active.is_(True), AVAILABLE_KG + released >= wanted),
+                ),
+            )
+            .values(stock_kg=Product.stock_kg - wanted, reserved_kg=Product.reserved_kg - released)
+            .returning(Product.id, Product.price_per_kg)
+            .execution_options(synchronize_session=False)
         )
-        if not prod:
-            raise HTTPException(status_code=400, detail=f"Invalid product {it.product_id}")
-        if prod.stock_kg < it.qty_kg:
-            raise HTTPException(status_code=400, detail=f"Insufficient stock for {prod.name}")
-        subtotal += it.qty_kg * prod.price_per_kg
-        items.append((prod, it.qty_kg))
+        prices = {product_id: price for product_id, price in taken.all() if product_id in quantities}
+        if len(prices) < len(quantities):
+            await db.rollback()
+            raise await rejection(db, [it.product_id for it in payload.items], set(prices))
+
+    subtotal = sum(it.qty_kg * prices[it.product_id] for it in payload.items)
 
     # Add delivery fee: £1 if order is below £20
     SHIPPING_THRESHOLD = 20.0
     SHIPPING_FEE = 1.0
     delivery_fee = 0.0 if subtotal >= SHIPPING_THRESHOLD else SHIPPING_FEE
-    
+
     # Calculate total (no VAT)
     total = subtotal + delivery_fee
 
     order = Order(
+        id=uuid4(),
         user_id=user.id,
         total_amount=total,
         delivery_slot=payload.delivery_slot,
@@ -58,59 +96,102 @@ def create_order(
         postcode=payload.postcode,
     )
     db.add(order)
-    db.flush()
-
-    for prod, qty in items:
-        db.add(
-            OrderItem(
-                order_id=order.id,
-                product_id=prod.id,
-                qty_kg=qty,
-                price_per_kg=prod.price_per_kg,
+    await db.flush()
+    if payload.items:
+        # A single multi-row INSERT for all the lines
+        await db.execute(
+            insert(OrderItem).values(
+                [
+                    {
+                        "id": uuid4(),
+                        "order_id": order.id,
+                        "product_id": it.product_id,
+                        "qty_kg": it.qty_kg,
+                        "price_per_kg": prices[it.product_id],
+                    }
+                    for it in payload.items
+                ]
             )
         )
-        prod.stock_kg -= qty
-    db.commit()
-
-    order = (
-        db.query(Order)
-        .options(selectinload(Order.items).selectinload(OrderItem.product))
-        .filter(Order.id == order.id)
-        .first()
-    )
+    if idempotent.key is not None:
+        # Stored in the order's transaction: a retry finds both or neither
+        response = await idempotent.store(db, OrderOut.model_validate(await _load_order(db, order.id)))
+        await db.commit()
+        catalog_cache.stock_changed()
+        return response
+    await db.commit()
+    catalog_cache.stock_changed()
+
+    order = await _load_order(db, order.id)
     if not order:
         raise HTTPException(status_code=500, detail="Order was not persisted")
     return order
 
 
 @router.post("/{order_id}/cancel", response_model=OrderOut)
-def cancel_order(order_id: str, db: Session = Depends(get_db), user=Depends(get_current_user)):
-    order = (
-        db.query(Order)
-        .options(selectinload(Order.items).selectinload(OrderItem.product))
-        .filter(Order.id == order_id, Order.user_id == user.id)
-        .first()
-    )
+async def cancel_order(
+    order_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_KEY_HEADER),
+):
+    idempotent = IdempotentRequest(user.id, idempotency_key, f"POST /orders/{order_id}/cancel")
+    replayed = await idempotent.claim(db)
+    if replayed is not None:
+        return replayed
+
+    order = await db.scalar(select(Order).where(Order.id == order_id, Order.user_id == user.id))
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
 
-    if order.status in {OrderStatusEnum.delivered, OrderStatusEnum.out_for_delivery}:
+    dispatched = {OrderStatusEnum.delivered, OrderStatusEnum.out_for_delivery}
+    if order.status in dispatched:
         raise HTTPException(status_code=400, detail="Orders already dispatched cannot be cancelled")
 
+    restocked = False
     if order.status != OrderStatusEnum.cancelled:
-        for item in order.items:
-            product = db.query(Product).filter(Product.id == item.product_id).first()
-            if product:
-                product.stock_kg += item.qty_kg
-        order.status = OrderStatusEnum.cancelled
-        db.add(order)
-        db.commit()
-
-        order = (
-            db.query(Order)
-            .options(selectinload(Order.items).selectinload(OrderItem.product))
-            .filter(Order.id == order.id)
-            .first()
+        # Conditional, so of two concurrent cancellations only one restocks
+        cancelled = await db.scalar(
+            update(Order)
+            .where(Order.id == order.id, Order.status.not_in([OrderStatusEnum.cancelled, *dispatched]))
+            .values(status=OrderStatusEnum.cancelled)
+            .returning(Order.id)
+            .execution_options(synchronize_session=False)
         )
-
-    return order
+        if cancelled is not None:
+            returned = (
+                await db.execute(
+                    select(OrderItem.product_id, func.sum(OrderItem.qty_kg))
+                    .where(OrderItem.order_id == order.id)
+                    .group_by(OrderItem.product_id)
+                )
+            ).all()
+            if returned:
+                restock = per_product(dict(returned))
+                await db.execute(
+                    update(Product)
+                    .where(Product.id.in_(locked_products([product_id for product_id, _ in returned])))
+                    .values(stock_kg=Product.stock_kg + restock)
+                    .execution_options(synchronize_session=False)
+                )
+            db.info["pending_writes"] = True
+            restocked = True
+
+    if idempotent.key is None:
+        if restocked:
+            await db.commit()
+            catalog_cache.stock_changed()
+        order = await _load_order(db, order.id)
+        if order.status in dispatched:
+            raise HTTPException(status_code=400, detail="Orders already dispatched cannot be cancelled")
+        return order
+
+    order = await _load_order(db, order.id)
+    if order.status in dispatched:
+        # Dispatched since it was read; rolling back releases the key as well
+        raise HTTPException(status_code=400, detail="Orders already dispatched cannot be cancelled")
+    response = await idempotent.store(db, OrderOut.model_validate(order))
+    await db.commit()
+    if restocked:
+        catalog_cache.stock_changed()
+    return response
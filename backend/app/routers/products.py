@@ -1,51 +1,114 @@
-from typing import List
+from math import ceil
+from typing import Dict, List, Optional
+from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..database import get_db
-from ..models import Category, CutCleanOption, Product
-from ..schemas import CutCleanOptionOut, ProductCreate, ProductOut
+from ..browse import BrowseFilters, InvalidCursor
+from ..catalog import EMPTY_PRODUCT_LIST, catalog_cache
+from ..database import get_async_db, get_read_db
+from ..http_cache import prepared_response
+from ..models import Category, Product
+from ..schemas import (
+    CutCleanOptionOut,
+    ProductBrowseResponse,
+    ProductCreate,
+    ProductOut,
+    ProductSearchResponse,
+)
+from ..search import search_products
 
 router = APIRouter(prefix="/products", tags=["products"])
 
 
 @router.get("/", response_model=List[ProductOut])
-def list_products(db: Session = Depends(get_db)):
-    return db.query(Product).filter(Product.is_active.is_(True)).all()
+async def list_products(request: Request, category: Optional[str] = None):
+    snapshot = await catalog_cache.get()
+    if category is None:
+        return prepared_response(request, snapshot.bodies["products"])
+    return prepared_response(request, snapshot.category_bodies.get(category, EMPTY_PRODUCT_LIST))
 
 
-@router.get("/{slug}", response_model=ProductOut)
-def get_product(slug: str, db: Session = Depends(get_db)):
-    prod = (
-        db.query(Product)
-        .filter(Product.slug == slug, Product.is_active.is_(True))
-        .first()
+# Declared before "/{slug}" so the literal paths are not captured as a slug
+@router.get("/search", response_model=ProductSearchResponse)
+async def search_catalog(
+    q: str = Query(..., min_length=2, max_length=100),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db),
+):
+    index = await catalog_cache.search_index()
+    total, items = await search_products(db, index, q, limit=page_size, offset=(page - 1) * page_size)
+    return {
+        "items": items,
+        "total": total,
+        "page": page,
+        "page_size": page_size,
+        "total_pages": ceil(total / page_size) if total else 0,
+    }
+
+
+@router.get("/browse", response_model=ProductBrowseResponse)
+async def browse_catalog(
+    category: Optional[List[str]] = Query(None),
+    is_dry: Optional[bool] = None,
+    in_stock: bool = False,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    sort: str = Query("name_asc", pattern="^(name_asc|name_desc|price_asc|price_desc)$"),
+    page_size: int = Query(24, ge=1, le=100),
+    cursor: Optional[str] = None,
+):
+    index = await catalog_cache.browse_index()
+    levels = await catalog_cache.stock_levels() if in_stock else None
+    filters = BrowseFilters(
+        categories=tuple(category or ()),
+        is_dry=is_dry,
+        in_stock=in_stock,
+        min_price=min_price,
+        max_price=max_price,
     )
-    if not prod:
+    try:
+        return index.browse(
+            filters, sort=sort, limit=page_size, cursor=cursor, available=levels.available if levels else None
+        )
+    except InvalidCursor as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@router.get("/availability", response_model=Dict[UUID, float])
+async def get_availability(request: Request):
+    """Kilos of each active product not held for someone's cart."""
+    levels = await catalog_cache.stock_levels()
+    # Changes with every cart, so clients revalidate (a 304 when unchanged)
+    return prepared_response(request, levels.body, directives="no-cache")
+
+
+@router.get("/cut-clean-options", response_model=List[CutCleanOptionOut])
+async def get_active_cut_clean_options(request: Request):
+    """Get all active cut & clean options for users."""
+    snapshot = await catalog_cache.get()
+    return prepared_response(request, snapshot.bodies["cut_clean_options"])
+
+
+@router.get("/{slug}", response_model=ProductOut)
+async def get_product(slug: str, request: Request):
+    snapshot = await catalog_cache.get()
+    prepared = snapshot.product_bodies.get(slug)
+    if not prepared:
         raise HTTPException(status_code=404, detail="Product not found")
-    return prod
+    return prepared_response(request, prepared)
 
 
 @router.post("/", response_model=ProductOut)
-def create_product(payload: ProductCreate, db: Session = Depends(get_db)):
-    if not db.query(Category).filter(Category.id == payload.category_id).first():
+async def create_product(payload: ProductCreate, db: AsyncSession = Depends(get_async_db)):
+    if not await db.get(Category, payload.category_id):
         raise HTTPException(status_code=400, detail="Invalid category")
 
     prod = Product(**payload.model_dump())
     db.add(prod)
-    db.commit()
-    db.refresh(prod)
+    await db.commit()
+    catalog_cache.invalidate()
+    await db.refresh(prod, attribute_names=["category"])
     return prod
-
-
-@router.get("/cut-clean-options", response_model=List[CutCleanOptionOut])
-def get_active_cut_clean_options(db: Session = Depends(get_db)):
-    """Get all active cut & clean options for users."""
-    options = (
-        db.query(CutCleanOption)
-        .filter(CutCleanOption.is_active.is_(True))
-        .order_by(CutCleanOption.sort_order, CutCleanOption.label)
-        .all()
-    )
-    return options
@@ -0,0 +1,60 @@
+from datetime import datetime
+from typing import Dict, List
+from uuid import UUID
+
+from fastapi import APIRouter, Depends
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..catalog import catalog_cache
+from ..database import get_async_db
+from ..deps import get_current_user, get_user_read_db
+from ..models import Product, StockReservation
+from ..schemas import ReservationOut, ReservationUpdate
+from ..stock import AVAILABLE_KG, StockShortfall, hold, rejection
+
+router = APIRouter(prefix="/reservations", tags=["reservations"])
+
+
+async def _holds(db: AsyncSession, user_id) -> List[ReservationOut]:
+    rows = await db.execute(
+        select(StockReservation.product_id, StockReservation.qty_kg, StockReservation.expires_at, AVAILABLE_KG)
+        .join(Product, Product.id == StockReservation.product_id)
+        .where(StockReservation.user_id == user_id, StockReservation.expires_at > datetime.utcnow())
+        .order_by(StockReservation.created_at, StockReservation.product_id)
+    )
+    return [
+        ReservationOut(product_id=product_id, qty_kg=qty, expires_at=expires_at, available_kg=max(available, 0.0))
+        for product_id, qty, expires_at, available in rows.all()
+    ]
+
+
+@router.get("/", response_model=List[ReservationOut])
+async def my_reservations(db: AsyncSession = Depends(get_user_read_db), user=Depends(get_current_user)):
+    return await _holds(db, user.id)
+
+
+@router.put("/", response_model=List[ReservationOut])
+async def reserve_cart(
+    payload: ReservationUpdate, db: AsyncSession = Depends(get_async_db), user=Depends(get_current_user)
+):
+    """Hold the cart's stock, replacing earlier holds; sending the cart again keeps them alive."""
+    quantities: Dict[UUID, float] = {}
+    for it in payload.items:
+        quantities[it.product_id] = quantities.get(it.product_id, 0.0) + it.qty_kg
+    try:
+        await hold(db, user.id, quantities)
+    except StockShortfall as shortfall:
+        await db.rollback()
+        raise await rejection(db, list(quantities), set(quantities) - shortfall.products) from None
+    await db.commit()
+    catalog_cache.stock_changed()
+    return await _holds(db, user.id)
+
+
+@router.delete("/", response_model=List[ReservationOut])
+async def release_cart(db: AsyncSession = Depends(get_async_db), user=Depends(get_current_user)):
+    await hold(db, user.id, {})
+    await db.commit()
+    catalog_cache.stock_changed()
+    return []
@@ -1,20 +1,20 @@
-from fastapi import APIRouter, Depends, Query, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Query, HTTPException, Request
 from typing import Optional
 from urllib.parse import quote
 import httpx
 
-from ..database import get_db
+from ..catalog import catalog_cache
+from ..http_cache import prepared_response
 from ..schemas import NextDeliveryResponse
-from ..site_settings import get_next_delivery
 from ..config import settings
 
 router = APIRouter(prefix="/site", tags=["site"])
 
 
 @router.get("/next-delivery", response_model=NextDeliveryResponse)
-def public_next_delivery(db: Session = Depends(get_db)):
-    return get_next_delivery(db)
+async def public_next_delivery(request: Request):
+    snapshot = await catalog_cache.get()
+    return prepared_response(request, snapshot.bodies["next_delivery"])
 
 
 # Address lookup endpoints
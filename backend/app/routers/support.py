@@ -2,9 +2,10 @@ from typing import List
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..database import get_db
+from ..database import get_async_db, get_primary_read_db
 from ..deps import get_current_user
 from ..models import SupportMessage
 from ..schemas import SupportMessageCreate, SupportMessageOut
@@ -13,9 +14,9 @@ router = APIRouter(prefix="/support", tags=["support"])
 
 
 @router.post("/messages", response_model=SupportMessageOut)
-def create_message(
+async def create_message(
     payload: SupportMessageCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user=Depends(get_current_user),
 ):
     message = SupportMessage(
@@ -24,31 +25,30 @@ def create_message(
         message=payload.message,
     )
     db.add(message)
-    db.commit()
-    db.refresh(message)
+    await db.commit()
+    await db.refresh(message)
     return message
 
 
 @router.get("/messages", response_model=List[SupportMessageOut])
-def my_messages(db: Session = Depends(get_db), user=Depends(get_current_user)):
-    return (
-        db.query(SupportMessage)
-        .filter(SupportMessage.user_id == user.id)
+async def my_messages(db: AsyncSession = Depends(get_primary_read_db), user=Depends(get_current_user)):
+    result = await db.scalars(
+        select(SupportMessage)
+        .where(SupportMessage.user_id == user.id)
         .order_by(SupportMessage.created_at.desc())
-        .all()
     )
+    return result.all()
 
 
 @router.get("/messages/{message_id}", response_model=SupportMessageOut)
-def get_message(
+async def get_message(
     message_id: UUID,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_primary_read_db),
     user=Depends(get_current_user),
 ):
-    message = (
-        db.query(SupportMessage)
-        .filter(SupportMessage.id == message_id, SupportMessage.user_id == user.id)
-        .first()
+    message = await db.scalar(
+        select(SupportMessage)
+        .where(SupportMessage.id == message_id, SupportMessage.user_id == user.id)
     )
     if not message:
         raise HTTPException(status_code=404, detail="Message not found")
@@ -1,9 +1,9 @@
 from datetime import date, datetime, timezone
 import re
-from typing import List, Optional
+from typing import Dict, List, Optional, Union
 from uuid import UUID
 
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, field_validator, model_validator
 
 from .models import OrderStatusEnum, RoleEnum, SupportStatusEnum
 
@@ -135,6 +135,8 @@ class ProductOut(BaseModel):
     description: Optional[str]
     price_per_kg: float
     image_url: Optional[str]
+    # {"thumbnail" | "card" | "detail": {"width", "height", "avif", "webp"}}
+    image_variants: Optional[Dict[str, Dict[str, Union[int, str]]]] = None
     stock_kg: float
     is_dry: bool
     is_active: bool
@@ -144,6 +146,33 @@ class ProductOut(BaseModel):
         from_attributes = True
 
 
+class ProductSearchResponse(BaseModel):
+    items: List[ProductOut]
+    total: int
+    page: int
+    page_size: int
+    total_pages: int
+
+
+class CategoryFacet(BaseModel):
+    slug: str
+    name: str
+    count: int
+
+
+class ProductFacets(BaseModel):
+    categories: List[CategoryFacet]
+    fresh: int
+    dry: int
+
+
+class ProductBrowseResponse(BaseModel):
+    items: List[ProductOut]
+    total: int
+    next_cursor: Optional[str]
+    facets: ProductFacets
+
+
 class ProductAdminCreate(BaseModel):
     name: str
     slug: str
@@ -168,6 +197,41 @@ class ProductAdminUpdate(BaseModel):
     is_dry: Optional[bool] = None
 
 
+class ProductBatchItem(BaseModel):
+    id: UUID
+    price_per_kg: Optional[float] = Field(default=None, ge=0)
+    stock_kg: Optional[float] = Field(default=None, ge=0)
+
+    @model_validator(mode="after")
+    def has_changes(self) -> "ProductBatchItem":
+        if self.price_per_kg is None and self.stock_kg is None:
+            raise ValueError("Set price_per_kg, stock_kg or both")
+        return self
+
+
+class ProductBatchUpdate(BaseModel):
+    items: List[ProductBatchItem] = Field(min_length=1, max_length=1000)
+
+    @field_validator("items")
+    @classmethod
+    def unique_ids(cls, items: List[ProductBatchItem]) -> List[ProductBatchItem]:
+        if len({item.id for item in items}) != len(items):
+            raise ValueError("Each product may appear only once")
+        return items
+
+
+class ProductBatchResult(BaseModel):
+    id: UUID
+    status: str
+    price_per_kg: Optional[float] = None
+    stock_kg: Optional[float] = None
+
+
+class ProductBatchResponse(BaseModel):
+    updated: int
+    results: List[ProductBatchResult]
+
+
 class OrderItemIn(BaseModel):
     product_id: UUID
     qty_kg: float = Field(gt=0)
@@ -180,6 +244,17 @@ class OrderCreate(BaseModel):
     delivery_slot: str
 
 
+class ReservationUpdate(BaseModel):
+    items: List[OrderItemIn]
+
+
+class ReservationOut(BaseModel):
+    product_id: UUID
+    qty_kg: float
+    expires_at: datetime
+    available_kg: float
+
+
 class ProductSummary(BaseModel):
     id: UUID
     name: str
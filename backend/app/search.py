@@ -0,0 +1,255 @@
+"""Ranked, typo-tolerant product search behind ``GET /products/search``.
+
+On PostgreSQL the query runs against ``products.search_vector``, the
+generated ``tsvector`` GIN-indexed by migration 0004. The column exists only
+there, so it is not on the model and is referenced by name below. Every
+query term becomes a prefix match
+(``salm`` finds "salmon"), and terms must all match somewhere in the product
+name, description or category name. Results are ranked with ``ts_rank_cd``,
+weighting name over category over description.
+
+Other backends (the single-node SQLite profile) search a ``SearchIndex``
+instead. This is an inverted index built from the catalog snapshot and uses
+the same matching rules and field weights.
+
+Both paths use the snapshot's ``SearchIndex`` vocabulary for typo tolerance.
+A query term that is not a prefix of any catalog word is corrected to words
+within one edit (two for terms of eight letters or more), so "salmn" finds
+"salmon".
+"""
+
+from __future__ import annotations
+
+import heapq
+import re
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+from uuid import UUID
+
+from sqlalchemy import and_, any_, bindparam, func, literal_column, or_, select
+from sqlalchemy.dialects.postgresql import ARRAY, TSVECTOR, UUID as PG_UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager
+
+from .models import Category, Product
+from .schemas import ProductOut
+
+MAX_QUERY_TERMS = 8
+# Prefix and typo expansions per query term; very short prefixes match a lot
+MAX_EXPANSIONS = 200
+# Relative field weights, mirroring ts_rank's defaults for the A/B/D labels
+NAME_WEIGHT, CATEGORY_WEIGHT, DESCRIPTION_WEIGHT = 1.0, 0.4, 0.1
+PREFIX_QUALITY = 0.9
+TYPO_QUALITY = 0.7
+
+# Letters and digits only: underscores and punctuation separate words, as in
+# PostgreSQL's text-search parser, which also keeps the terms safe to splice
+# into a tsquery string
+_WORD = re.compile(r"[^\W_]+")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _WORD.findall(text.lower()) if text else []
+
+
+def _trigrams(term: str) -> set:
+    # Leading padding only, so a prefix's trigrams are a subset of the word's
+    padded = "  " + term
+    return {padded[i : i + 3] for i in range(len(term))}
+
+
+def _max_edits(term: str) -> int:
+    if len(term) < 4:
+        return 0
+    return 1 if len(term) < 8 else 2
+
+
+def _edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance, or ``limit + 1`` once it exceeds ``limit``."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class SearchIndex:
+    """Inverted index over the active catalog, rebuilt with each snapshot."""
+
+    def __init__(self, products: Sequence[ProductOut]):
+        self.products = tuple(products)
+        postings: Dict[str, Dict[int, float]] = {}
+        category_words: Dict[str, Set[UUID]] = {}
+        for doc, product in enumerate(self.products):
+            for term in tokenize(product.category.name):
+                category_words.setdefault(term, set()).add(product.category.id)
+            for text, weight in (
+                (product.name, NAME_WEIGHT),
+                (product.category.name, CATEGORY_WEIGHT),
+                (product.description, DESCRIPTION_WEIGHT),
+            ):
+                for term in tokenize(text):
+                    docs = postings.setdefault(term, {})
+                    if docs.get(doc, 0.0) < weight:
+                        docs[doc] = weight
+        self._postings = postings
+        self._category_words = category_words
+        self._vocabulary = sorted(postings)
+        trigrams: Dict[str, List[str]] = {}
+        for term in self._vocabulary:
+            for gram in _trigrams(term):
+                trigrams.setdefault(gram, []).append(term)
+        self._trigrams = trigrams
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+    def _prefixed(self, term: str) -> List[str]:
+        start = bisect_left(self._vocabulary, term)
+        matches = []
+        for word in self._vocabulary[start : start + MAX_EXPANSIONS]:
+            if not word.startswith(term):
+                break
+            matches.append(word)
+        return matches
+
+    def _typos(self, term: str) -> Dict[str, int]:
+        limit = _max_edits(term)
+        if not limit:
+            return {}
+        grams = _trigrams(term)
+        # An edit breaks at most three trigrams (four for a transposition), so
+        # anything sharing fewer cannot be within ``limit`` edits of a prefix
+        needed = max(1, len(grams) - 4 * limit)
+        shared = Counter(word for gram in grams for word in self._trigrams.get(gram, ()))
+        typos: Dict[str, int] = {}
+        for word, count in shared.items():
+            if count < needed:
+                continue
+            distance = min(
+                _edit_distance(term, word[:length], limit)
+                for length in range(max(1, len(term) - limit), len(term) + limit + 1)
+            )
+            if distance <= limit:
+                typos[word] = distance
+        return dict(sorted(typos.items(), key=lambda item: (item[1], item[0]))[:MAX_EXPANSIONS])
+
+    def expand(self, term: str) -> Dict[str, float]:
+        """Catalog words ``term`` matches, with a match quality in (0, 1]."""
+        matches = {word: (1.0 if word == term else PREFIX_QUALITY) for word in self._prefixed(term)}
+        if matches:
+            return matches
+        return {word: TYPO_QUALITY**distance for word, distance in self._typos(term).items()}
+
+    def corrections(self, term: str) -> List[str]:
+        """Catalog words to try in place of a term that prefixes none of them."""
+        if self._prefixed(term):
+            return []
+        return list(self._typos(term))
+
+    def matching_categories(self, terms: Sequence[str]) -> List[UUID]:
+        """Categories whose name matches any of ``terms``, as the tsquery would."""
+        matched: Set[UUID] = set()
+        for term in terms:
+            for word in self.expand(term):
+                matched.update(self._category_words.get(word, ()))
+        return sorted(matched)
+
+    def search(self, query: str, limit: int, offset: int = 0) -> Tuple[int, List[ProductOut]]:
+        scores: Optional[Dict[int, float]] = None
+        for term in tokenize(query)[:MAX_QUERY_TERMS]:
+            term_scores: Dict[int, float] = {}
+            for word, quality in self.expand(term).items():
+                for doc, weight in self._postings[word].items():
+                    score = quality * weight
+                    if term_scores.get(doc, 0.0) < score:
+                        term_scores[doc] = score
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {doc: score + term_scores[doc] for doc, score in scores.items() if doc in term_scores}
+            if not scores:
+                return 0, []
+        if not scores:
+            return 0, []
+        products = self.products
+        ranked = heapq.nsmallest(
+            offset + limit,
+            scores,
+            key=lambda doc: (-scores[doc], products[doc].name, str(products[doc].id)),
+        )
+        return len(scores), [products[doc] for doc in ranked[offset:]]
+
+
+def _tsquery(index: SearchIndex, terms: Sequence[str]) -> str:
+    groups = []
+    for term in terms:
+        alternatives = [f"{term}:*", *index.corrections(term)]
+        groups.append(f"({' | '.join(alternatives)})")
+    return " & ".join(groups)
+
+
+_search_vector = literal_column("products.search_vector", TSVECTOR)
+_query = func.to_tsquery(literal_column("'simple'"), bindparam("tsquery"))
+_category_vector = func.setweight(func.to_tsvector(literal_column("'simple'"), Category.name), literal_column("'B'"))
+_document = _search_vector.op("||")(_category_vector)
+
+_matching = (
+    Product.is_active.is_(True),
+    # The GIN index finds products matching on their own text. Products in a
+    # category whose name matched a term come in through the category index
+    # and must then match every term across product and category together.
+    or_(
+        _search_vector.op("@@")(_query),
+        and_(
+            Product.category_id == any_(bindparam("category_ids", type_=ARRAY(PG_UUID(as_uuid=True)))),
+            _document.op("@@")(_query),
+        ),
+    ),
+)
+
+_search_page = (
+    select(Product, func.count().over().label("total"))
+    .join(Product.category)
+    .options(contains_eager(Product.category))
+    .where(*_matching)
+    .order_by(func.ts_rank_cd(_document, _query).desc(), Product.name, Product.id)
+    .limit(bindparam("limit"))
+    .offset(bindparam("offset"))
+)
+
+_search_count = select(func.count()).select_from(Product).join(Product.category).where(*_matching)
+
+
+async def search_database(
+    db: AsyncSession, index: SearchIndex, query: str, limit: int, offset: int = 0
+) -> Tuple[int, List[Product]]:
+    terms = tokenize(query)[:MAX_QUERY_TERMS]
+    if not terms:
+        return 0, []
+    params = {"tsquery": _tsquery(index, terms), "category_ids": index.matching_categories(terms)}
+    rows = (await db.execute(_search_page, {**params, "limit": limit, "offset": offset})).all()
+    if rows:
+        return rows[0].total, [row.Product for row in rows]
+    # Past the last page the window count is lost with the rows
+    total = (await db.scalar(_search_count, params)) if offset else 0
+    return total, []
+
+
+async def search_products(
+    db: AsyncSession, index: SearchIndex, query: str, limit: int, offset: int = 0
+) -> Tuple[int, list]:
+    if db.bind.dialect.name == "postgresql":
+        return await search_database(db, index, query, limit, offset)
+    return index.search(query, limit, offset)
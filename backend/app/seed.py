@@ -1,5 +1,6 @@
 from .auth import hash_password
-from .database import Base, SessionLocal, engine
+from .database import SessionLocal
+from .migrations import upgrade as upgrade_schema
 from datetime import datetime, timedelta
 
 from .models import (
@@ -19,8 +20,11 @@ from slugify import slugify
 
 
 def seed_database():
-    """Seed the database with initial data if it's empty."""
-    Base.metadata.create_all(bind=engine)
+    """Seed the database with initial data if it's empty.
+
+    Run as a deployment step (``python -m app.seed``), not from app startup.
+    """
+    upgrade_schema()
     
     db = SessionLocal()
     
@@ -160,6 +164,7 @@ def seed_database():
 
 # Legacy: Keep the old script behavior for backwards compatibility
 if __name__ == "__main__":
+    upgrade_schema()
     db = SessionLocal()
 
     # Admin user
@@ -4,7 +4,8 @@ import json
 from datetime import date, datetime
 from typing import Optional, Tuple
 
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from .models import SiteSetting
 
@@ -12,18 +13,14 @@ NEXT_DELIVERY_KEY = "next_delivery_settings"
 LEGACY_NEXT_DELIVERY_KEY = "next_delivery_date"
 
 
-def _load_setting(db: Session) -> Optional[SiteSetting]:
-    setting = (
-        db.query(SiteSetting)
-        .filter(SiteSetting.key == NEXT_DELIVERY_KEY)
-        .first()
+async def _load_setting(db: AsyncSession) -> Optional[SiteSetting]:
+    setting = await db.scalar(
+        select(SiteSetting).where(SiteSetting.key == NEXT_DELIVERY_KEY)
     )
     if setting:
         return setting
-    return (
-        db.query(SiteSetting)
-        .filter(SiteSetting.key == LEGACY_NEXT_DELIVERY_KEY)
-        .first()
+    return await db.scalar(
+        select(SiteSetting).where(SiteSetting.key == LEGACY_NEXT_DELIVERY_KEY)
     )
 
 
@@ -52,8 +49,8 @@ def _parse_setting_value(raw_value: Optional[str]) -> Tuple[Optional[str], Optio
         return scheduled_for.isoformat(), None, None
 
 
-def get_next_delivery(db: Session) -> dict:
-    setting = _load_setting(db)
+async def get_next_delivery(db: AsyncSession) -> dict:
+    setting = await _load_setting(db)
     scheduled_for_raw, cutoff_at_raw, window_label = _parse_setting_value(setting.value if setting else None)
 
     scheduled_for = None
@@ -78,13 +75,13 @@ def get_next_delivery(db: Session) -> dict:
     }
 
 
-def set_next_delivery(
-    db: Session,
+async def set_next_delivery(
+    db: AsyncSession,
     scheduled_for: Optional[date],
     cutoff_at: Optional[datetime],
     window_label: Optional[str],
 ) -> dict:
-    setting = _load_setting(db)
+    setting = await _load_setting(db)
     now = datetime.utcnow()
 
     normalized_label = window_label.strip() if window_label else None
@@ -109,8 +106,8 @@ def set_next_delivery(
         )
         db.add(setting)
 
-    db.commit()
-    db.refresh(setting)
+    await db.commit()
+    await db.refresh(setting)
 
     return {
         "scheduled_for": scheduled_for,
@@ -0,0 +1,214 @@
+"""Stock held for customers' carts and taken by their orders.
+
+``products.stock_kg`` is what is on hand. ``products.reserved_kg`` is the
+part of it held for carts, and always equals the sum of the product's rows
+in ``stock_reservations``. Both change in the same transaction, through
+conditional UPDATEs of the product row. Available stock is
+``stock_kg - reserved_kg``, read straight off the row: checking it never
+sums the holds. The storefront reads it from ``GET /products/availability``,
+which each stock write refreshes with ``catalog_cache.stock_changed()``
+rather than a rebuild of the whole catalog snapshot.
+
+* ``PUT /reservations/`` replaces a customer's holds (``hold``) and restarts
+  their ``RESERVATION_TTL_SECONDS``;
+* ``POST /orders/`` converts them. It deletes the customer's holds
+  (``take_holds``), and the held kilos count as available to that order;
+* the maintenance sweeper releases expired holds (``release_expired``).
+  Until it runs, an expired hold still keeps its kilos from other customers,
+  and its owner can still check them out.
+
+Admin edits, batch updates and imports that set ``stock_kg`` are refused
+when the new figure is below ``reserved_kg``: holds are never left pointing
+at stock that is no longer there. The check is part of the UPDATE (or, for
+imports, runs after it under its row locks), so a hold taken meanwhile
+still counts.
+
+Statements lock rows in one order: the customer (``hold`` only), their
+holds, then products by primary key (``locked_products``). Concurrent
+carts, checkouts, cancellations and sweeps therefore cannot deadlock.
+SQLite has no row locks; its single writer serialises them instead.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Set
+from uuid import UUID, uuid4
+
+from fastapi import HTTPException
+from sqlalchemy import and_, case, delete, insert, literal, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .catalog import catalog_cache
+from .config import settings
+from .models import Product, StockReservation, User
+
+AVAILABLE_KG = Product.stock_kg - Product.reserved_kg
+
+
+class StockShortfall(Exception):
+    """Holds on ``products`` could not grow: they are inactive, unknown or short of stock."""
+
+    def __init__(self, products: Set[UUID]):
+        super().__init__("Insufficient stock")
+        self.products = products
+
+
+def locked_products(product_ids):
+    """The given products, locked in primary-key order.
+
+    Every statement that changes stock or reserved stock selects its rows
+    through this. ``FOR UPDATE`` is ignored on SQLite.
+    """
+    return select(Product.id).where(Product.id.in_(product_ids)).order_by(Product.id).with_for_update()
+
+
+def per_product(quantities: Dict[UUID, float]):
+    if not quantities:
+        # A CASE needs at least one WHEN
+        return literal(0.0)
+    return case(*[(Product.id == product_id, qty) for product_id, qty in quantities.items()], else_=0.0)
+
+
+async def rejection(db: AsyncSession, requested: Iterable[UUID], taken: Set[UUID]) -> HTTPException:
+    """Why the products in ``requested`` but not in ``taken`` could not be had (the first, in order)."""
+    missing = [product_id for product_id in requested if product_id not in taken]
+    active = select(Product.id, Product.name).where(Product.id.in_(missing), Product.is_active.is_(True))
+    names = dict((await db.execute(active)).all())
+    product_id = missing[0]
+    if product_id not in names:
+        return HTTPException(status_code=400, detail=f"Invalid product {product_id}")
+    return HTTPException(status_code=400, detail=f"Insufficient stock for {names[product_id]}")
+
+
+async def below_holds(db: AsyncSession, product_ids: Iterable[UUID]) -> Optional[HTTPException]:
+    """Why stock could not be set on ``product_ids`` (the first by name), or
+    None when none of them exist."""
+    row = (
+        await db.execute(
+            select(Product.name, Product.reserved_kg)
+            .where(Product.id.in_(list(product_ids)))
+            .order_by(Product.name)
+            .limit(1)
+        )
+    ).first()
+    if row is None:
+        return None
+    return HTTPException(
+        status_code=400,
+        detail=f"Stock for {row.name} cannot go below the {row.reserved_kg:g} kg held for customers' carts",
+    )
+
+
+def _locked_holds(*conditions, skip_locked: bool = False):
+    return (
+        select(StockReservation.id)
+        .where(*conditions)
+        .order_by(StockReservation.id)
+        .with_for_update(skip_locked=skip_locked)
+    )
+
+
+async def take_holds(db: AsyncSession, user_id) -> Dict[UUID, float]:
+    """Delete the customer's holds and return their kilos per product.
+
+    The caller takes the kilos off ``reserved_kg`` in the same transaction.
+    """
+    rows = (
+        await db.execute(
+            delete(StockReservation)
+            .where(StockReservation.id.in_(_locked_holds(StockReservation.user_id == user_id)))
+            .returning(StockReservation.product_id, StockReservation.qty_kg)
+            .execution_options(synchronize_session=False)
+        )
+    ).all()
+    if rows:
+        db.info["pending_writes"] = True
+    return dict(rows)
+
+
+async def hold(db: AsyncSession, user_id, quantities: Dict[UUID, float]) -> None:
+    """Make the customer's holds exactly ``quantities``, expiring one TTL from now.
+
+    Raises ``StockShortfall`` when a hold cannot grow; the caller rolls back.
+    """
+    # Serialises one customer's cart updates; NO KEY UPDATE leaves their orders' foreign keys unblocked
+    await db.execute(select(User.id).where(User.id == user_id).with_for_update(key_share=True))
+    previous = await take_holds(db, user_id)
+    change = {
+        product_id: quantities.get(product_id, 0.0) - previous.get(product_id, 0.0)
+        for product_id in set(quantities) | set(previous)
+    }
+    change = {product_id: delta for product_id, delta in change.items() if delta}
+    if change:
+        growing = [product_id for product_id, delta in change.items() if delta > 0]
+        delta = per_product(change)
+        changed = await db.scalars(
+            update(Product)
+            .where(
+                Product.id.in_(locked_products(list(change))),
+                # Shrinking a hold always succeeds; growing one needs the kilos to be free
+                or_(Product.id.not_in(growing), and_(Product.is_active.is_(True), AVAILABLE_KG >= delta)),
+            )
+            .values(reserved_kg=Product.reserved_kg + delta)
+            .returning(Product.id)
+            .execution_options(synchronize_session=False)
+        )
+        short = set(change) - set(changed.all())
+        if short:
+            raise StockShortfall(short)
+
+    if quantities:
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=settings.RESERVATION_TTL_SECONDS)
+        await db.execute(
+            insert(StockReservation).values(
+                [
+                    {
+                        "id": uuid4(),
+                        "user_id": user_id,
+                        "product_id": product_id,
+                        "qty_kg": qty,
+                        "created_at": now,
+                        "expires_at": expires_at,
+                    }
+                    for product_id, qty in quantities.items()
+                ]
+            )
+        )
+    db.info["pending_writes"] = True
+
+
+async def release_expired(db: AsyncSession) -> int:
+    """Release every expired hold and commit; returns how many.
+
+    Holds being converted or replaced right now are skipped, not waited for.
+    """
+    rows = (
+        await db.execute(
+            delete(StockReservation)
+            .where(
+                StockReservation.id.in_(
+                    _locked_holds(StockReservation.expires_at <= datetime.utcnow(), skip_locked=True)
+                )
+            )
+            .returning(StockReservation.product_id, StockReservation.qty_kg)
+            .execution_options(synchronize_session=False)
+        )
+    ).all()
+    if not rows:
+        return 0
+    released: Dict[UUID, float] = defaultdict(float)
+    for product_id, qty in rows:
+        released[product_id] += qty
+    await db.execute(
+        update(Product)
+        .where(Product.id.in_(locked_products(list(released))))
+        .values(reserved_kg=Product.reserved_kg - per_product(released))
+        .execution_options(synchronize_session=False)
+    )
+    db.info["pending_writes"] = True
+    await db.commit()
+    catalog_cache.stock_changed()
+    return len(rows)
@@ -2,8 +2,8 @@ from datetime import datetime
 import re
 from typing import Dict
 
-from sqlalchemy import Integer, cast, func
-from sqlalchemy.orm import Session
+from sqlalchemy import Integer, cast, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from .models import User
 
@@ -148,13 +148,12 @@ def _extract_area_code(postcode: str) -> str:
     return area[:2].upper()
 
 
-def _next_sequential_suffix(db: Session, year_suffix: str) -> int:
+async def _next_sequential_suffix(db: AsyncSession, year_suffix: str) -> int:
     pattern = f"__{year_suffix}%"
-    max_suffix = (
-        db.query(func.max(cast(func.substr(User.user_code, 5), Integer)))
-        .filter(User.user_code.isnot(None))
-        .filter(User.user_code.like(pattern))
-        .scalar()
+    max_suffix = await db.scalar(
+        select(func.max(cast(func.substr(User.user_code, 5), Integer)))
+        .where(User.user_code.isnot(None))
+        .where(User.user_code.like(pattern))
     )
 
     if not max_suffix or max_suffix < 0:
@@ -162,8 +161,8 @@ def _next_sequential_suffix(db: Session, year_suffix: str) -> int:
     return max_suffix + 1
 
 
-def generate_user_code(db: Session, postcode: str) -> str:
+async def generate_user_code(db: AsyncSession, postcode: str) -> str:
     area_code = _extract_area_code(postcode)
     year_suffix = datetime.utcnow().strftime("%y")
-    next_seq = _next_sequential_suffix(db, year_suffix)
+    next_seq = await _next_sequential_suffix(db, year_suffix)
     return f"{area_code}{year_suffix}{str(next_seq).zfill(4)}"
@@ -0,0 +1,139 @@
+"""Daily restock through one ``PATCH /admin/products:batch`` versus one ``PATCH /admin/products/{id}`` each.
+
+Drives the app in process (httpx over ASGI, lifespan included) against a
+fresh database. For each batch size it changes price and stock on that many
+products, first one request per product and then in a single batch request,
+and reports wall time::
+
+    python benchmarks/bench_admin_batch_update.py --sizes 10 50 200 \\
+        --database-url postgresql+psycopg://postgres@localhost/tarel_bench
+
+Defaults to a SQLite file. The database is dropped and rebuilt, so never
+point this at real data.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import create_engine, insert, text  # noqa: E402
+from sqlalchemy.engine import make_url  # noqa: E402
+
+_TABLES = (
+    "order_items, orders, support_messages, products, categories, users, cut_clean_options, "
+    "site_settings, schema_migrations"
+)
+
+
+def _seed(url: str, products: int) -> list:
+    # Imported here: app.config reads DATABASE_URL at import time
+    from app.auth import hash_password
+    from app.migrations import upgrade
+    from app.models import Category, Product, RoleEnum, User
+
+    engine = create_engine(url)
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {_TABLES} CASCADE"))
+            conn.execute(text("DROP TYPE IF EXISTS roleenum, orderstatusenum, supportstatusenum"))
+    elif make_url(url).database and Path(make_url(url).database).exists():
+        Path(make_url(url).database).unlink()
+    upgrade(engine)
+    category_id = uuid.uuid4()
+    product_ids = [uuid.uuid4() for _ in range(products)]
+    with engine.begin() as conn:
+        conn.execute(
+            insert(User),
+            [
+                {
+                    "id": uuid.uuid4(),
+                    "name": "Bench Admin",
+                    "email": "bench-admin@example.com",
+                    "password_hash": hash_password("bench-password"),
+                    "role": RoleEnum.admin,
+                }
+            ],
+        )
+        conn.execute(insert(Category), [{"id": category_id, "name": "Fresh", "slug": "fresh", "is_active": True}])
+        conn.execute(
+            insert(Product),
+            [
+                {
+                    "id": product_id,
+                    "name": f"Fish {n}",
+                    "slug": f"fish-{n}",
+                    "price_per_kg": 12.5,
+                    "stock_kg": 10,
+                    "is_dry": False,
+                    "is_active": True,
+                    "category_id": category_id,
+                }
+                for n, product_id in enumerate(product_ids)
+            ],
+        )
+    engine.dispose()
+    return [str(product_id) for product_id in product_ids]
+
+
+async def _run(product_ids: list, sizes: list, repeat: int) -> None:
+    from app.main import app
+
+    rng = random.Random(3)
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            res = await client.post(
+                "/api/auth/login", data={"username": "bench-admin@example.com", "password": "bench-password"}
+            )
+            res.raise_for_status()
+            headers = {"Authorization": f"Bearer {res.json()['access_token']}"}
+
+            print(f"  {'products':>8} {'one request each':>18} {'one batch':>12} {'speedup':>8}")
+            for size in sizes:
+                singles, batches = [], []
+                for _ in range(repeat):
+                    items = [
+                        {"id": product_id, "price_per_kg": round(rng.uniform(5, 40), 2), "stock_kg": rng.randrange(50)}
+                        for product_id in rng.sample(product_ids, size)
+                    ]
+                    started = time.perf_counter()
+                    for item in items:
+                        changes = {key: value for key, value in item.items() if key != "id"}
+                        res = await client.patch(f"/api/admin/products/{item['id']}", json=changes, headers=headers)
+                        res.raise_for_status()
+                    singles.append(time.perf_counter() - started)
+
+                    started = time.perf_counter()
+                    res = await client.patch("/api/admin/products:batch", json={"items": items}, headers=headers)
+                    res.raise_for_status()
+                    batches.append(time.perf_counter() - started)
+                single, batch = statistics.median(singles), statistics.median(batches)
+                print(f"  {size:>8} {single * 1000:>16.1f}ms {batch * 1000:>10.1f}ms {single / batch:>7.0f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--database-url", default="sqlite:///./bench_batch.db")
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = args.database_url
+    product_ids = _seed(args.database_url, args.products)
+    print(f"{args.products} products on {make_url(args.database_url).get_backend_name()}")
+    asyncio.run(_run(product_ids, args.sizes, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Side-by-side throughput of the sync (threadpool) and async DB paths.
+
+Both apps serve the same catalog query as ``GET /products/``; the only
+difference is ``Session`` in a threadpool handler versus ``AsyncSession`` in
+an ``async def`` handler. ``--sleep-ms`` adds a server-side ``pg_sleep`` to
+every request to model a slower query, which is where the threadpool limit
+starts to bite::
+
+    python benchmarks/bench_async_vs_sync.py --concurrency 200 --sleep-ms 20
+
+Each app is started in its own uvicorn process against ``DATABASE_URL``.
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fastapi import Depends, FastAPI  # noqa: E402
+from sqlalchemy import select, text  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession  # noqa: E402
+from sqlalchemy.orm import Session, selectinload  # noqa: E402
+
+from app.database import get_async_db, get_db  # noqa: E402
+from app.models import Product  # noqa: E402
+
+SLEEP_SECONDS = float(os.getenv("BENCH_SLEEP_MS", "0")) / 1000
+
+_catalog_query = (
+    select(Product)
+    .options(selectinload(Product.category))
+    .where(Product.is_active.is_(True))
+)
+
+sync_app = FastAPI()
+async_app = FastAPI()
+
+
+@sync_app.get("/products/")
+def sync_products(db: Session = Depends(get_db)):
+    if SLEEP_SECONDS:
+        db.execute(text("SELECT pg_sleep(:s)"), {"s": SLEEP_SECONDS})
+    return [product.slug for product in db.scalars(_catalog_query).all()]
+
+
+@async_app.get("/products/")
+async def async_products(db: AsyncSession = Depends(get_async_db)):
+    if SLEEP_SECONDS:
+        await db.execute(text("SELECT pg_sleep(:s)"), {"s": SLEEP_SECONDS})
+    return [product.slug for product in (await db.scalars(_catalog_query)).all()]
+
+
+async def _drive(base_url: str, concurrency: int, duration: float) -> tuple[int, list[float], int]:
+    latencies: list[float] = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                res = await client.get("/products/")
+                res.raise_for_status()
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    return len(latencies), latencies, errors
+
+
+def _run(app_name: str, port: int, args) -> None:
+    env = dict(os.environ, BENCH_SLEEP_MS=str(args.sleep_ms))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", f"benchmarks.bench_async_vs_sync:{app_name}",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=Path(__file__).resolve().parents[1],
+        env=env,
+    )
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        for _ in range(100):
+            try:
+                httpx.get(f"{base_url}/products/", timeout=1)
+                break
+            except httpx.HTTPError:
+                time.sleep(0.1)
+        count, latencies, errors = asyncio.run(_drive(base_url, args.concurrency, args.duration))
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1] if latencies else 0.0
+    print(
+        f"{app_name:<10} {count / args.duration:8.1f} req/s  "
+        f"p99={p99 * 1000:7.1f}ms  errors={errors}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--sleep-ms", type=float, default=0.0)
+    parser.add_argument("--port", type=int, default=8090)
+    args = parser.parse_args()
+
+    _run("sync_app", args.port, args)
+    _run("async_app", args.port + 1, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""Filtered, faceted catalog pages from ``BrowseIndex`` versus per-request SQL with GROUP BY facets.
+
+For each catalog size this times ``BrowseIndex.browse`` on a set of filter
+combinations (page plus total and facet counts) and, with ``--database-url``,
+the equivalent SQL a database-backed endpoint would issue per page view: the
+page itself, a count, and GROUP BY counts per category and per dry/fresh::
+
+    createdb tarel_bench
+    python benchmarks/bench_catalog_browse.py --sizes 500 10000 100000 \\
+        --database-url postgresql+psycopg://postgres@localhost/tarel_bench
+
+The database is dropped and rebuilt for every size, so never point this at
+real data.
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import create_engine, func, insert, select, text  # noqa: E402
+from sqlalchemy.engine import make_url  # noqa: E402
+
+from app.browse import BrowseFilters, BrowseIndex  # noqa: E402
+from app.migrations import upgrade  # noqa: E402
+from app.models import Category, Product  # noqa: E402
+from app.schemas import CategoryOut, ProductOut  # noqa: E402
+
+_TABLES = (
+    "order_items, orders, support_messages, products, categories, users, cut_clean_options, "
+    "site_settings, schema_migrations"
+)
+CASES = {
+    "everything, by name": (BrowseFilters(), "name_asc"),
+    "one category, by price": (BrowseFilters(categories=("category-1",)), "price_asc"),
+    "dry, in stock, 10-20": (BrowseFilters(is_dry=True, in_stock=True, min_price=10, max_price=20), "price_desc"),
+    "two categories, fresh": (BrowseFilters(categories=("category-2", "category-5"), is_dry=False), "name_desc"),
+}
+
+
+def _catalog(size: int, categories: int = 12, seed: int = 11) -> tuple[list, list]:
+    rng = random.Random(seed)
+    category_rows = [
+        {"id": uuid.uuid4(), "name": f"Category {n}", "slug": f"category-{n}", "is_active": True}
+        for n in range(categories)
+    ]
+    product_rows = [
+        {
+            "id": uuid.uuid4(),
+            "name": f"Fish {rng.randrange(10 ** 6):06d}",
+            "slug": f"fish-{n}",
+            "price_per_kg": round(rng.uniform(4, 40), 2),
+            "stock_kg": rng.choice((0, 0, 5, 20, 100)),
+            "is_dry": rng.random() < 0.3,
+            "is_active": True,
+            "category_id": category_rows[n % categories]["id"],
+        }
+        for n in range(size)
+    ]
+    return category_rows, product_rows
+
+
+def _browse_index(category_rows: list, product_rows: list) -> tuple[BrowseIndex, float]:
+    categories = {row["id"]: CategoryOut(description=None, **row) for row in category_rows}
+    products = [
+        ProductOut(
+            description=None,
+            image_url=None,
+            category=categories[row["category_id"]],
+            **{key: value for key, value in row.items() if key != "category_id"},
+        )
+        for row in product_rows
+    ]
+    started = time.perf_counter()
+    index = BrowseIndex(products)
+    return index, time.perf_counter() - started
+
+
+def _sql_page(conn, filters: BrowseFilters, sort: str, ids_by_slug: dict) -> None:
+    conditions = [Product.is_active.is_(True)]
+    if filters.in_stock:
+        conditions.append(Product.stock_kg > 0)
+    if filters.min_price is not None:
+        conditions.append(Product.price_per_kg >= filters.min_price)
+    if filters.max_price is not None:
+        conditions.append(Product.price_per_kg <= filters.max_price)
+    category_filter = [Product.category_id.in_([ids_by_slug[slug] for slug in filters.categories])]
+    dry_filter = [] if filters.is_dry is None else [Product.is_dry.is_(filters.is_dry)]
+    if not filters.categories:
+        category_filter = []
+    column, direction = sort.rsplit("_", 1)
+    order = getattr(Product.price_per_kg if column == "price" else Product.name, direction)()
+    conn.execute(
+        select(Product).where(*conditions, *category_filter, *dry_filter).order_by(order, Product.id).limit(24)
+    ).all()
+    conn.execute(select(func.count()).select_from(Product).where(*conditions, *category_filter, *dry_filter)).all()
+    conn.execute(
+        select(Product.category_id, func.count()).where(*conditions, *dry_filter).group_by(Product.category_id)
+    ).all()
+    conn.execute(
+        select(Product.is_dry, func.count()).where(*conditions, *category_filter).group_by(Product.is_dry)
+    ).all()
+
+
+def _time(call, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    if args.database_url and make_url(args.database_url).get_backend_name() != "postgresql":
+        parser.error("--database-url must point at PostgreSQL")
+
+    for size in args.sizes:
+        category_rows, product_rows = _catalog(size)
+        index, build_seconds = _browse_index(category_rows, product_rows)
+        print(f"\n{size} products (BrowseIndex built in {build_seconds * 1000:.1f}ms)")
+
+        engine = None
+        if args.database_url:
+            engine = create_engine(args.database_url)
+            with engine.begin() as conn:
+                conn.execute(text(f"DROP TABLE IF EXISTS {_TABLES} CASCADE"))
+                conn.execute(text("DROP TYPE IF EXISTS roleenum, orderstatusenum, supportstatusenum"))
+            upgrade(engine)
+            with engine.begin() as conn:
+                conn.execute(insert(Category), category_rows)
+                conn.execute(insert(Product), product_rows)
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                conn.execute(text("VACUUM ANALYZE products"))
+        ids_by_slug = {row["slug"]: row["id"] for row in category_rows}
+        available = {row["id"]: row["stock_kg"] for row in product_rows}
+
+        print(f"  {'case':<26} {'in-memory':>11} {'SQL':>11}")
+        for label, (filters, sort) in CASES.items():
+            memory = _time(lambda: index.browse(filters, sort=sort, available=available), args.repeat)
+            database = ""
+            if engine is not None:
+                with engine.connect() as conn:
+                    seconds = _time(lambda: _sql_page(conn, filters, sort, ids_by_slug), args.repeat)
+                database = f"{seconds * 1000:9.2f}ms"
+            print(f"  {label:<26} {memory * 1000:9.3f}ms {database:>11}")
+        if engine is not None:
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
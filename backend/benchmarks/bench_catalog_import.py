@@ -0,0 +1,172 @@
+"""Throughput of the bulk product import/export versus one admin request per row.
+
+Times ``catalog_io.import_products`` creating a catalog from CSV and NDJSON,
+then applying a full-catalog price list (``slug,price_per_kg``), and streams
+the catalog back out with ``export_products``. For comparison, the first
+``--per-row`` products are created the way ``POST /admin/products`` does it:
+a slug check, a category lookup, an INSERT and a commit per product::
+
+    createdb tarel_bench
+    python benchmarks/bench_catalog_import.py --rows 50000 \\
+        --database-url postgresql+psycopg://postgres@localhost/tarel_bench
+
+Any ``DATABASE_URL`` works (a SQLite file stages through batched INSERTs
+instead of COPY). The database is dropped and rebuilt for every run, so never
+point this at real data.
+"""
+
+import argparse
+import asyncio
+import csv
+import io
+import json
+import random
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import create_engine, delete, insert, select, text  # noqa: E402
+from sqlalchemy.engine import make_url  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine  # noqa: E402
+
+from app.catalog_io import export_products, import_products  # noqa: E402
+from app.database import async_database_url  # noqa: E402
+from app.migrations import upgrade  # noqa: E402
+from app.models import Category, Product  # noqa: E402
+
+_TABLES = (
+    "order_items, orders, support_messages, products, categories, users, cut_clean_options, "
+    "site_settings, schema_migrations"
+)
+CATEGORIES = ("fresh-fish", "shellfish", "dried-seafood", "smoked", "frozen", "ready-to-cook")
+CHUNK_SIZE = 64 * 1024
+
+
+def _rows(count: int, seed: int = 5) -> list:
+    rng = random.Random(seed)
+    return [
+        {
+            "slug": f"product-{n}",
+            "name": f"Product {n}",
+            "description": f"Line caught, landed daily, lot {rng.randrange(10 ** 6)}",
+            "price_per_kg": round(rng.uniform(4, 40), 2),
+            "stock_kg": rng.choice((0, 5, 20, 100)),
+            "category": CATEGORIES[n % len(CATEGORIES)],
+            "is_dry": n % 3 == 0,
+        }
+        for n in range(count)
+    ]
+
+
+def _csv(rows: list, columns: list) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, columns, extrasaction="ignore")
+    writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue().encode()
+
+
+def _ndjson(rows: list) -> bytes:
+    return "".join(json.dumps(row) + "\n" for row in rows).encode()
+
+
+async def _chunks(body: bytes):
+    for start in range(0, len(body), CHUNK_SIZE):
+        yield body[start : start + CHUNK_SIZE]
+
+
+def _reset(url: str) -> None:
+    engine = create_engine(url)
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {_TABLES} CASCADE"))
+            conn.execute(text("DROP TYPE IF EXISTS roleenum, orderstatusenum, supportstatusenum"))
+    else:
+        path = make_url(url).database
+        if path and Path(path).exists():
+            Path(path).unlink()
+    upgrade(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Category), [{"id": uuid.uuid4(), "name": slug, "slug": slug} for slug in CATEGORIES])
+    engine.dispose()
+
+
+def _report(label: str, rows: int, size: int, seconds: float) -> None:
+    print(f"  {label:<36} {seconds:8.2f}s {rows / seconds:>10,.0f} rows/s {size / seconds / 2 ** 20:7.1f} MiB/s")
+
+
+async def _import(engine, label: str, body: bytes, fmt: str) -> dict:
+    started = time.perf_counter()
+    async with AsyncSession(engine) as db:
+        result = await import_products(db, _chunks(body), fmt)
+        await db.commit()
+    _report(label, result["rows"], len(body), time.perf_counter() - started)
+    return result
+
+
+async def _export(engine, fmt: str, rows: int) -> None:
+    started = time.perf_counter()
+    size = 0
+    async with AsyncSession(engine) as db:
+        async for chunk in export_products(db, fmt):
+            size += len(chunk)
+    _report(f"export {fmt}", rows, size, time.perf_counter() - started)
+
+
+async def _per_row(engine, rows: list) -> None:
+    async with AsyncSession(engine) as db:
+        category_ids = dict((await db.execute(select(Category.slug, Category.id))).all())
+    started = time.perf_counter()
+    async with AsyncSession(engine) as db:
+        for row in rows:
+            # What add_product does for each product
+            if await db.scalar(select(Product).where(Product.slug == row["slug"])):
+                raise RuntimeError("slug exists")
+            category_id = category_ids[row["category"]]
+            await db.get(Category, category_id)
+            values = {key: value for key, value in row.items() if key != "category"}
+            db.add(Product(category_id=category_id, **values))
+            await db.commit()
+        await db.execute(delete(Product))
+        await db.commit()
+    _report(f"POST /admin/products x {len(rows)}", len(rows), 0, time.perf_counter() - started)
+
+
+async def _run(url, rows: list, per_row: int) -> None:
+    engine = create_async_engine(url)
+    if per_row:
+        await _per_row(engine, rows[:per_row])
+    columns = ["slug", "name", "description", "price_per_kg", "stock_kg", "category", "is_dry"]
+    await _import(engine, "import csv (create)", _csv(rows, columns), "csv")
+    async with AsyncSession(engine) as db:
+        await db.execute(delete(Product))
+        await db.commit()
+    await _import(engine, "import ndjson (create)", _ndjson(rows), "ndjson")
+
+    rng = random.Random(9)
+    for row in rows:
+        row["price_per_kg"] = round(row["price_per_kg"] * rng.choice((0.9, 1.0, 1.1)), 2)
+    result = await _import(engine, "import csv price list (update)", _csv(rows, ["slug", "price_per_kg"]), "csv")
+    print(f"    {result}")
+    await _export(engine, "csv", len(rows))
+    await _export(engine, "ndjson", len(rows))
+    await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--per-row", type=int, default=2_000, help="products created one request at a time")
+    parser.add_argument("--database-url", default="sqlite:///./bench_import.db")
+    args = parser.parse_args()
+
+    _reset(args.database_url)
+    print(f"{args.rows} products on {make_url(args.database_url).get_backend_name()}")
+    asyncio.run(_run(async_database_url(args.database_url), _rows(args.rows), args.per_row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Per-request cost of ``GET /products/`` through ``response_model`` versus prepared catalog bytes.
+
+Mounts three routes on a bare FastAPI app and drives them in-process over
+ASGI, so the numbers are framework and serialisation cost only (no network,
+no database):
+
+* ``response_model``: ORM ``Product`` objects validated through
+  ``List[ProductOut]`` and JSON-encoded on every request (the old path);
+* ``prepared``: the snapshot's ``PreparedBody`` written out as-is;
+* ``prepared+gzip``: the same with ``Accept-Encoding: gzip`` (timings
+  include the client decompressing it).
+
+::
+
+    python benchmarks/bench_catalog_response.py --products 300 --requests 2000
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import httpx  # noqa: E402
+from fastapi import FastAPI, Request  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+from app.http_cache import PreparedBody, prepared_response  # noqa: E402
+from app.models import Category, Product  # noqa: E402
+from app.schemas import ProductOut  # noqa: E402
+
+
+def _catalog(count: int) -> list:
+    categories = [
+        Category(id=uuid.uuid4(), name=f"Category {n}", slug=f"category-{n}", is_active=True) for n in range(8)
+    ]
+    return [
+        Product(
+            id=uuid.uuid4(),
+            name=f"Fish {n}",
+            slug=f"fish-{n}",
+            description="Line-caught, gutted and scaled on request. Delivered on ice.",
+            price_per_kg=9.5 + n % 40,
+            image_url=f"https://res.cloudinary.com/tarel/image/upload/v1/products/fish-{n}.jpg",
+            stock_kg=100.0,
+            is_dry=n % 5 == 0,
+            is_active=True,
+            category=categories[n % len(categories)],
+        )
+        for n in range(count)
+    ]
+
+
+def _app(products: list) -> FastAPI:
+    items = [ProductOut.model_validate(product) for product in products]
+    prepared = PreparedBody.from_json(TypeAdapter(List[ProductOut]).dump_json(items))
+    app = FastAPI()
+
+    @app.get("/response-model", response_model=List[ProductOut])
+    async def response_model():
+        return products
+
+    @app.get("/prepared", response_model=List[ProductOut])
+    async def prepared_route(request: Request):
+        return prepared_response(request, prepared)
+
+    print(
+        f"{len(products)} products: {len(prepared.body) / 1024:.1f} KiB JSON, "
+        f"{len(prepared.gzipped or b'') / 1024:.1f} KiB gzip"
+    )
+    return app
+
+
+async def _drive(app: FastAPI, requests: int) -> None:
+    cases = (
+        ("response_model", "/response-model", "identity"),
+        ("prepared", "/prepared", "identity"),
+        ("prepared+gzip", "/prepared", "gzip"),
+    )
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        bodies = {}
+        for label, path, encoding in cases:
+            headers = {"Accept-Encoding": encoding}
+            for _ in range(50):
+                await client.get(path, headers=headers)
+            samples = []
+            for _ in range(requests):
+                started = time.perf_counter()
+                res = await client.get(path, headers=headers)
+                samples.append(time.perf_counter() - started)
+            bodies[label] = res.json()
+            print(
+                f"{label:<15} median={statistics.median(samples) * 1e3:7.3f}ms "
+                f"mean={statistics.fmean(samples) * 1e3:7.3f}ms "
+                f"{requests / sum(samples):8.0f} req/s  wire={int(res.headers['content-length']) / 1024:6.1f} KiB"
+            )
+        assert bodies["response_model"] == bodies["prepared"] == bodies["prepared+gzip"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=300)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    asyncio.run(_drive(_app(_catalog(args.products)), args.requests))
+
+
+if __name__ == "__main__":
+    main()
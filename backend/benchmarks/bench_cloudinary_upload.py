@@ -0,0 +1,147 @@
+"""Upload latency with Cloudinary on: a blocking upload in the request versus spool and background push.
+
+Cloudinary is replaced by ``LocalStandIn`` with a fixed ``--latency`` per
+upload, standing in for the network round trip and their processing. The
+app runs in process (httpx over ASGI, lifespan included) against a fresh
+SQLite file. ``--concurrency`` admins upload ``--uploads`` photos through:
+
+* ``inline``: a route doing what the endpoint used to do, a blocking
+  upload inside the request on a threadpool slot;
+* ``spooled``: the real endpoint, which answers from the local spool and
+  pushes in the background. "all pushed" is when the last push finished.
+
+::
+
+    python benchmarks/bench_cloudinary_upload.py --uploads 24 --concurrency 4 --latency 0.8
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import create_engine, insert  # noqa: E402
+
+
+class SlowStandIn:
+    def __init__(self, latency: float):
+        from app.media.remote import LocalStandIn
+
+        self.latency = latency
+        self.stand_in = LocalStandIn()
+
+    def upload(self, path: str, public_id: str) -> str:
+        time.sleep(self.latency)
+        return self.stand_in.upload(path, public_id)
+
+
+def _seed(url: str) -> None:
+    from app.auth import hash_password
+    from app.migrations import upgrade
+    from app.models import RoleEnum, User
+
+    engine = create_engine(url)
+    upgrade(engine)
+    with engine.begin() as conn:
+        conn.execute(
+            insert(User),
+            [
+                {
+                    "id": uuid.uuid4(),
+                    "name": "Bench Admin",
+                    "email": "bench-admin@example.com",
+                    "password_hash": hash_password("bench-password"),
+                    "role": RoleEnum.admin,
+                }
+            ],
+        )
+    engine.dispose()
+
+
+async def _timed_uploads(client, path: str, headers: dict, uploads: int, concurrency: int) -> list:
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(n: int) -> float:
+        async with gate:
+            photo = os.urandom(200_000) + n.to_bytes(4, "big")
+            started = time.perf_counter()
+            res = await client.post(path, headers=headers, files={"file": (f"{n}.jpg", photo, "image/jpeg")})
+            res.raise_for_status()
+            return time.perf_counter() - started
+
+    return await asyncio.gather(*(one(n) for n in range(uploads)))
+
+
+def _report(label: str, latencies: list, total: float) -> None:
+    print(
+        f"  {label:<10} p50 {statistics.median(latencies) * 1000:7.0f}ms  max {max(latencies) * 1000:7.0f}ms"
+        f"  all answered {total:6.2f}s"
+    )
+
+
+async def _run(args) -> None:
+    from fastapi import File, UploadFile
+
+    from app.config import settings
+    from app.main import app
+    from app.media import cloudinary_uploads, store_upload
+    from app.routers.admin import MAX_IMAGE_SIZE_BYTES
+
+    client_stub = SlowStandIn(args.latency)
+    cloudinary_uploads.client = client_stub
+
+    @app.post("/bench/inline-upload")
+    def inline_upload(file: UploadFile = File(...)):
+        stored = store_upload(file.file, ".jpg", MAX_IMAGE_SIZE_BYTES)
+        url = client_stub.upload(str(Path(settings.MEDIA_ROOT) / stored.path), Path(stored.path).stem)
+        return {"url": url}
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            res = await client.post(
+                "/api/auth/login", data={"username": "bench-admin@example.com", "password": "bench-password"}
+            )
+            headers = {"Authorization": f"Bearer {res.json()['access_token']}"}
+
+            started = time.perf_counter()
+            latencies = await _timed_uploads(client, "/bench/inline-upload", headers, args.uploads, args.concurrency)
+            _report("inline", latencies, time.perf_counter() - started)
+
+            started = time.perf_counter()
+            path = "/api/admin/products/upload-image"
+            latencies = await _timed_uploads(client, path, headers, args.uploads, args.concurrency)
+            _report("spooled", latencies, time.perf_counter() - started)
+            while cloudinary_uploads.stats()["pending"]:
+                await asyncio.sleep(0.01)
+            print(f"  {'':<10} all pushed {time.perf_counter() - started:6.2f}s, {cloudinary_uploads.stats()}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--uploads", type=int, default=24)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.8, help="seconds per Cloudinary upload")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{tmp}/bench_cloudinary.db"
+        os.environ.update(
+            DATABASE_URL=url, MEDIA_ROOT=f"{tmp}/media", USE_CLOUDINARY="true", CLOUDINARY_CLOUD_NAME="bench"
+        )
+        _seed(url)
+        print(f"{args.uploads} uploads, {args.concurrency} at a time, {args.latency}s per Cloudinary upload")
+        asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""Concurrent ``POST /orders/``: the set-based stock decrement versus the old per-line read-check-write.
+
+Drives the app in process (httpx over ASGI, lifespan included) with
+``--customers`` concurrent checkout loops, each placing ``--lines``-line
+orders. The same traffic runs twice: through the real endpoint and through
+a copy of the previous handler, which did one SELECT per line, checked stock
+in Python and wrote back the decremented value::
+
+    python benchmarks/bench_concurrent_checkout.py --customers 16 --duration 10 \\
+        --database-url postgresql+psycopg://postgres@localhost/tarel_bench
+
+Two scenarios per handler, both on a freshly rebuilt database:
+
+* ``plenty``: 200 products with effectively unlimited stock. This measures
+  throughput.
+* ``rush``: ``--hot`` products with ``--stock`` kg each, bought until they
+  run out. It reports kilos sold (from order_items) against kilos the stock
+  actually went down, so any oversold quantity shows up, along with the
+  lowest stock left.
+
+Defaults to a SQLite file in a temporary directory. The database is dropped
+and rebuilt, so never point this at real data.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import bindparam, create_engine, func, insert, select, text  # noqa: E402
+from sqlalchemy.engine import make_url  # noqa: E402
+
+_TABLES = (
+    "order_items, orders, support_messages, products, categories, users, cut_clean_options, "
+    "site_settings, schema_migrations"
+)
+
+
+def _seed(url: str, customers: int, products: int, stock: float) -> tuple:
+    # Imported here: app.config reads DATABASE_URL at import time
+    from app.auth import create_access_token, hash_password
+    from app.migrations import upgrade
+    from app.models import Category, Product, RoleEnum, User
+
+    engine = create_engine(url)
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {_TABLES} CASCADE"))
+            conn.execute(text("DROP TYPE IF EXISTS roleenum, orderstatusenum, supportstatusenum"))
+    elif make_url(url).database and Path(make_url(url).database).exists():
+        Path(make_url(url).database).unlink()
+    upgrade(engine)
+    password_hash = hash_password("bench-password")
+    user_ids = [uuid.uuid4() for _ in range(customers)]
+    category_id = uuid.uuid4()
+    product_ids = [uuid.uuid4() for _ in range(products)]
+    with engine.begin() as conn:
+        conn.execute(
+            insert(User),
+            [
+                {
+                    "id": user_id,
+                    "name": f"Customer {n}",
+                    "email": f"customer-{n}@example.com",
+                    "password_hash": password_hash,
+                    "role": RoleEnum.user,
+                }
+                for n, user_id in enumerate(user_ids)
+            ],
+        )
+        conn.execute(insert(Category), [{"id": category_id, "name": "Fresh", "slug": "fresh", "is_active": True}])
+        conn.execute(
+            insert(Product),
+            [
+                {
+                    "id": product_id,
+                    "name": f"Fish {n}",
+                    "slug": f"fish-{n}",
+                    "price_per_kg": 12.5,
+                    "stock_kg": stock,
+                    "is_dry": False,
+                    "is_active": True,
+                    "category_id": category_id,
+                }
+                for n, product_id in enumerate(product_ids)
+            ],
+        )
+    engine.dispose()
+    tokens = [create_access_token({"sub": str(user_id), "role": RoleEnum.user}) for user_id in user_ids]
+    return tokens, [str(product_id) for product_id in product_ids]
+
+
+def _install_legacy_route(app) -> None:
+    """The handler as it was before the set-based rewrite."""
+    from fastapi import Depends, HTTPException
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    from app.catalog import catalog_cache
+    from app.database import get_async_db
+    from app.deps import get_current_user
+    from app.models import Order, OrderItem, Product
+    from app.routers.orders import _load_order
+    from app.schemas import OrderCreate, OrderOut
+
+    active_product_by_id = select(Product).where(Product.id == bindparam("product_id"), Product.is_active.is_(True))
+
+    @app.post("/bench/legacy-order", response_model=OrderOut)
+    async def legacy_create_order(
+        payload: OrderCreate, db: AsyncSession = Depends(get_async_db), user=Depends(get_current_user)
+    ):
+        items = []
+        subtotal = 0.0
+        for it in payload.items:
+            prod = await db.scalar(active_product_by_id, {"product_id": it.product_id})
+            if not prod:
+                raise HTTPException(status_code=400, detail=f"Invalid product {it.product_id}")
+            if prod.stock_kg < it.qty_kg:
+                raise HTTPException(status_code=400, detail=f"Insufficient stock for {prod.name}")
+            subtotal += it.qty_kg * prod.price_per_kg
+            items.append((prod, it.qty_kg))
+        order = Order(
+            user_id=user.id,
+            total_amount=subtotal + (0.0 if subtotal >= 20.0 else 1.0),
+            delivery_slot=payload.delivery_slot,
+            address_line=payload.address_line,
+            postcode=payload.postcode,
+        )
+        db.add(order)
+        await db.flush()
+        for prod, qty in items:
+            db.add(OrderItem(order_id=order.id, product_id=prod.id, qty_kg=qty, price_per_kg=prod.price_per_kg))
+            prod.stock_kg -= qty
+        await db.commit()
+        catalog_cache.invalidate()
+        return await _load_order(db, order.id)
+
+
+async def _checkouts(app, path: str, tokens: list, product_ids: list, args, until_sold_out: bool) -> dict:
+    results = {"orders": 0, "rejected": 0, "errors": 0}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        deadline = time.perf_counter() + args.duration
+
+        async def customer(token: str, seed: int):
+            rng = random.Random(seed)
+            headers = {"Authorization": f"Bearer {token}"}
+            rejected_in_a_row = 0
+            while time.perf_counter() < deadline and rejected_in_a_row < 20:
+                lines = rng.sample(product_ids, min(args.lines, len(product_ids)))
+                body = {
+                    "items": [{"product_id": product_id, "qty_kg": 1} for product_id in lines],
+                    "address_line": "1 Dock Street",
+                    "postcode": "EH6 6AA",
+                    "delivery_slot": "Evening",
+                }
+                res = await client.post(path, json=body, headers=headers)
+                if res.status_code == 200:
+                    results["orders"] += 1
+                    rejected_in_a_row = 0
+                elif res.status_code == 400:
+                    results["rejected"] += 1
+                    rejected_in_a_row += 1 if until_sold_out else 0
+                else:
+                    results["errors"] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(customer(token, n) for n, token in enumerate(tokens)))
+        results["seconds"] = time.perf_counter() - started
+    return results
+
+
+def _stock_report(url: str, products: int, stock: float) -> tuple:
+    from app.models import OrderItem, Product
+
+    engine = create_engine(url)
+    with engine.connect() as conn:
+        sold = conn.scalar(select(func.coalesce(func.sum(OrderItem.qty_kg), 0)))
+        remaining, lowest = conn.execute(select(func.sum(Product.stock_kg), func.min(Product.stock_kg))).one()
+    engine.dispose()
+    return sold, products * stock - remaining, lowest
+
+
+async def _scenario(url: str, label: str, args, products: int, stock: float, rush: bool) -> None:
+    from app.main import app
+
+    for name, path in (("set-based", "/api/orders/"), ("legacy", "/bench/legacy-order")):
+        # Rebuilt between runs; the lifespan below reconnects and disposes the engines
+        tokens, product_ids = _seed(url, args.customers, products, stock)
+        async with app.router.lifespan_context(app):
+            result = await _checkouts(app, path, tokens, product_ids, args, until_sold_out=rush)
+        line = (
+            f"  {label:<8} {name:<10} {result['orders'] / result['seconds']:8.1f} orders/s"
+            f"  {result['orders']:>6} ok {result['rejected']:>6} rejected {result['errors']:>4} errors"
+        )
+        if rush:
+            sold, decrease, lowest = _stock_report(url, products, stock)
+            line += f"  sold {sold:g} kg, stock fell {decrease:g} kg, oversold {sold - decrease:g} kg, min {lowest:g}"
+        print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--customers", type=int, default=16)
+    parser.add_argument("--lines", type=int, default=3)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--hot", type=int, default=5, help="products in the rush scenario")
+    parser.add_argument("--stock", type=float, default=100, help="kg of each hot product")
+    parser.add_argument("--database-url", help="defaults to a SQLite file in a temporary directory")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        url = args.database_url or f"sqlite:///{Path(workdir) / 'bench_checkout.db'}"
+        os.environ["DATABASE_URL"] = url
+        os.environ.setdefault("DB_POOL_SIZE", str(args.customers))
+        from app.main import app
+
+        _install_legacy_route(app)
+        print(f"{args.customers} customers, {args.lines} lines per order, {make_url(url).get_backend_name()}")
+
+        async def run():
+            await _scenario(url, "plenty", args, 200, 1_000_000, rush=False)
+            await _scenario(url, "rush", args, args.hot, args.stock, rush=True)
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
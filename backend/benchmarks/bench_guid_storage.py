@@ -0,0 +1,134 @@
+"""Index size and join speed of CHAR(36) text UUIDs versus 16-byte binary UUIDs on SQLite.
+
+Builds two SQLite files with the migrated schema and identical synthetic data,
+one holding ids as 36-character text (what ``GUID`` wrote before migration
+0003) and one as raw bytes, then compares per-index size from ``dbstat`` and
+the order_items -> orders -> products join::
+
+    python benchmarks/bench_guid_storage.py --orders 200000 --repeat 5
+"""
+
+import argparse
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import create_engine  # noqa: E402
+
+from app.migrations import upgrade  # noqa: E402
+
+_FULL_JOIN = (
+    "SELECT count(*), sum(oi.qty_kg * p.price_per_kg) FROM order_items oi "
+    "JOIN orders o ON o.id = oi.order_id JOIN products p ON p.id = oi.product_id"
+)
+_USER_JOIN = _FULL_JOIN + " WHERE o.user_id = ?"
+
+
+def _build(path: Path, encode, orders: int, users: int, products: int) -> list:
+    upgrade(create_engine(f"sqlite:///{path}"))
+    user_ids = [encode(uuid.uuid4()) for _ in range(users)]
+    category_id = encode(uuid.uuid4())
+    product_ids = [encode(uuid.uuid4()) for _ in range(products)]
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.executemany(
+            "INSERT INTO users (id, name, email, password_hash, role) VALUES (?, 'c', ?, 'x', 'user')",
+            [(user_id, f"c{n}@example.com") for n, user_id in enumerate(user_ids)],
+        )
+        conn.execute(
+            "INSERT INTO categories (id, name, slug, is_active) VALUES (?, 'Fresh', 'fresh', 1)", (category_id,)
+        )
+        conn.executemany(
+            "INSERT INTO products (id, name, slug, price_per_kg, category_id) VALUES (?, 'Fish', ?, 9.5, ?)",
+            [(product_id, f"fish-{n}", category_id) for n, product_id in enumerate(product_ids)],
+        )
+        order_rows, item_rows = [], []
+        for n in range(orders):
+            order_id = encode(uuid.uuid4())
+            order_rows.append((order_id, user_ids[n % users]))
+            for k in range(2):
+                item_rows.append((encode(uuid.uuid4()), order_id, product_ids[(n * 31 + k * 17) % products]))
+        conn.executemany(
+            "INSERT INTO orders (id, user_id, total_amount, address_line, postcode) "
+            "VALUES (?, ?, 20, '1 Dock Street', 'EH6 6AA')",
+            order_rows,
+        )
+        conn.executemany(
+            "INSERT INTO order_items (id, order_id, product_id, qty_kg, price_per_kg) VALUES (?, ?, ?, 1, 9.5)",
+            item_rows,
+        )
+    conn.execute("ANALYZE")
+    conn.close()
+    return user_ids
+
+
+def _index_sizes(path: Path) -> dict:
+    conn = sqlite3.connect(path)
+    rows = conn.execute(
+        "SELECT d.name, sum(d.pgsize) FROM dbstat d JOIN sqlite_schema s ON s.name = d.name "
+        "WHERE s.type = 'index' AND s.tbl_name IN ('orders', 'order_items', 'products') GROUP BY d.name"
+    ).fetchall()
+    conn.close()
+    return dict(rows)
+
+
+def _time(path: Path, sql: str, params: tuple, repeat: int) -> float:
+    conn = sqlite3.connect(path)
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        samples.append((time.perf_counter() - started) * 1000)
+    conn.close()
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=200_000)
+    parser.add_argument("--users", type=int, default=5_000)
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    variants = {"text CHAR(36)": str, "binary(16)": lambda value: value.bytes}
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for label, encode in variants.items():
+            path = Path(workdir) / f"{label.split()[0]}.db"
+            user_ids = _build(path, encode, args.orders, args.users, args.products)
+            results[label] = {
+                "file_mb": path.stat().st_size / 1e6,
+                "indexes": _index_sizes(path),
+                "full_join_ms": _time(path, _FULL_JOIN, (), args.repeat),
+                "user_join_ms": statistics.mean(
+                    _time(path, _USER_JOIN, (user_id,), args.repeat) for user_id in user_ids[:50]
+                ),
+            }
+
+    text_result, binary_result = results["text CHAR(36)"], results["binary(16)"]
+    print(f"{args.orders} orders, {args.orders * 2} order items\n")
+    print(f"{'index':<40} {'text KB':>10} {'binary KB':>10}")
+    for name in sorted(text_result["indexes"]):
+        print(
+            f"{name:<40} {text_result['indexes'][name] / 1024:10.0f} "
+            f"{binary_result['indexes'].get(name, 0) / 1024:10.0f}"
+        )
+    print()
+    summary = (
+        ("file_mb", "database file (MB)"),
+        ("full_join_ms", "full join (ms)"),
+        ("user_join_ms", "per-user join (ms)"),
+    )
+    for key, label in summary:
+        print(f"{label:<40} {text_result[key]:10.2f} {binary_result[key]:10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""Retried ``POST /orders/`` with and without an ``Idempotency-Key``: duplicates, stock and latency.
+
+Drives the app in process (httpx over ASGI, lifespan included). Each of
+``--customers`` customers checks out ``--baskets`` times. Every checkout is
+sent ``--copies`` times at once, like a client retrying on a flaky
+connection, then ``--retries`` more times after the first answer::
+
+    python benchmarks/bench_idempotent_retries.py --customers 16 --copies 3 --retries 3 \\
+        --database-url postgresql+psycopg://postgres@localhost/tarel_bench
+
+Reported per mode: orders created against checkouts intended, kilos taken
+from stock against kilos intended, and latency of first answers versus the
+retries after them. Defaults to a SQLite file. The database is dropped and
+rebuilt, so never point this at real data.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import create_engine, func, insert, select, text  # noqa: E402
+from sqlalchemy.engine import make_url  # noqa: E402
+
+_TABLES = (
+    "idempotency_keys, order_items, orders, support_messages, products, categories, users, cut_clean_options, "
+    "site_settings, schema_migrations"
+)
+STOCK_KG = 1_000_000
+
+
+def _seed(url: str, customers: int, products: int) -> tuple:
+    # Imported here: app.config reads DATABASE_URL at import time
+    from app.auth import create_access_token, hash_password
+    from app.migrations import upgrade
+    from app.models import Category, Product, RoleEnum, User
+
+    engine = create_engine(url)
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {_TABLES} CASCADE"))
+            conn.execute(text("DROP TYPE IF EXISTS roleenum, orderstatusenum, supportstatusenum"))
+    elif make_url(url).database and Path(make_url(url).database).exists():
+        Path(make_url(url).database).unlink()
+    upgrade(engine)
+    password_hash = hash_password("bench-password")
+    user_ids = [uuid.uuid4() for _ in range(customers)]
+    category_id = uuid.uuid4()
+    product_ids = [uuid.uuid4() for _ in range(products)]
+    with engine.begin() as conn:
+        conn.execute(
+            insert(User),
+            [
+                {
+                    "id": user_id,
+                    "name": f"Customer {n}",
+                    "email": f"customer-{n}@example.com",
+                    "password_hash": password_hash,
+                    "role": RoleEnum.user,
+                }
+                for n, user_id in enumerate(user_ids)
+            ],
+        )
+        conn.execute(insert(Category), [{"id": category_id, "name": "Fresh", "slug": "fresh", "is_active": True}])
+        conn.execute(
+            insert(Product),
+            [
+                {
+                    "id": product_id,
+                    "name": f"Fish {n}",
+                    "slug": f"fish-{n}",
+                    "price_per_kg": 12.5,
+                    "stock_kg": STOCK_KG,
+                    "is_dry": False,
+                    "is_active": True,
+                    "category_id": category_id,
+                }
+                for n, product_id in enumerate(product_ids)
+            ],
+        )
+    engine.dispose()
+    tokens = [create_access_token({"sub": str(user_id), "role": RoleEnum.user}) for user_id in user_ids]
+    return tokens, [str(product_id) for product_id in product_ids]
+
+
+async def _checkouts(app, tokens: list, product_ids: list, args, keyed: bool) -> dict:
+    firsts, retries = [], []
+    statuses = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+
+        async def post(body: dict, headers: dict, into: list):
+            started = time.perf_counter()
+            res = await client.post("/api/orders/", json=body, headers=headers)
+            into.append(time.perf_counter() - started)
+            statuses[res.status_code] = statuses.get(res.status_code, 0) + 1
+
+        async def customer(n: int, token: str):
+            for basket in range(args.baskets):
+                headers = {"Authorization": f"Bearer {token}"}
+                if keyed:
+                    headers["Idempotency-Key"] = f"basket-{n}-{basket}"
+                body = {
+                    "items": [{"product_id": product_ids[(n + basket) % len(product_ids)], "qty_kg": 1}],
+                    "address_line": "1 Dock Street",
+                    "postcode": "EH6 6AA",
+                    "delivery_slot": "Evening",
+                }
+                await asyncio.gather(*(post(body, headers, firsts) for _ in range(args.copies)))
+                for _ in range(args.retries):
+                    await post(body, headers, retries)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(customer(n, token) for n, token in enumerate(tokens)))
+        seconds = time.perf_counter() - started
+    return {"firsts": firsts, "retries": retries, "statuses": statuses, "seconds": seconds}
+
+
+def _totals(url: str, products: int) -> tuple:
+    from app.models import Order, Product
+
+    engine = create_engine(url)
+    with engine.connect() as conn:
+        orders = conn.scalar(select(func.count()).select_from(Order))
+        taken = products * STOCK_KG - conn.scalar(select(func.sum(Product.stock_kg)))
+    engine.dispose()
+    return orders, taken
+
+
+def _ms(latencies: list) -> str:
+    if not latencies:
+        return "      -"
+    return f"{statistics.median(latencies) * 1000:5.1f}ms"
+
+
+async def _run(url: str, args) -> None:
+    from app.main import app
+
+    intended = args.customers * args.baskets
+    for label, keyed in (("no key", False), ("with key", True)):
+        tokens, product_ids = _seed(url, args.customers, 20)
+        async with app.router.lifespan_context(app):
+            result = await _checkouts(app, tokens, product_ids, args, keyed)
+        orders, taken = _totals(url, 20)
+        print(
+            f"  {label:<9} {orders:>5} orders for {intended} checkouts, {taken:g} kg taken for {intended} kg"
+            f"  p50 first {_ms(result['firsts'])}, retry {_ms(result['retries'])}"
+            f"  {result['seconds']:5.2f}s  {result['statuses']}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--customers", type=int, default=16)
+    parser.add_argument("--baskets", type=int, default=5, help="checkouts per customer")
+    parser.add_argument("--copies", type=int, default=3, help="copies of each checkout sent at once")
+    parser.add_argument("--retries", type=int, default=3, help="copies sent after the first answer")
+    parser.add_argument("--database-url", default="sqlite:///./bench_idempotency.db")
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("DB_POOL_SIZE", str(args.customers))
+    print(
+        f"{args.customers} customers x {args.baskets} checkouts, {args.copies} concurrent copies + "
+        f"{args.retries} retries each, {make_url(args.database_url).get_backend_name()}"
+    )
+    asyncio.run(_run(args.database_url, args))
+
+
+if __name__ == "__main__":
+    main()
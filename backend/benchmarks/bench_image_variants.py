@@ -0,0 +1,122 @@
+"""Cost and payoff of rendering product image variants, and what it does to the event loop.
+
+Generates a phone-sized test photo, then:
+
+* times ``render_variants`` for each output format on its own and reports
+  the bytes a listing would send for the original versus each variant;
+* renders ``--images`` photos while a ticker coroutine measures how late the
+  event loop wakes up, first inline on the loop and then through a process
+  pool the way ``VariantJobs`` does::
+
+    python benchmarks/bench_image_variants.py --size 4032x3024 --images 4
+
+Files are written to a temporary directory that is removed afterwards.
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from PIL import Image, ImageDraw, ImageFilter  # noqa: E402
+
+from app.media.variants import VARIANTS, available_formats, render_variants  # noqa: E402
+
+
+def _photo(path: Path, width: int, height: int) -> None:
+    # Noise plus soft shapes compresses roughly like a real photo; a flat
+    # colour would make every encoder look far better than it is
+    image = Image.effect_noise((width, height), 40).convert("RGB")
+    draw = ImageDraw.Draw(image, "RGBA")
+    for n in range(40):
+        x, y = (n * 7919) % width, (n * 104729) % height
+        draw.ellipse((x, y, x + width // 5, y + height // 6), fill=((n * 50) % 255, (n * 90) % 255, 160, 90))
+    image.filter(ImageFilter.GaussianBlur(2)).save(path, format="JPEG", quality=90)
+
+
+def _sizes(original: Path, manifest: dict, folder: Path) -> None:
+    formats = [key for key in manifest["card"] if key not in ("width", "height")]
+    print(f"  {'variant':<10} {'pixels':>10}" + "".join(f" {fmt:>9}" for fmt in formats))
+    for name in sorted(VARIANTS, key=VARIANTS.get):
+        entry = manifest[name]
+        files = [entry[fmt] for fmt in formats]
+        sizes = "".join(f" {(folder / filename).stat().st_size / 1024:>7.0f}KB" for filename in files)
+        print(f"  {name:<10} {entry['width']:>4}x{entry['height']:<5}{sizes}")
+    print(f"  {'original':<10} {'':>10} {original.stat().st_size / 1024:>7.0f}KB (jpeg)")
+
+
+async def _ticker(stop: asyncio.Event, lags: list, interval: float = 0.005) -> None:
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lags.append(loop.time() - expected)
+
+
+async def _stall(sources: list, folder: Path, formats: list, executor) -> tuple:
+    stop, lags = asyncio.Event(), []
+    ticker = asyncio.create_task(_ticker(stop, lags))
+    await asyncio.sleep(0.05)
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    if executor is None:
+        for n, source in enumerate(sources):
+            render_variants(str(source), str(folder / f"inline-{n}"), formats)
+            await asyncio.sleep(0)
+    else:
+        await asyncio.gather(
+            *(
+                loop.run_in_executor(executor, render_variants, str(source), str(folder / f"pool-{n}"), formats)
+                for n, source in enumerate(sources)
+            )
+        )
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await ticker
+    lags.sort()
+    return elapsed, lags[-1], lags[int(len(lags) * 0.99)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", default="4032x3024", help="test photo WIDTHxHEIGHT")
+    parser.add_argument("--images", type=int, default=4, help="photos rendered in the event-loop test")
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+    width, height = (int(part) for part in args.size.lower().split("x"))
+    formats = available_formats()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = Path(tmp)
+        original = folder / "photo.jpg"
+        _photo(original, width, height)
+        print(f"{width}x{height} jpeg, formats: {', '.join(formats)}")
+
+        for fmt in formats:
+            started = time.perf_counter()
+            manifest = render_variants(str(original), str(folder / fmt), [fmt])
+            print(f"  render all sizes as {fmt:<12} {(time.perf_counter() - started) * 1000:8.0f}ms")
+        started = time.perf_counter()
+        manifest = render_variants(str(original), str(folder / "all"), formats)
+        print(f"  render all sizes, all formats {(time.perf_counter() - started) * 1000:8.0f}ms\n")
+        _sizes(original, manifest, folder / "all")
+
+        sources = [original] * args.images
+        executor = ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn"))
+        # Start the workers outside the measurement, as a long-running app would have
+        executor.submit(available_formats).result()
+        print(f"\n  {args.images} photos        {'wall':>8} {'max loop lag':>13} {'p99 lag':>9}")
+        for label, pool in (("inline on loop", None), (f"process pool x{args.workers}", executor)):
+            elapsed, worst, p99 = asyncio.run(_stall(sources, folder, formats, pool))
+            print(f"  {label:<18} {elapsed:7.2f}s {worst * 1000:11.0f}ms {p99 * 1000:7.1f}ms")
+        executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Login storm vs. catalog reads: p50/p99 latency under mixed load.
+
+Start the API in another terminal, once with hashing inline and once with
+the process pool, and compare::
+
+    PASSWORD_HASH_WORKERS=0 uvicorn app.main:app --port 8000
+    PASSWORD_HASH_WORKERS=4 uvicorn app.main:app --port 8000
+
+    python benchmarks/bench_login_mixed.py --base-url http://127.0.0.1:8000
+
+The script registers its own throwaway users, then runs ``--logins``
+concurrent login loops alongside ``--readers`` concurrent catalog readers
+for ``--duration`` seconds. Requests answered with 503 (hashing pool
+saturated) are counted separately from latency samples.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+import httpx
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _report(label: str, samples: list[float], rejected: int = 0) -> None:
+    print(
+        f"{label:<8} n={len(samples):<6} "
+        f"p50={_percentile(samples, 50) * 1000:7.1f}ms "
+        f"p99={_percentile(samples, 99) * 1000:7.1f}ms "
+        f"mean={(statistics.fmean(samples) if samples else 0) * 1000:7.1f}ms "
+        f"rejected={rejected}"
+    )
+
+
+async def _register_users(client: httpx.AsyncClient, count: int) -> list[tuple[str, str]]:
+    users = []
+    run_id = uuid.uuid4().hex[:8]
+    for index in range(count):
+        email = f"bench-{run_id}-{index}@example.com"
+        password = "bench-password"
+        res = await client.post(
+            "/api/auth/register",
+            json={
+                "name": f"Bench {index}",
+                "email": email,
+                "password": password,
+                "phone": "07000000000",
+                "address_line1": "1 Bench Street",
+                "city": "Edinburgh",
+                "postcode": "EH1 1AA",
+            },
+        )
+        res.raise_for_status()
+        users.append((email, password))
+    return users
+
+
+async def _login_loop(client, credentials, deadline, samples, counters):
+    email, password = credentials
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        res = await client.post("/api/auth/login", data={"username": email, "password": password})
+        if res.status_code == 503:
+            counters["rejected"] += 1
+            await asyncio.sleep(0.05)
+            continue
+        res.raise_for_status()
+        samples.append(time.perf_counter() - started)
+
+
+async def _catalog_loop(client, deadline, samples):
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        res = await client.get("/api/products/")
+        res.raise_for_status()
+        samples.append(time.perf_counter() - started)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--readers", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=15.0)
+    args = parser.parse_args()
+
+    limits = httpx.Limits(max_connections=args.logins + args.readers + 4)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+        users = await _register_users(client, args.logins)
+
+        login_samples: list[float] = []
+        catalog_samples: list[float] = []
+        counters = {"rejected": 0}
+        deadline = time.perf_counter() + args.duration
+        await asyncio.gather(
+            *(_login_loop(client, user, deadline, login_samples, counters) for user in users),
+            *(_catalog_loop(client, deadline, catalog_samples) for _ in range(args.readers)),
+        )
+
+    _report("login", login_samples, counters["rejected"])
+    _report("catalog", catalog_samples)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,106 @@
+"""Requests per second for ``/media`` through ``MediaFiles`` versus Starlette's ``StaticFiles``.
+
+Writes a set of content-addressed thumbnails and card images plus one large
+original to a temporary directory. Then it drives both ASGI apps in process
+(httpx over ASGI, no sockets) with the traffic a promotion produces: repeated
+GETs of a small hot set, browser revalidations (``If-None-Match``), and
+range requests into the original::
+
+    python benchmarks/bench_media_serving.py --requests 2000 --hot 50
+
+Only the serving layer is measured. A real deployment adds the network and
+the server in front.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from starlette.staticfiles import StaticFiles  # noqa: E402
+
+from app.media.files import MediaCache, MediaFiles  # noqa: E402
+
+
+def _write(root: Path, hot: int) -> tuple:
+    products = root / "products"
+    names = []
+    rng = random.Random(1)
+    for n in range(hot):
+        stem = hashlib.sha256(f"photo-{n}".encode()).hexdigest()
+        folder = products / "variants" / stem
+        folder.mkdir(parents=True)
+        for variant, size in (("thumbnail", 2_500), ("card", 20_000)):
+            (folder / f"{variant}.webp").write_bytes(rng.randbytes(size))
+            names.append(f"products/variants/{stem}/{variant}.webp")
+    original = rng.randbytes(3 * 2 ** 20)
+    original_name = f"products/{hashlib.sha256(original).hexdigest()}.jpg"
+    (root / original_name).write_bytes(original)
+    return names, original_name
+
+
+async def _drive(app, paths: list, headers_for) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        for path in paths:
+            res = await client.get(f"/{path}", headers=headers_for(path))
+            if res.status_code >= 400:
+                raise RuntimeError(f"{path}: {res.status_code}")
+        return len(paths) / (time.perf_counter() - started)
+
+
+async def _etags(app, names: list) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        return {name: (await client.head(f"/{name}")).headers["etag"] for name in names}
+
+
+async def _run(root: Path, names: list, original: str, requests: int) -> None:
+    rng = random.Random(7)
+    traffic = [rng.choice(names) for _ in range(requests)]
+    ranges = [original] * max(requests // 10, 1)
+    apps = {
+        "StaticFiles": StaticFiles(directory=root),
+        "MediaFiles": MediaFiles(root, MediaCache(32 * 2 ** 20, 256 * 1024)),
+    }
+    print(f"  {'':<28}" + "".join(f"{name:>14}" for name in apps))
+    rows = {"hot set GET": [], "revalidate (304)": [], "range 64 KiB of 3 MiB": []}
+    for app in apps.values():
+        etags = await _etags(app, names)
+        rows["hot set GET"].append(await _drive(app, traffic, lambda path: {}))
+        rows["revalidate (304)"].append(await _drive(app, traffic, lambda path: {"If-None-Match": etags[path]}))
+        offsets = iter(rng.randrange(3 * 2 ** 20 - 65536) for _ in ranges)
+
+        def range_header(path):
+            start = next(offsets)
+            return {"Range": f"bytes={start}-{start + 65535}"}
+
+        rows["range 64 KiB of 3 MiB"].append(await _drive(app, ranges, range_header))
+    for label, values in rows.items():
+        print(f"  {label:<28}" + "".join(f"{value:>10,.0f} r/s" for value in values))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--hot", type=int, default=50, help="products in the promotion (2 images each)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        names, original = _write(root, args.hot)
+        print(f"{len(names)} hot images, {args.requests} requests")
+        asyncio.run(_run(root, names, original, args.requests))
+
+
+if __name__ == "__main__":
+    main()
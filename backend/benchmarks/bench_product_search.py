@@ -0,0 +1,207 @@
+"""Latency of ``GET /products/search`` at 10k and 100k products, indexed versus unindexed.
+
+For each catalog size this builds a synthetic catalog and reports:
+
+* the in-memory ``SearchIndex`` (the SQLite fallback): build time and per-query
+  latency;
+* with ``--database-url``: the PostgreSQL full-text query from
+  ``search.search_database`` with and without migration 0004's GIN index, next
+  to a plain ``ILIKE '%term%'`` scan over name and description.
+
+::
+
+    createdb tarel_bench
+    python benchmarks/bench_product_search.py --sizes 10000 100000 \\
+        --database-url postgresql+psycopg://postgres@localhost/tarel_bench
+
+The database is dropped and rebuilt for every size, so never point this at
+real data.
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import create_engine, insert, or_, select, text  # noqa: E402
+from sqlalchemy.engine import make_url  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine  # noqa: E402
+
+from app.database import async_database_url  # noqa: E402
+from app.migrations import upgrade  # noqa: E402
+from app.migrations.ops import drop_index  # noqa: E402
+from app.migrations.versions import v0004_product_search  # noqa: E402
+from app.models import Category, Product  # noqa: E402
+from app.schemas import CategoryOut, ProductOut  # noqa: E402
+from app.search import SearchIndex, search_database  # noqa: E402
+
+FISH = (
+    "salmon trout haddock halibut cod hake pollock mackerel sardine anchovy tuna swordfish seabass seabream "
+    "plaice sole turbot monkfish herring kingfish pomfret snapper grouper mullet catfish tilapia prawn "
+    "langoustine lobster crab mussel clam oyster scallop squid octopus cuttlefish kipper whiting"
+).split()
+STYLES = "fresh smoked dried salted frozen wild organic whole filleted steaked butterflied peeled".split()
+ORIGINS = "atlantic pacific norwegian scottish cornish icelandic indian thai".split()
+WORDS = (
+    "line caught landed daily skin on boneless gutted scaled cleaned sustainably sourced delivered ice "
+    "rich flaky firm sweet delicate oily white flesh perfect grilling baking curry frying steaming "
+    "family pack chef cut vacuum sealed hand picked"
+).split()
+CATEGORIES = ("Fresh Fish", "Shellfish", "Dried Seafood", "Smoked", "Frozen", "Ready to Cook")
+_TABLES = (
+    "stock_reservations, idempotency_keys, order_items, orders, support_messages, products, categories, users, "
+    "cut_clean_options, site_settings, schema_migrations"
+)
+QUERIES = ("salmon", "halib", "salmn", "smoked hadd", "sa", "norwegian king", "zzzz")
+
+
+def _catalog(size: int, seed: int = 7) -> tuple[list, list]:
+    rng = random.Random(seed)
+    categories = [
+        {"id": uuid.uuid4(), "name": name, "slug": name.lower().replace(" ", "-")} for name in CATEGORIES
+    ]
+    products = []
+    for n in range(size):
+        name = f"{rng.choice(STYLES).title()} {rng.choice(ORIGINS).title()} {rng.choice(FISH).title()}"
+        description = " ".join(rng.choices(WORDS, k=12)) + f" lot{n}"
+        products.append(
+            {
+                "id": uuid.uuid4(),
+                "name": name,
+                "slug": f"{name.lower().replace(' ', '-')}-{n}",
+                "description": description,
+                "price_per_kg": 5 + n % 40,
+                "stock_kg": 100,
+                "is_dry": False,
+                "is_active": True,
+                "category_id": categories[n % len(categories)]["id"],
+            }
+        )
+    return categories, products
+
+
+def _search_index(categories: list, products: list) -> tuple[SearchIndex, float]:
+    by_id = {row["id"]: CategoryOut(description=None, is_active=True, **row) for row in categories}
+    items = [
+        ProductOut(
+            image_url=None,
+            category=by_id[row["category_id"]],
+            **{key: value for key, value in row.items() if key != "category_id"},
+        )
+        for row in products
+    ]
+    started = time.perf_counter()
+    index = SearchIndex(items)
+    return index, time.perf_counter() - started
+
+
+def _report(label: str, timings: dict) -> None:
+    print(f"  {label}")
+    for query, (median, total) in timings.items():
+        print(f"    {query!r:<24} {median * 1000:9.2f}ms  {total:>7} matches")
+
+
+def _in_memory(index: SearchIndex, repeat: int) -> dict:
+    timings = {}
+    for query in QUERIES:
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            total, _ = index.search(query, limit=20)
+            samples.append(time.perf_counter() - started)
+        timings[query] = (statistics.median(samples), total)
+    return timings
+
+
+def _ilike(query: str):
+    pattern = f"%{query}%"
+    return (
+        select(Product)
+        .where(Product.is_active.is_(True), or_(Product.name.ilike(pattern), Product.description.ilike(pattern)))
+        .order_by(Product.name)
+        .limit(20)
+    )
+
+
+async def _database(url, index: SearchIndex, repeat: int, fulltext: bool) -> dict:
+    engine = create_async_engine(url)
+    timings = {}
+    async with AsyncSession(engine) as db:
+        for query in QUERIES:
+            statement = _ilike(query)
+            samples = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                if fulltext:
+                    total, _ = await search_database(db, index, query, limit=20)
+                else:
+                    total = len((await db.scalars(statement)).all())
+                samples.append(time.perf_counter() - started)
+            timings[query] = (statistics.median(samples), total)
+            db.expunge_all()
+    await engine.dispose()
+    return timings
+
+
+def _load(engine, categories: list, products: list) -> None:
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {_TABLES} CASCADE"))
+        conn.execute(text("DROP TYPE IF EXISTS roleenum, orderstatusenum, supportstatusenum"))
+    upgrade(engine)
+    # Start without the search vector; main() times migration 0004 adding it back
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE products DROP COLUMN search_vector"))
+    with engine.begin() as conn:
+        conn.execute(insert(Category), [dict(row, is_active=True) for row in categories])
+        conn.execute(insert(Product), products)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM ANALYZE products"))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    if args.database_url and make_url(args.database_url).get_backend_name() != "postgresql":
+        parser.error("--database-url must point at PostgreSQL")
+
+    for size in args.sizes:
+        categories, products = _catalog(size)
+        index, build_seconds = _search_index(categories, products)
+        print(f"\n{size} products")
+        _report(f"in-memory SearchIndex (built in {build_seconds:.2f}s)", _in_memory(index, args.repeat))
+        if not args.database_url:
+            continue
+
+        engine = create_engine(args.database_url)
+        _load(engine, categories, products)
+        url = async_database_url(args.database_url)
+        ilike = asyncio.run(_database(url, index, args.repeat, fulltext=False))
+        _report("PostgreSQL ILIKE scan (first page only, unranked, no typos)", ilike)
+
+        started = time.perf_counter()
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            v0004_product_search.upgrade(conn)
+            conn.execute(text("ANALYZE products"))
+        build_seconds = time.perf_counter() - started
+        indexed = asyncio.run(_database(url, index, args.repeat, fulltext=True))
+        _report(f"PostgreSQL full-text, GIN index (migration 0004 took {build_seconds:.2f}s)", indexed)
+
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            drop_index(conn, "ix_products_search_vector")
+        unindexed = asyncio.run(_database(url, index, args.repeat, fulltext=True))
+        _report("PostgreSQL full-text, GIN index dropped", unindexed)
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
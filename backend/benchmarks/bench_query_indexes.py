@@ -0,0 +1,189 @@
+"""Plans and latency of the order/catalog hot queries before and after migration 0002.
+
+Builds a synthetic dataset in an empty PostgreSQL database with the baseline
+schema only (migration 0001), runs each endpoint's queries under
+``EXPLAIN (ANALYZE, BUFFERS)``, then applies migration 0002 and repeats::
+
+    createdb tarel_bench
+    python benchmarks/bench_query_indexes.py \\
+        --database-url postgresql+psycopg://postgres@localhost/tarel_bench --orders 1000000
+
+The queries are the statements the routers issue (``my_orders`` and its
+``selectinload`` of items, the ``list_customers`` stats aggregate, customer
+detail, the ``delete_category`` probe and the support inbox). The database is
+dropped and rebuilt on every run, so never point this at real data.
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import create_engine, func, select, text  # noqa: E402
+from sqlalchemy.engine import make_url  # noqa: E402
+
+from app.migrations import upgrade  # noqa: E402
+from app.models import Order, OrderItem, Product, SupportMessage  # noqa: E402
+
+_TABLES = "order_items, orders, support_messages, products, categories, users, schema_migrations"
+
+
+def _populate(conn, users: int, orders: int, products: int) -> None:
+    conn.execute(
+        text("CREATE TEMP TABLE user_ids AS SELECT n, gen_random_uuid() AS id FROM generate_series(1, :n) n"),
+        {"n": users},
+    )
+    conn.execute(
+        text(
+            "INSERT INTO users (id, name, email, password_hash, role, created_at) "
+            "SELECT id, 'Customer ' || n, 'c' || n || '@example.com', 'x', 'user', now() - n * interval '1 minute' "
+            "FROM user_ids"
+        )
+    )
+    conn.execute(
+        text(
+            "INSERT INTO categories (id, name, slug, is_active) "
+            "SELECT gen_random_uuid(), 'Category ' || n, 'category-' || n, true FROM generate_series(1, 20) n"
+        )
+    )
+    conn.execute(
+        text(
+            "INSERT INTO products (id, name, slug, price_per_kg, stock_kg, is_dry, is_active, category_id) "
+            "SELECT gen_random_uuid(), 'Fish ' || n, 'fish-' || n, 5 + n % 20, 100, false, n % 10 <> 0, "
+            "(SELECT id FROM categories ORDER BY slug OFFSET n % 20 LIMIT 1) "
+            "FROM generate_series(1, :n) n"
+        ),
+        {"n": products},
+    )
+    conn.execute(
+        text(
+            "INSERT INTO orders (id, user_id, total_amount, status, address_line, postcode, created_at) "
+            "SELECT gen_random_uuid(), u.id, 10 + g % 90, 'delivered', '1 Dock Street', 'EH6 6AA', "
+            "now() - (g % 525600) * interval '1 minute' "
+            "FROM generate_series(1, :n) g JOIN user_ids u ON u.n = 1 + (g::bigint * 7919) % :users"
+        ),
+        {"n": orders, "users": users},
+    )
+    conn.execute(text("CREATE TEMP TABLE product_ids AS SELECT row_number() OVER () AS n, id FROM products"))
+    conn.execute(
+        text(
+            "INSERT INTO order_items (id, order_id, product_id, qty_kg, price_per_kg) "
+            "SELECT gen_random_uuid(), o.id, p.id, 1, 10 "
+            "FROM (SELECT id, row_number() OVER () AS n FROM orders) o "
+            "CROSS JOIN generate_series(0, 1) k "
+            "JOIN product_ids p ON p.n = 1 + (o.n::bigint * 31 + k * 17) % :products"
+        ),
+        {"products": products},
+    )
+    conn.execute(
+        text(
+            "INSERT INTO support_messages (id, user_id, subject, message, status, created_at, updated_at) "
+            "SELECT gen_random_uuid(), u.id, 'Delivery', 'Where is my order?', 'open', now(), now() "
+            "FROM user_ids u, generate_series(1, 3)"
+        )
+    )
+
+
+def _queries(conn) -> dict:
+    user_id = conn.execute(text("SELECT user_id FROM orders LIMIT 1")).scalar()
+    category_id = conn.execute(text("SELECT id FROM categories LIMIT 1")).scalar()
+    order_ids = list(
+        conn.execute(select(Order.id).where(Order.user_id == user_id).order_by(Order.created_at.desc())).scalars()
+    )
+    return {
+        "my_orders": select(Order).where(Order.user_id == user_id).order_by(Order.created_at.desc()),
+        "my_orders items (selectinload)": select(OrderItem).where(OrderItem.order_id.in_(order_ids)),
+        "list_customers stats": select(
+            Order.user_id,
+            func.count(Order.id),
+            func.coalesce(func.sum(Order.total_amount), 0.0),
+            func.max(Order.created_at),
+        ).group_by(Order.user_id),
+        "customer detail stats": select(
+            func.count(Order.id), func.coalesce(func.sum(Order.total_amount), 0.0), func.max(Order.created_at)
+        ).where(Order.user_id == user_id),
+        "catalog by category": select(Product).where(Product.is_active.is_(True), Product.category_id == category_id),
+        "delete_category probe": select(Product.id).where(Product.category_id == category_id).limit(1),
+        "support inbox": select(SupportMessage)
+        .where(SupportMessage.user_id == user_id)
+        .order_by(SupportMessage.created_at.desc()),
+    }
+
+
+def _measure(conn, statement, repeat: int) -> tuple[float, str]:
+    compiled = statement.compile(dialect=conn.dialect, compile_kwargs={"render_postcompile": True})
+    sql, params = str(compiled), compiled.params
+    plan = conn.exec_driver_sql("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql, params).scalar()[0]
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.exec_driver_sql(sql, params).fetchall()
+        samples.append((time.perf_counter() - started) * 1000)
+    node = plan["Plan"]
+    # Report the scan under any Limit/Sort/Aggregate wrappers
+    while node.get("Plans") and node["Node Type"] in {"Limit", "Sort", "Aggregate", "Gather", "Gather Merge"}:
+        node = node["Plans"][0]
+    index = node.get("Index Name") or next(
+        (child.get("Index Name") for child in node.get("Plans", []) if "Index Name" in child), None
+    )
+    scan = node["Node Type"] + (f" using {index}" if index else "")
+    return statistics.median(samples), scan
+
+
+def _report(label: str, conn, repeat: int) -> dict:
+    results = {}
+    print(f"\n{label}")
+    for name, statement in _queries(conn).items():
+        latency, scan = _measure(conn, statement, repeat)
+        results[name] = latency
+        print(f"  {name:<32} {latency:9.2f}ms  {scan}")
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--products", type=int, default=2_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if make_url(args.database_url).get_backend_name() != "postgresql":
+        parser.error("the benchmark needs PostgreSQL")
+    engine = create_engine(args.database_url)
+
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {_TABLES} CASCADE"))
+        conn.execute(text("DROP TYPE IF EXISTS roleenum, orderstatusenum, supportstatusenum"))
+    upgrade(engine, target=1)
+
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        _populate(conn, args.users, args.orders, args.products)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM ANALYZE"))
+    print(f"Loaded {args.orders} orders for {args.users} users in {time.perf_counter() - started:.1f}s")
+
+    with engine.connect() as conn:
+        before = _report("Baseline schema (0001)", conn, args.repeat)
+
+    started = time.perf_counter()
+    upgrade(engine, target=2)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM ANALYZE"))
+    print(f"\nMigration 0002 (concurrent builds) took {time.perf_counter() - started:.1f}s")
+
+    with engine.connect() as conn:
+        after = _report("With query indexes (0002)", conn, args.repeat)
+
+    print("\nSpeed-up")
+    for name, latency in before.items():
+        print(f"  {name:<32} {latency / max(after[name], 1e-6):8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Per-call Python overhead of inline ORM statements versus prebuilt ones like those in ``app.queries``.
+
+Two measurements:
+
+* construction: building the statement and its SQLAlchemy cache key, with no
+  database involved;
+* end to end: ``await db.scalar(...)`` / ``db.scalars(...)`` through an
+  ``AsyncSession`` against ``DATABASE_URL``, with psycopg server-side
+  prepared statements off and on.
+
+::
+
+    python benchmarks/bench_query_overhead.py --iterations 2000
+
+Needs a migrated database with at least one active product and order (the
+seed data is enough).
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import bindparam, select  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine  # noqa: E402
+from sqlalchemy.orm import selectinload  # noqa: E402
+
+from app import queries  # noqa: E402
+from app.database import async_database_url  # noqa: E402
+from app.models import Order, OrderItem, Product  # noqa: E402
+
+
+# The product page is served from the catalog snapshot, so this one is only prebuilt here
+prebuilt_product_by_slug = (
+    select(Product)
+    .options(selectinload(Product.category))
+    .where(Product.slug == bindparam("slug"), Product.is_active.is_(True))
+)
+
+
+def _inline_product_by_slug(slug):
+    return (
+        select(Product)
+        .options(selectinload(Product.category))
+        .where(Product.slug == slug, Product.is_active.is_(True))
+    )
+
+
+def _inline_orders_by_user(user_id):
+    return (
+        select(Order)
+        .options(selectinload(Order.items).selectinload(OrderItem.product))
+        .where(Order.user_id == user_id)
+        .order_by(Order.created_at.desc())
+    )
+
+
+def _construction(iterations: int) -> None:
+    for label, build in (
+        ("inline", lambda: _inline_product_by_slug("hake")._generate_cache_key()),
+        ("prebuilt", lambda: prebuilt_product_by_slug._generate_cache_key()),
+    ):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            build()
+        per_call = (time.perf_counter() - started) / iterations * 1e6
+        print(f"construction  {label:<9} {per_call:8.1f}us/call")
+
+
+async def _end_to_end(url, prepare_threshold, iterations: int) -> None:
+    connect_args = {"prepare_threshold": prepare_threshold} if url.get_driver_name() == "psycopg" else {}
+    engine = create_async_engine(url, connect_args=connect_args, pool_size=1)
+    async with AsyncSession(engine, expire_on_commit=False) as db:
+        slug = await db.scalar(select(Product.slug).where(Product.is_active.is_(True)).limit(1))
+        user_id = await db.scalar(select(Order.user_id).limit(1))
+        if slug is None or user_id is None:
+            raise SystemExit("the database needs at least one active product and one order")
+
+        cases = {
+            "product_by_slug": (
+                lambda: db.scalar(_inline_product_by_slug(slug)),
+                lambda: db.scalar(prebuilt_product_by_slug, {"slug": slug}),
+            ),
+            "orders_by_user": (
+                lambda: db.scalars(_inline_orders_by_user(user_id)),
+                lambda: db.scalars(queries.orders_by_user, {"user_id": user_id}),
+            ),
+        }
+        for name, variants in cases.items():
+            for label, call in zip(("inline", "prebuilt"), variants):
+                for _ in range(50):
+                    await call()
+                samples = []
+                for _ in range(iterations):
+                    started = time.perf_counter()
+                    await call()
+                    samples.append(time.perf_counter() - started)
+                db.expunge_all()
+                print(
+                    f"{name:<16} {label:<9} prepare={str(prepare_threshold):<5} "
+                    f"median={statistics.median(samples) * 1e6:8.1f}us "
+                    f"mean={statistics.fmean(samples) * 1e6:8.1f}us"
+                )
+    await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    args = parser.parse_args()
+
+    _construction(args.iterations * 5)
+    if not args.database_url:
+        return
+    url = async_database_url(args.database_url)
+    for prepare_threshold in (None, 1):
+        asyncio.run(_end_to_end(url, prepare_threshold, args.iterations))
+
+
+if __name__ == "__main__":
+    main()
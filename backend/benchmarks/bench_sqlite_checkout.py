@@ -0,0 +1,178 @@
+"""Concurrent checkouts against catalog reads on the single-node SQLite profile.
+
+Starts ``app.main:app`` under uvicorn on a fresh SQLite file once per
+profile, runs ``--writers`` concurrent ``POST /api/orders/`` loops alongside
+``--readers`` concurrent ``GET /api/products/`` loops, and reports throughput,
+latency and failed requests::
+
+    python benchmarks/bench_sqlite_checkout.py --writers 8 --readers 16 --duration 15
+
+``wal`` is the default profile from ``database.py``; ``rollback`` is SQLite's
+stock rollback journal with ``synchronous=full`` for comparison.
+"""
+
+import argparse
+import asyncio
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+PROFILES = {
+    "wal": {"SQLITE_JOURNAL_MODE": "wal", "SQLITE_SYNCHRONOUS": "normal"},
+    "rollback": {"SQLITE_JOURNAL_MODE": "delete", "SQLITE_SYNCHRONOUS": "full", "SQLITE_MMAP_SIZE": "0"},
+}
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def _seed_catalog(path: Path, products: int) -> list[str]:
+    conn = sqlite3.connect(path)
+    category_id = uuid.uuid4()
+    product_ids = [uuid.uuid4() for _ in range(products)]
+    with conn:
+        conn.execute(
+            "INSERT INTO categories (id, name, slug, is_active) VALUES (?, 'Fresh', 'fresh', 1)",
+            (category_id.bytes,),
+        )
+        conn.executemany(
+            "INSERT INTO products (id, name, slug, price_per_kg, stock_kg, is_dry, is_active, category_id) "
+            "VALUES (?, ?, ?, 12.5, 1000000, 0, 1, ?)",
+            [(pid.bytes, f"Fish {n}", f"fish-{n}", category_id.bytes) for n, pid in enumerate(product_ids)],
+        )
+    conn.close()
+    return [str(pid) for pid in product_ids]
+
+
+async def _tokens(client: httpx.AsyncClient, count: int) -> list[str]:
+    tokens = []
+    for index in range(count):
+        email = f"checkout-{index}@example.com"
+        payload = {
+            "name": f"Checkout {index}",
+            "email": email,
+            "password": "bench-password",
+            "phone": "07000000000",
+            "address_line1": "1 Dock Street",
+            "city": "Edinburgh",
+            "postcode": "EH6 6AA",
+        }
+        (await client.post("/api/auth/register", json=payload)).raise_for_status()
+        res = await client.post("/api/auth/login", data={"username": email, "password": "bench-password"})
+        res.raise_for_status()
+        tokens.append(res.json()["access_token"])
+    return tokens
+
+
+async def _drive(base_url: str, product_ids: list[str], args) -> dict:
+    results = {"checkout": [], "catalog": [], "checkout_failed": 0, "catalog_failed": 0}
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        tokens = await _tokens(client, args.writers)
+        deadline = time.perf_counter() + args.duration
+
+        async def checkout(token: str, offset: int):
+            headers = {"Authorization": f"Bearer {token}"}
+            n = offset
+            while time.perf_counter() < deadline:
+                n += 1
+                body = {
+                    "items": [
+                        {"product_id": product_ids[(n * 7 + k) % len(product_ids)], "qty_kg": 1} for k in range(3)
+                    ],
+                    "address_line": "1 Dock Street",
+                    "postcode": "EH6 6AA",
+                    "delivery_slot": "Evening",
+                }
+                started = time.perf_counter()
+                res = await client.post("/api/orders/", json=body, headers=headers)
+                if res.status_code == 200:
+                    results["checkout"].append(time.perf_counter() - started)
+                else:
+                    results["checkout_failed"] += 1
+
+        async def catalog():
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                res = await client.get("/api/products/")
+                if res.status_code == 200:
+                    results["catalog"].append(time.perf_counter() - started)
+                else:
+                    results["catalog_failed"] += 1
+
+        await asyncio.gather(
+            *(checkout(token, index * 1000) for index, token in enumerate(tokens)),
+            *(catalog() for _ in range(args.readers)),
+        )
+    return results
+
+
+def _run(profile: str, port: int, args) -> None:
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = Path(workdir) / "store.db"
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}", **PROFILES[profile])
+        subprocess.run(
+            [sys.executable, "-m", "app.migrations", "upgrade"],
+            cwd=BACKEND_DIR,
+            env=env,
+            check=True,
+            capture_output=True,
+        )
+        product_ids = _seed_catalog(db_path, args.products)
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+            cwd=BACKEND_DIR,
+            env=env,
+        )
+        try:
+            base_url = f"http://127.0.0.1:{port}"
+            for _ in range(100):
+                try:
+                    httpx.get(f"{base_url}/", timeout=1)
+                    break
+                except httpx.HTTPError:
+                    time.sleep(0.1)
+            results = asyncio.run(_drive(base_url, product_ids, args))
+        finally:
+            server.terminate()
+            server.wait()
+
+    for kind in ("checkout", "catalog"):
+        samples = results[kind]
+        print(
+            f"{profile:<9} {kind:<9} {len(samples) / args.duration:7.1f} req/s "
+            f"p50={_percentile(samples, 50) * 1000:7.1f}ms p99={_percentile(samples, 99) * 1000:7.1f}ms "
+            f"mean={(statistics.fmean(samples) if samples else 0) * 1000:7.1f}ms "
+            f"failed={results[f'{kind}_failed']}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=16)
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--port", type=int, default=8095)
+    parser.add_argument("--profile", choices=sorted(PROFILES), action="append")
+    args = parser.parse_args()
+
+    for offset, profile in enumerate(args.profile or ["rollback", "wal"]):
+        _run(profile, args.port + offset, args)
+
+
+if __name__ == "__main__":
+    main()
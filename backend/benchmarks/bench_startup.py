@@ -0,0 +1,59 @@
+"""Cold-start cost: ``import app.main`` and lifespan startup, in fresh processes.
+
+Each sample runs in a new interpreter so module caches do not hide the
+import cost an autoscaled worker pays::
+
+    python benchmarks/bench_startup.py --runs 10
+
+Requires a reachable ``DATABASE_URL``; the startup phase includes whatever
+connection checks and warm-up the lifespan performs.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+_PROBE = """
+import json, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(app.main.app):
+    ready = time.perf_counter()
+print(json.dumps({"import": imported - started, "startup": ready - imported}))
+"""
+
+
+def _sample() -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE],
+        cwd=BACKEND_DIR,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    samples = [_sample() for _ in range(args.runs)]
+    for phase in ("import", "startup"):
+        values = [sample[phase] * 1000 for sample in samples]
+        print(
+            f"{phase:<8} median={statistics.median(values):7.1f}ms "
+            f"min={min(values):7.1f}ms max={max(values):7.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""A sell-out with and without cart holds: checkouts lost at the last step, and the cost of availability.
+
+Drives the app in process (httpx over ASGI, lifespan included). ``--customers``
+customers each want 1-3 kg of one of ``--hot`` products with ``--stock`` kg
+each, more than there is. Each customer fills a cart, thinks for up to
+``--think`` seconds, and checks out::
+
+    python benchmarks/bench_stock_reservations.py --customers 64 --hot 3 --stock 30 \\
+        --database-url postgresql+psycopg://postgres@localhost/tarel_bench
+
+* ``no holds``: the cart lives in the browser, so stock is only checked at
+  checkout, where late customers are turned away;
+* ``holds``: adding to the cart sends ``PUT /reservations/``. A customer who
+  cannot get the fish learns it at that moment, and a held cart always
+  checks out.
+
+Afterwards it checks that ``reserved_kg`` matches the holds left and that no
+stock went negative. It then times one product's availability read as the
+``stock_kg - reserved_kg`` column difference against summing ``--holds``
+hold rows. Defaults to a SQLite file. The database is dropped and rebuilt,
+so never point this at real data.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import create_engine, func, insert, select, text  # noqa: E402
+from sqlalchemy.engine import make_url  # noqa: E402
+
+_TABLES = (
+    "stock_reservations, idempotency_keys, order_items, orders, support_messages, products, categories, users, "
+    "cut_clean_options, site_settings, schema_migrations"
+)
+
+
+def _seed(url: str, customers: int, hot: int, stock: float) -> tuple:
+    # Imported here: app.config reads DATABASE_URL at import time
+    from app.auth import create_access_token, hash_password
+    from app.migrations import upgrade
+    from app.models import Category, Product, RoleEnum, User
+
+    engine = create_engine(url)
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {_TABLES} CASCADE"))
+            conn.execute(text("DROP TYPE IF EXISTS roleenum, orderstatusenum, supportstatusenum"))
+    elif make_url(url).database and Path(make_url(url).database).exists():
+        Path(make_url(url).database).unlink()
+    upgrade(engine)
+    password_hash = hash_password("bench-password")
+    user_ids = [uuid.uuid4() for _ in range(customers)]
+    category_id = uuid.uuid4()
+    product_ids = [uuid.uuid4() for _ in range(hot)]
+    with engine.begin() as conn:
+        conn.execute(
+            insert(User),
+            [
+                {
+                    "id": user_id,
+                    "name": f"Customer {n}",
+                    "email": f"customer-{n}@example.com",
+                    "password_hash": password_hash,
+                    "role": RoleEnum.user,
+                }
+                for n, user_id in enumerate(user_ids)
+            ],
+        )
+        conn.execute(insert(Category), [{"id": category_id, "name": "Fresh", "slug": "fresh", "is_active": True}])
+        conn.execute(
+            insert(Product),
+            [
+                {
+                    "id": product_id,
+                    "name": f"Fish {n}",
+                    "slug": f"fish-{n}",
+                    "price_per_kg": 12.5,
+                    "stock_kg": stock,
+                    "is_dry": False,
+                    "is_active": True,
+                    "category_id": category_id,
+                }
+                for n, product_id in enumerate(product_ids)
+            ],
+        )
+    engine.dispose()
+    tokens = [create_access_token({"sub": str(user_id), "role": RoleEnum.user}) for user_id in user_ids]
+    return tokens, [str(product_id) for product_id in product_ids]
+
+
+async def _shoppers(app, tokens: list, product_ids: list, args, holds: bool) -> dict:
+    results = {"turned away at cart": 0, "checked out": 0, "lost at checkout": 0, "errors": 0}
+    cart_latencies, checkout_latencies = [], []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+
+        async def shopper(n: int, token: str):
+            rng = random.Random(n)
+            headers = {"Authorization": f"Bearer {token}"}
+            items = [{"product_id": rng.choice(product_ids), "qty_kg": float(rng.randint(1, 3))}]
+            await asyncio.sleep(rng.uniform(0, args.think))
+            if holds:
+                started = time.perf_counter()
+                res = await client.put("/api/reservations/", json={"items": items}, headers=headers)
+                cart_latencies.append(time.perf_counter() - started)
+                if res.status_code == 400:
+                    results["turned away at cart"] += 1
+                    return
+                if res.status_code != 200:
+                    results["errors"] += 1
+                    return
+            await asyncio.sleep(rng.uniform(0, args.think))
+            body = {"items": items, "address_line": "1 Dock Street", "postcode": "EH6 6AA", "delivery_slot": "Evening"}
+            started = time.perf_counter()
+            res = await client.post("/api/orders/", json=body, headers=headers)
+            checkout_latencies.append(time.perf_counter() - started)
+            if res.status_code == 200:
+                results["checked out"] += 1
+            elif res.status_code == 400:
+                results["lost at checkout"] += 1
+            else:
+                results["errors"] += 1
+
+        await asyncio.gather(*(shopper(n, token) for n, token in enumerate(tokens)))
+    results["cart p50"] = statistics.median(cart_latencies) if cart_latencies else None
+    results["checkout p50"] = statistics.median(checkout_latencies) if checkout_latencies else None
+    return results
+
+
+def _invariants(url: str) -> str:
+    from app.models import Product, StockReservation
+
+    engine = create_engine(url)
+    with engine.connect() as conn:
+        reserved = conn.scalar(select(func.coalesce(func.sum(Product.reserved_kg), 0)))
+        held = conn.scalar(select(func.coalesce(func.sum(StockReservation.qty_kg), 0)))
+        lowest = conn.scalar(select(func.min(Product.stock_kg)))
+    engine.dispose()
+    return f"reserved_kg {reserved:g} = holds {held:g}, min stock {lowest:g}"
+
+
+def _availability_reads(url: str, holds: int, reads: int) -> None:
+    """One product's availability: the column difference versus a SUM over its holds."""
+    from app.models import Product, StockReservation, User
+
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        product_id = conn.scalar(select(Product.id).limit(1))
+        user_ids = [uuid.uuid4() for _ in range(holds)]
+        conn.execute(
+            insert(User),
+            [
+                {"id": user_id, "name": "Holder", "email": f"holder-{user_id}@example.com", "password_hash": "x",
+                 "role": "user"}
+                for user_id in user_ids
+            ],
+        )
+        expires_at = datetime.utcnow() + timedelta(hours=1)
+        conn.execute(
+            insert(StockReservation),
+            [
+                {"id": uuid.uuid4(), "user_id": user_id, "product_id": product_id, "qty_kg": 0.5,
+                 "created_at": datetime.utcnow(), "expires_at": expires_at}
+                for user_id in user_ids
+            ],
+        )
+    column = select(Product.stock_kg - Product.reserved_kg).where(Product.id == product_id)
+    summed = select(
+        Product.stock_kg
+        - select(func.coalesce(func.sum(StockReservation.qty_kg), 0))
+        .where(StockReservation.product_id == product_id, StockReservation.expires_at > datetime.utcnow())
+        .scalar_subquery()
+    ).where(Product.id == product_id)
+    with engine.connect() as conn:
+        for label, statement in (("stock_kg - reserved_kg", column), (f"SUM over {holds} holds", summed)):
+            conn.execute(statement)
+            started = time.perf_counter()
+            for _ in range(reads):
+                conn.execute(statement).scalar()
+            print(f"  availability via {label:<24} {(time.perf_counter() - started) / reads * 1e6:8.0f} us/read")
+    engine.dispose()
+
+
+async def _run(url: str, args) -> None:
+    from app.main import app
+
+    for label, holds in (("no holds", False), ("holds", True)):
+        tokens, product_ids = _seed(url, args.customers, args.hot, args.stock)
+        async with app.router.lifespan_context(app):
+            result = await _shoppers(app, tokens, product_ids, args, holds)
+        latencies = {name: result.pop(name) for name in ("cart p50", "checkout p50")}
+        timings = "  ".join(f"{name} {value * 1000:.0f}ms" for name, value in latencies.items() if value is not None)
+        counts = ", ".join(f"{count} {name}" for name, count in result.items())
+        print(f"  {label:<9} {counts}  {timings}  ({_invariants(url)})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--customers", type=int, default=64)
+    parser.add_argument("--hot", type=int, default=3, help="products on offer")
+    parser.add_argument("--stock", type=float, default=30, help="kg of each product")
+    parser.add_argument("--think", type=float, default=1.0, help="max seconds before adding to cart and checking out")
+    parser.add_argument("--holds", type=int, default=5000, help="hold rows for the availability read comparison")
+    parser.add_argument("--reads", type=int, default=500)
+    parser.add_argument("--database-url", default="sqlite:///./bench_reservations.db")
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("DB_POOL_SIZE", str(min(args.customers, 20)))
+    print(
+        f"{args.customers} customers, {args.hot} products x {args.stock:g} kg, "
+        f"{make_url(args.database_url).get_backend_name()}"
+    )
+    asyncio.run(_run(args.database_url, args))
+    _availability_reads(args.database_url, args.holds, args.reads)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 -- Adds contact and address fields required for postcode-based user codes.
--- Run this against your database before deploying the registration changes.
+-- Superseded by app/migrations/versions/v0001_baseline.py, which adds these
+-- columns when missing; kept for reference.
 
 ALTER TABLE users
     ADD COLUMN IF NOT EXISTS phone VARCHAR(30),
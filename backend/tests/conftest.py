@@ -5,7 +5,6 @@ from pathlib import Path
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
 from sqlalchemy.engine import make_url
 
 # Ensure the app package is importable when tests run from repo root
@@ -38,26 +37,24 @@ with admin_engine.connect() as conn:
 admin_engine.dispose()
 
 from app.main import app  # noqa: E402  (import after setting env)
-from app.database import Base, get_db  # noqa: E402
+from app.catalog import catalog_cache  # noqa: E402
+from app.media import media_cache  # noqa: E402
+from app.database import Base  # noqa: E402
+from app.migrations.versions import v0004_product_search  # noqa: E402
 
 engine = create_engine(os.environ["DATABASE_URL"])
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
-def override_get_db():
-    db = TestingSessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
-app.dependency_overrides[get_db] = override_get_db
+def create_schema():
+    Base.metadata.create_all(bind=engine)
+    # The full-text column is PostgreSQL-only DDL that lives in its migration
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        v0004_product_search.upgrade(conn)
 
 
 @pytest.fixture(scope="session", autouse=True)
 def setup_database():
-    Base.metadata.create_all(bind=engine)
+    create_schema()
     yield
     Base.metadata.drop_all(bind=engine)
 
@@ -65,7 +62,9 @@ def setup_database():
 @pytest.fixture(autouse=True)
 def clean_tables():
     Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
+    create_schema()
+    catalog_cache.clear()
+    media_cache.clear()
     yield
 
 
@@ -0,0 +1,130 @@
+import csv
+import io
+import json
+
+from app.auth import hash_password
+from app.database import SessionLocal
+from app.models import Category, Product, RoleEnum, User
+
+
+def _admin_headers(client):
+    with SessionLocal() as session:
+        session.add(
+            User(
+                name="Import Admin",
+                email="import-admin@example.com",
+                password_hash=hash_password("supersecret"),
+                role=RoleEnum.admin,
+            )
+        )
+        session.add_all([Category(name="Fresh Fish", slug="fresh-fish"), Category(name="Dried", slug="dried")])
+        session.commit()
+    response = client.post(
+        "/api/auth/login",
+        data={"username": "import-admin@example.com", "password": "supersecret"},
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def _import(client, headers, body, content_type="text/csv"):
+    return client.post(
+        "/api/admin/products/import", content=body, headers={**headers, "Content-Type": content_type}
+    )
+
+
+def _products():
+    with SessionLocal() as session:
+        return {product.slug: product for product in session.query(Product).all()}
+
+
+def test_csv_import_creates_then_updates_by_slug(client):
+    headers = _admin_headers(client)
+
+    body = (
+        "slug,name,description,price_per_kg,stock_kg,category,is_dry\r\n"
+        'salmon,Atlantic Salmon,"Rich, buttery\nfillets",14.5,20,fresh-fish,false\r\n'
+        "anchovy,Dried Anchovy,,9,5,dried,true\r\n"
+    )
+    res = _import(client, headers, body)
+    assert res.status_code == 200, res.text
+    assert res.json() == {"rows": 2, "created": 2, "updated": 0, "unchanged": 0}
+    products = _products()
+    assert products["salmon"].description == "Rich, buttery\nfillets"
+    assert products["anchovy"].is_dry and products["anchovy"].description is None
+
+    # A price list only touches the columns it carries
+    res = _import(client, headers, "slug,price_per_kg\nsalmon,16\nanchovy,9\n")
+    assert res.json() == {"rows": 2, "created": 0, "updated": 1, "unchanged": 1}
+    salmon = _products()["salmon"]
+    assert (salmon.price_per_kg, salmon.stock_kg, salmon.name) == (16.0, 20.0, "Atlantic Salmon")
+
+    # One invalidation makes the whole batch visible to the storefront
+    assert {item["slug"]: item["price_per_kg"] for item in client.get("/api/products").json()} == {
+        "salmon": 16.0,
+        "anchovy": 9.0,
+    }
+
+
+def test_ndjson_import_and_export_round_trip(client):
+    headers = _admin_headers(client)
+
+    rows = [
+        {"slug": "cod", "name": "Cod", "price_per_kg": 12, "category": "fresh-fish", "image_url": "/media/cod.jpg"},
+        {"slug": "prawns", "name": "Dried Prawns", "price_per_kg": 22.5, "category": "dried", "is_dry": True},
+    ]
+    body = "".join(json.dumps(row) + "\n" for row in rows)
+    res = _import(client, headers, body, content_type="application/x-ndjson")
+    assert res.json()["created"] == 2
+
+    # An NDJSON row that leaves out a key keeps the stored value
+    res = _import(client, headers, '{"slug": "cod", "stock_kg": 40}\n', content_type="application/x-ndjson")
+    assert res.json()["updated"] == 1
+    assert _products()["cod"].image_url == "/media/cod.jpg"
+
+    exported = client.get("/api/admin/products/export", headers=headers)
+    assert exported.status_code == 200
+    assert exported.headers["content-type"].startswith("text/csv")
+    records = list(csv.DictReader(io.StringIO(exported.text)))
+    assert [record["slug"] for record in records] == ["cod", "prawns"]
+    assert records[0]["stock_kg"] == "40.0" and records[1]["is_dry"] == "true"
+
+    lines = client.get("/api/admin/products/export", params={"format": "ndjson"}, headers=headers).text.splitlines()
+    assert json.loads(lines[1])["category"] == "dried"
+
+    res = _import(client, headers, exported.text)
+    assert res.json() == {"rows": 2, "created": 0, "updated": 0, "unchanged": 2}
+
+
+def test_import_rejects_the_whole_file_with_line_numbers(client):
+    headers = _admin_headers(client)
+    _import(client, headers, "slug,name,price_per_kg,category\nhake,Hake,10,fresh-fish\n")
+
+    body = (
+        "slug,name,price_per_kg,category\n"
+        "hake,Hake,11,fresh-fish\n"
+        "sole,Sole,abc,fresh-fish\n"
+        "bass,Bass,15,lobsters\n"
+        "hake,Hake Again,12,fresh-fish\n"
+        "tuna,,20,fresh-fish\n"
+    )
+    res = _import(client, headers, body)
+    assert res.status_code == 422
+    assert res.json()["detail"] == [
+        {"line": 3, "msg": "price_per_kg: must be a number"},
+        {"line": 6, "msg": "name: a value is required"},
+    ]
+
+    # Field errors fixed, the checks against the database still run
+    res = _import(client, headers, body.replace(",abc,", ",13,").replace("tuna,,", "tuna,Tuna,"))
+    assert res.json()["detail"] == [
+        {"line": 4, "msg": "category: no category with this slug"},
+        {"line": 5, "msg": "slug: repeats an earlier row"},
+    ]
+    res = _import(client, headers, "slug,price_per_kg\nmullet,8\n")
+    assert res.json()["detail"] == [{"line": 2, "msg": "New product: name, price_per_kg and category are required"}]
+
+    assert _products()["hake"].price_per_kg == 10.0 and len(_products()) == 1
+    assert _import(client, headers, "sku,price\n").json()["detail"][0]["msg"] == "Unknown columns: sku, price"
+    assert _import(client, headers, "{}", content_type="application/json").status_code == 415
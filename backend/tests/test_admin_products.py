@@ -1,10 +1,18 @@
+import hashlib
 import io
+import time
 from pathlib import Path
 
+from PIL import Image
+
 from app.auth import hash_password
 from app.config import settings
 from app.database import SessionLocal
-from app.models import Category, RoleEnum, User
+from app.media import cloudinary_uploads
+from app.media.__main__ import main as media_cli
+from app.media.remote import CloudinaryUploads, LocalStandIn
+from app.routers import admin as admin_router
+from app.models import Category, Product, RoleEnum, User
 
 
 def _seed_admin_and_category():
@@ -119,3 +127,229 @@ def test_admin_can_upload_product_image(client):
     assert stored_file.stat().st_size > 0
 
     stored_file.unlink()
+
+
+def test_admin_batch_updates_prices_and_stock(client):
+    headers, category_id = _auth_headers(client)
+    ids = []
+    for name, price in (("Hake", 10.0), ("Sole", 20.0), ("Turbot", 30.0)):
+        payload = {"name": name, "slug": name.lower(), "price_per_kg": price, "stock_kg": 5.0}
+        payload["category_id"] = category_id
+        ids.append(client.post("/api/admin/products", json=payload, headers=headers).json()["id"])
+    assert len(client.get("/api/products").json()) == 3
+    missing = "00000000-0000-0000-0000-000000000000"
+
+    response = client.patch(
+        "/api/admin/products:batch",
+        json={
+            "items": [
+                {"id": ids[0], "price_per_kg": 11.5},
+                {"id": ids[1], "stock_kg": 0},
+                {"id": ids[2], "price_per_kg": 28.0, "stock_kg": 12.5},
+                {"id": missing, "stock_kg": 1},
+            ]
+        },
+        headers=headers,
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["updated"] == 3
+    assert body["results"] == [
+        {"id": ids[0], "status": "updated", "price_per_kg": 11.5, "stock_kg": 5.0},
+        {"id": ids[1], "status": "updated", "price_per_kg": 20.0, "stock_kg": 0.0},
+        {"id": ids[2], "status": "updated", "price_per_kg": 28.0, "stock_kg": 12.5},
+        {"id": missing, "status": "not_found", "price_per_kg": None, "stock_kg": None},
+    ]
+    storefront = {item["slug"]: (item["price_per_kg"], item["stock_kg"]) for item in client.get("/api/products").json()}
+    assert storefront == {"hake": (11.5, 5.0), "sole": (20.0, 0.0), "turbot": (28.0, 12.5)}
+
+    for items in (
+        [],
+        [{"id": ids[0]}],
+        [{"id": ids[0], "price_per_kg": -1}],
+        [{"id": ids[0], "stock_kg": 1}, {"id": ids[0], "price_per_kg": 2}],
+    ):
+        assert client.patch("/api/admin/products:batch", json={"items": items}, headers=headers).status_code == 422
+
+
+def test_uploaded_image_gets_resized_variants(client):
+    headers, category_id = _auth_headers(client)
+    photo = io.BytesIO()
+    Image.new("RGB", (2400, 1800), (30, 90, 140)).save(photo, format="JPEG", quality=95)
+    photo.seek(0)
+
+    upload = client.post(
+        "/api/admin/products/upload-image",
+        headers=headers,
+        files={"file": ("catch.jpg", photo, "image/jpeg")},
+    ).json()
+    payload = {"name": "Sea Bass", "slug": "sea-bass", "price_per_kg": 18.0, "stock_kg": 4.0}
+    created = client.post(
+        "/api/admin/products", json={**payload, "category_id": category_id, "image_url": upload["url"]}, headers=headers
+    ).json()
+
+    # Rendering happens in the process pool after the upload has returned
+    deadline = time.monotonic() + 60
+    while client.get("/api/admin/metrics/image-variants", headers=headers).json()["pending"]:
+        assert time.monotonic() < deadline
+        time.sleep(0.1)
+    assert client.get("/api/admin/metrics/image-variants", headers=headers).json()["failed"] == 0
+
+    product = client.get("/api/products/sea-bass").json()
+    variants = product["image_variants"]
+    assert set(variants) == {"thumbnail", "card", "detail"}
+    assert (variants["card"]["width"], variants["card"]["height"]) == (640, 480)
+    assert variants["card"]["webp"] == upload["url"].rsplit(".", 1)[0].replace(
+        "/products/", "/products/variants/"
+    ) + "/card.webp"
+
+    variant_dir = Path(settings.MEDIA_ROOT) / "products" / "variants" / Path(upload["filename"]).stem
+    with Image.open(variant_dir / "thumbnail.webp") as thumbnail:
+        assert max(thumbnail.size) == 200
+    assert (variant_dir / "card.webp").stat().st_size < upload["size"]
+
+    # Editing other fields keeps them; a new product using the same photo picks them up from the manifest
+    edited = client.patch(f"/api/admin/products/{created['id']}", json={"name": "Sea Bass Whole"}, headers=headers)
+    assert edited.json()["image_variants"] == variants
+    twin = client.post(
+        "/api/admin/products",
+        json={**payload, "slug": "sea-bass-fillet", "category_id": category_id, "image_url": upload["url"]},
+        headers=headers,
+    )
+    assert twin.json()["image_variants"] == variants
+
+    for path in variant_dir.iterdir():
+        path.unlink()
+    variant_dir.rmdir()
+    (Path(settings.MEDIA_ROOT) / upload["path"]).unlink()
+
+
+def test_variants_rendered_while_a_product_saves_are_kept(client, monkeypatch):
+    headers, category_id = _auth_headers(client)
+    photo = io.BytesIO()
+    Image.new("RGB", (900, 600), (200, 120, 40)).save(photo, format="JPEG")
+    upload = client.post(
+        "/api/admin/products/upload-image", headers=headers, files={"file": ("late.jpg", photo.getvalue(), "image/jpeg")}
+    ).json()
+    deadline = time.monotonic() + 60
+    while client.get("/api/admin/metrics/image-variants", headers=headers).json()["pending"]:
+        assert time.monotonic() < deadline
+        time.sleep(0.1)
+
+    # The render (and its _record, which found no product) finished after the
+    # save consulted the manifest but before it committed
+    monkeypatch.setattr(admin_router, "variants_for", lambda image_url: None)
+    payload = {"name": "Mackerel", "slug": "mackerel", "price_per_kg": 9.0, "stock_kg": 6.0}
+    created = client.post(
+        "/api/admin/products", json={**payload, "category_id": category_id, "image_url": upload["url"]}, headers=headers
+    ).json()
+    assert set(created["image_variants"]) == {"thumbnail", "card", "detail"}
+    assert client.get("/api/products/mackerel").json()["image_variants"] == created["image_variants"]
+
+    other = client.post(
+        "/api/admin/products",
+        json={**payload, "slug": "mackerel-fillet", "category_id": category_id, "image_url": None},
+        headers=headers,
+    ).json()
+    edited = client.patch(f"/api/admin/products/{other['id']}", json={"image_url": upload["url"]}, headers=headers)
+    assert edited.json()["image_variants"] == created["image_variants"]
+
+    variant_dir = Path(settings.MEDIA_ROOT) / "products" / "variants" / Path(upload["filename"]).stem
+    for path in variant_dir.iterdir():
+        path.unlink()
+    variant_dir.rmdir()
+    (Path(settings.MEDIA_ROOT) / upload["path"]).unlink()
+
+
+def _upload(client, headers, body, name="photo.png"):
+    return client.post(
+        "/api/admin/products/upload-image", headers=headers, files={"file": (name, io.BytesIO(body), "image/png")}
+    ).json()
+
+
+def test_uploads_are_stored_once_by_content_hash(client):
+    headers, _ = _auth_headers(client)
+    body = b"\x89PNG\r\n\x1a\n" + b"same photo" * 64
+
+    first = _upload(client, headers, body)
+    again = _upload(client, headers, body, name="renamed.png")
+    other = _upload(client, headers, body + b"!")
+    assert first["path"] == again["path"] == f"products/{hashlib.sha256(body).hexdigest()}.png"
+    assert (first["deduplicated"], again["deduplicated"]) == (False, True)
+    assert other["path"] != first["path"]
+    assert not list((Path(settings.MEDIA_ROOT) / "products").glob(".*.partial"))
+
+    served = client.get(first["url"])
+    assert served.content == body
+    assert served.headers["cache-control"] == "public, max-age=31536000, immutable"
+
+    for upload in (first, other):
+        (Path(settings.MEDIA_ROOT) / upload["path"]).unlink()
+
+
+def test_media_gc_removes_only_unreferenced_photos(client, tmp_path, monkeypatch):
+    headers, category_id = _auth_headers(client)
+    monkeypatch.setattr(settings, "MEDIA_ROOT", str(tmp_path))
+    used = _upload(client, headers, b"\x89PNG\r\n\x1a\n" + b"in use" * 64)
+    unused = _upload(client, headers, b"\x89PNG\r\n\x1a\n" + b"replaced" * 64)
+    (tmp_path / "products" / "variants" / Path(unused["filename"]).stem).mkdir(parents=True)
+    for slug in ("hake", "hake-fillet"):
+        payload = {"name": slug, "slug": slug, "price_per_kg": 10.0, "stock_kg": 1.0, "image_url": used["url"]}
+        client.post("/api/admin/products", json={**payload, "category_id": category_id}, headers=headers)
+
+    # Just uploaded: the product using it may not have been saved yet
+    assert media_cli(["gc"]) == 0
+    assert (tmp_path / unused["path"]).exists()
+
+    assert media_cli(["gc", "--grace-hours", "0"]) == 0
+    assert (tmp_path / used["path"]).exists()
+    assert not (tmp_path / unused["path"]).exists()
+    assert not (tmp_path / "products" / "variants" / Path(unused["filename"]).stem).exists()
+
+
+def test_cloudinary_uploads_are_spooled_then_pushed_in_the_background(client, monkeypatch):
+    headers, category_id = _auth_headers(client)
+    stand_in = LocalStandIn(failures=2)
+    monkeypatch.setattr(cloudinary_uploads, "client", stand_in)
+    monkeypatch.setattr(settings, "USE_CLOUDINARY", True)
+    monkeypatch.setattr(settings, "CLOUDINARY_CLOUD_NAME", "tarel-test")
+    monkeypatch.setattr(settings, "CLOUDINARY_UPLOAD_RETRY_SECONDS", 0.01)
+    body = b"\x89PNG\r\n\x1a\n" + b"pushed" * 64
+
+    upload = _upload(client, headers, body)
+    # Answered from the local spool before Cloudinary has seen the photo
+    assert upload["pending_upload"] is True
+    assert client.get(upload["url"]).content == body
+    payload = {"name": "Hake", "slug": "hake", "price_per_kg": 10.0, "stock_kg": 1.0, "image_url": upload["url"]}
+    client.post("/api/admin/products", json={**payload, "category_id": category_id}, headers=headers)
+
+    deadline = time.monotonic() + 10
+    while client.get("/api/admin/metrics/cloudinary-uploads", headers=headers).json()["pending"]:
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+
+    stem = Path(upload["filename"]).stem
+    remote_url = f"https://res.cloudinary.test/tarel/image/upload/tarel/products/{stem}.png"
+    assert stand_in.calls == 3 and stand_in.uploads == {stem: body}
+    assert client.get("/api/products/hake").json()["image_url"] == remote_url
+
+    # Saved with the provisional URL after the push: stored as the Cloudinary one
+    payload = {**payload, "slug": "hake-fillet", "category_id": category_id}
+    assert client.post("/api/admin/products", json=payload, headers=headers).json()["image_url"] == remote_url
+    again = _upload(client, headers, body)
+    assert (again["url"], again["pending_upload"], stand_in.calls) == (remote_url, False, 3)
+
+    # Saved on another worker that looked before the push was recorded: its
+    # follow-up finds the recorded URL without pushing again
+    with SessionLocal() as session:
+        session.add(
+            Product(
+                name="Hake Loin", slug="hake-loin", price_per_kg=10.0, category_id=category_id, image_url=upload["url"]
+            )
+        )
+        session.commit()
+    client.portal.call(CloudinaryUploads(stand_in).follow, upload["url"])
+    assert client.get("/api/products/hake-loin").json()["image_url"] == remote_url
+    assert stand_in.calls == 3
+
+    (Path(settings.MEDIA_ROOT) / upload["path"]).unlink()
@@ -162,3 +162,62 @@ def test_user_code_sequence_across_postcodes(client):
     assert res.status_code == 200
     fourth_code = res.json()["user_code"]
     assert fourth_code == f"FA{year_suffix}0004"
+
+
+def test_login_rejects_fast_when_hashing_pool_is_saturated(client, monkeypatch):
+    import threading
+
+    from app import auth as auth_module
+
+    payload = _register_payload("busy-login@tarel.local")
+    assert client.post("/api/auth/register", json=payload).status_code == 200
+
+    saturated = threading.BoundedSemaphore(1)
+    saturated.acquire()
+    monkeypatch.setattr(auth_module, "_hash_slots", saturated)
+
+    res = client.post(
+        "/api/auth/login",
+        data={"username": payload["email"], "password": payload["password"]},
+    )
+    assert res.status_code == 503
+    assert res.headers["retry-after"] == "1"
+
+
+def test_no_transaction_stays_open_while_passwords_hash(client, monkeypatch):
+    from sqlalchemy import text
+
+    from app.deps import principal_cache
+    from app.routers import auth as auth_router
+
+    def idle_in_transaction() -> int:
+        with SessionLocal() as session:
+            return session.scalar(
+                text(
+                    "SELECT count(*) FROM pg_stat_activity "
+                    "WHERE datname = current_database() AND state LIKE 'idle in transaction%'"
+                )
+            )
+
+    seen = []
+    real_hash, real_verify = auth_router.hash_password_offloaded, auth_router.verify_password_offloaded
+
+    async def hash_spy(password):
+        seen.append(idle_in_transaction())
+        return await real_hash(password)
+
+    async def verify_spy(password, password_hash):
+        seen.append(idle_in_transaction())
+        return await real_verify(password, password_hash)
+
+    monkeypatch.setattr(auth_router, "hash_password_offloaded", hash_spy)
+    monkeypatch.setattr(auth_router, "verify_password_offloaded", verify_spy)
+
+    payload = _register_payload("hash-wait@tarel.local")
+    assert client.post("/api/auth/register", json=payload).status_code == 200
+    res = client.post("/api/auth/login", data={"username": payload["email"], "password": payload["password"]})
+    assert res.status_code == 200
+    headers = {"Authorization": f"Bearer {res.json()['access_token']}"}
+    principal_cache.clear()
+    assert client.patch("/api/auth/me", json={"password": "even-more-secret"}, headers=headers).status_code == 200
+    assert seen == [0, 0, 0]
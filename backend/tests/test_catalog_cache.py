@@ -0,0 +1,144 @@
+import asyncio
+from typing import List
+
+from pydantic import TypeAdapter
+
+from app import database
+from app.auth import hash_password
+from app.catalog import catalog_cache
+from app.database import SessionLocal
+from app.models import Category, RoleEnum, User
+from app.schemas import ProductOut
+
+
+def _admin_headers_and_category(client):
+    with SessionLocal() as session:
+        session.add(
+            User(
+                name="Catalog Admin",
+                email="catalog-admin@example.com",
+                password_hash=hash_password("supersecret"),
+                role=RoleEnum.admin,
+            )
+        )
+        category = Category(name="Shellfish", slug="shellfish")
+        session.add(category)
+        session.commit()
+        category_id = str(category.id)
+    res = client.post(
+        "/api/auth/login",
+        data={"username": "catalog-admin@example.com", "password": "supersecret"},
+    )
+    assert res.status_code == 200
+    return {"Authorization": f"Bearer {res.json()['access_token']}"}, category_id
+
+
+def test_storefront_reads_are_served_from_snapshot(client, monkeypatch):
+    headers, category_id = _admin_headers_and_category(client)
+    rebuilds_before = catalog_cache.stats()["rebuilds"]
+    created = client.post(
+        "/api/admin/products",
+        json={
+            "name": "Langoustine",
+            "slug": "langoustine",
+            "price_per_kg": 32.0,
+            "stock_kg": 12.0,
+            "category_id": category_id,
+        },
+        headers=headers,
+    )
+    assert created.status_code == 200
+
+    assert [p["slug"] for p in client.get("/api/products/").json()] == ["langoustine"]
+
+    def no_database():
+        raise AssertionError("catalog read hit the database")
+
+    monkeypatch.setattr(database, "AsyncSessionLocal", no_database)
+    assert client.get("/api/products/langoustine").json()["price_per_kg"] == 32.0
+    assert [c["slug"] for c in client.get("/api/categories/").json()] == ["shellfish"]
+    monkeypatch.undo()
+
+    res = client.patch(
+        f"/api/admin/products/{created.json()['id']}", json={"price_per_kg": 29.5}, headers=headers
+    )
+    assert res.status_code == 200
+    assert client.get("/api/products/langoustine").json()["price_per_kg"] == 29.5
+
+    metrics = client.get("/api/admin/metrics/catalog-cache", headers=headers).json()
+    assert metrics["rebuilds"] - rebuilds_before == 2
+    assert metrics["hits"] >= 2
+    assert metrics["invalidations"] >= 2
+    assert metrics["rebuild_ms_last"] > 0
+
+
+def test_deactivated_category_leaves_storefront_immediately(client):
+    headers, category_id = _admin_headers_and_category(client)
+    assert len(client.get("/api/categories/").json()) == 1
+
+    res = client.patch(f"/api/admin/categories/{category_id}", json={"is_active": False}, headers=headers)
+    assert res.status_code == 200
+    assert client.get("/api/categories/").json() == []
+    assert catalog_cache.stats()["snapshot_version"] == catalog_cache.version
+
+
+def test_conditional_gets_return_304_until_data_changes(client, monkeypatch):
+    headers, _ = _admin_headers_and_category(client)
+
+    for path in ("/api/products/", "/api/categories/", "/api/products/cut-clean-options", "/api/site/next-delivery"):
+        first = client.get(path)
+        assert first.status_code == 200
+        etag = first.headers["etag"]
+        assert "stale-while-revalidate" in first.headers["cache-control"]
+
+        monkeypatch.setattr(database, "AsyncSessionLocal", None)
+        repeat = client.get(path, headers={"If-None-Match": f'"other", W/{etag}'})
+        monkeypatch.undo()
+        assert repeat.status_code == 304
+        assert repeat.content == b""
+        assert repeat.headers["etag"] == etag
+
+    etag = client.get("/api/products/cut-clean-options").headers["etag"]
+    res = client.post("/api/admin/cut-clean-options", json={"label": "Gutted", "sort_order": 1}, headers=headers)
+    assert res.status_code == 201
+    changed = client.get("/api/products/cut-clean-options", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert [option["label"] for option in changed.json()] == ["Gutted"]
+
+
+def test_prepared_bodies_match_response_model_and_slice_by_category(client, monkeypatch):
+    headers, category_id = _admin_headers_and_category(client)
+    other = client.post("/api/admin/categories", json={"name": "Dried", "slug": "dried"}, headers=headers)
+    assert other.status_code == 200
+    for n in range(12):
+        res = client.post(
+            "/api/admin/products",
+            json={
+                "name": f"Prawn {n}",
+                "slug": f"prawn-{n}",
+                "description": "Whole, head-on tiger prawns landed daily. " * 2,
+                "price_per_kg": 18.5 + n,
+                "stock_kg": 40.0,
+                "category_id": category_id if n % 3 else other.json()["id"],
+            },
+            headers=headers,
+        )
+        assert res.status_code == 200
+
+    plain = client.get("/api/products/", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    snapshot = asyncio.run(catalog_cache.get())
+    expected = TypeAdapter(List[ProductOut]).validate_python(snapshot.products)
+    assert plain.json() == TypeAdapter(List[ProductOut]).dump_python(expected, mode="json")
+
+    compressed = client.get("/api/products/", headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.headers["vary"] == "Accept-Encoding"
+    assert compressed.headers["etag"] != plain.headers["etag"]
+    assert compressed.json() == plain.json()
+
+    monkeypatch.setattr(database, "AsyncSessionLocal", None)
+    dried = client.get("/api/products/", params={"category": "dried"}).json()
+    assert sorted(p["slug"] for p in dried) == ["prawn-0", "prawn-3", "prawn-6", "prawn-9"]
+    assert len(client.get("/api/products/", params={"category": "shellfish"}).json()) == 8
+    assert client.get("/api/products/", params={"category": "unknown"}).json() == []
@@ -0,0 +1,92 @@
+import asyncio
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+from app import database
+from app.auth import hash_password
+from app.config import settings
+from app.database import SessionLocal
+from app.models import RoleEnum, User
+
+
+def _admin_headers(client):
+    with SessionLocal() as session:
+        session.add(
+            User(
+                name="Pool Admin",
+                email="pool-admin@example.com",
+                password_hash=hash_password("supersecret"),
+                role=RoleEnum.admin,
+            )
+        )
+        session.commit()
+    res = client.post(
+        "/api/auth/login",
+        data={"username": "pool-admin@example.com", "password": "supersecret"},
+    )
+    assert res.status_code == 200
+    return {"Authorization": f"Bearer {res.json()['access_token']}"}
+
+
+def test_engine_options_follow_settings(monkeypatch):
+    monkeypatch.setattr(settings, "DB_POOL_SIZE", 7)
+    monkeypatch.setattr(settings, "DB_STATEMENT_TIMEOUT_MS", 1500)
+
+    options = database._engine_options(
+        make_url("postgresql+psycopg://u:p@localhost/db"), QueuePool, database.PoolStats()
+    )
+
+    assert options["pool_size"] == 7
+    assert issubclass(options["poolclass"], QueuePool)
+    assert options["connect_args"] == {
+        "options": "-c statement_timeout=1500",
+        "prepare_threshold": settings.DB_PREPARE_THRESHOLD,
+    }
+
+
+def test_prefill_and_pool_metrics_endpoint(client):
+    headers = _admin_headers(client)
+    opened = asyncio.run(database.prefill_async_pool())
+    assert opened == settings.DB_POOL_SIZE
+
+    res = client.get("/api/admin/metrics/db-pool", headers=headers)
+    assert res.status_code == 200
+    metrics = res.json()
+    assert metrics["async"]["checkouts"] > 0
+    assert {"checked_out", "overflow", "wait_ms_max"} <= metrics["async"].keys()
+    assert metrics["server"]["max_connections"] > 0
+
+
+def test_sqlite_profile_applies_pragmas_and_immediate_writes(tmp_path):
+    url = make_url(f"sqlite:///{tmp_path / 'store.db'}")
+    options = database._engine_options(url, QueuePool, database.PoolStats())
+    assert issubclass(options["poolclass"], QueuePool)
+    assert "pool_pre_ping" not in options
+
+    engine = create_engine(url, **options)
+    database._configure_sqlite(engine)
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == settings.SQLITE_BUSY_TIMEOUT_MS
+
+    writer = engine.execution_options(sqlite_begin="IMMEDIATE")
+    with writer.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE stock (qty INTEGER)")
+        # The write lock is held from BEGIN, so a second writer cannot start
+        raw = sqlite3.connect(tmp_path / "store.db", timeout=0)
+        with pytest.raises(sqlite3.OperationalError):
+            raw.execute("BEGIN IMMEDIATE")
+        raw.close()
+    with writer.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO stock VALUES (1)")
+
+    # Read sessions begin deferred: an open read takes neither the gate nor the write lock
+    with engine.begin() as reader:
+        assert reader.exec_driver_sql("SELECT count(*) FROM stock").scalar() == 1
+        with writer.begin() as conn:
+            conn.exec_driver_sql("INSERT INTO stock VALUES (2)")
+    engine.dispose()
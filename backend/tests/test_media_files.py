@@ -0,0 +1,87 @@
+import hashlib
+import os
+from pathlib import Path
+
+import pytest
+
+from app.config import settings
+from app.media import media_cache
+
+
+@pytest.fixture()
+def media_file():
+    created = []
+
+    def write(relative, body):
+        path = Path(settings.MEDIA_ROOT) / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(body)
+        created.append(path)
+        return path
+
+    yield write
+    for path in created:
+        path.unlink(missing_ok=True)
+
+
+def test_hashed_photo_is_immutable_cached_and_ranged(client, media_file):
+    body = os.urandom(4096)
+    name = f"products/{hashlib.sha256(body).hexdigest()}.jpg"
+    path = media_file(name, body)
+
+    first = client.get(f"/media/{name}")
+    assert first.status_code == 200 and first.content == body
+    assert first.headers["cache-control"] == "public, max-age=31536000, immutable"
+    assert first.headers["content-type"] == "image/jpeg"
+    assert first.headers["accept-ranges"] == "bytes"
+    etag = first.headers["etag"]
+
+    # Served from memory: the file is not even looked at again
+    path.unlink()
+    assert client.get(f"/media/{name}").content == body
+    assert media_cache.stats()["hits"] == 1
+
+    head = client.head(f"/media/{name}")
+    assert head.status_code == 200 and head.headers["content-length"] == "4096" and not head.content
+    assert client.get(f"/media/{name}", headers={"If-None-Match": f"W/{etag}"}).status_code == 304
+    since = client.get(f"/media/{name}", headers={"If-Modified-Since": first.headers["last-modified"]})
+    assert since.status_code == 304 and since.headers["etag"] == etag
+
+    part = client.get(f"/media/{name}", headers={"Range": "bytes=10-19"})
+    assert part.status_code == 206 and part.content == body[10:20]
+    assert part.headers["content-range"] == "bytes 10-19/4096"
+    assert client.get(f"/media/{name}", headers={"Range": "bytes=-100"}).content == body[-100:]
+    assert client.get(f"/media/{name}", headers={"Range": "bytes=0-1,5-9"}).status_code == 200
+    unsatisfiable = client.get(f"/media/{name}", headers={"Range": "bytes=5000-"})
+    assert unsatisfiable.status_code == 416 and unsatisfiable.headers["content-range"] == "bytes */4096"
+    stale = client.get(f"/media/{name}", headers={"Range": "bytes=0-9", "If-Range": '"old"'})
+    assert stale.status_code == 200 and stale.content == body
+
+
+def test_mutable_and_large_files(client, media_file, monkeypatch):
+    path = media_file("products/legacy.png", b"first version")
+    response = client.get("/media/products/legacy.png")
+    assert response.content == b"first version" and "cache-control" not in response.headers
+
+    # A cached file whose name is not a content hash is checked against the disk
+    path.write_bytes(b"second, longer version")
+    assert client.get("/media/products/legacy.png").content == b"second, longer version"
+
+    monkeypatch.setattr(media_cache, "max_file_bytes", 1024)
+    big = os.urandom(200_000)
+    media_file("products/big.jpg", big)
+    streamed = client.get("/media/products/big.jpg", headers={"Range": "bytes=70000-140000"})
+    assert streamed.status_code == 206 and streamed.content == big[70000:140001]
+    assert client.get("/media/products/big.jpg").content == big
+    assert media_cache.stats()["entries"] == 1
+
+    manifest = b'{"card": {"width": 640, "height": 480, "webp": "card.webp"}}' * 8
+    media_file("products/variants/legacy/manifest.json", manifest)
+    zipped = client.get("/media/products/variants/legacy/manifest.json", headers={"Accept-Encoding": "gzip"})
+    assert zipped.headers["content-encoding"] == "gzip" and zipped.headers["vary"] == "Accept-Encoding"
+    assert zipped.content == manifest  # httpx decodes it
+
+    media_file("products/.upload.partial", b"half")
+    for missing in ("products/.upload.partial", "products/nothing.jpg", "products/../../app/config.py", "products"):
+        assert client.get(f"/media/{missing}").status_code == 404
+    assert client.post("/media/products/big.jpg").status_code == 405
@@ -0,0 +1,84 @@
+from uuid import uuid4
+
+from sqlalchemy import create_engine, inspect, select, text
+from sqlalchemy.orm import Session
+
+from app.database import Base
+from app.migrations import discover, pending_migrations, status, upgrade
+from app.models import Product
+
+
+def _sqlite_engine(tmp_path):
+    return create_engine(f"sqlite:///{tmp_path / 'migrations.db'}")
+
+
+def test_upgrade_applies_each_version_once(tmp_path):
+    engine = _sqlite_engine(tmp_path)
+    versions = [migration.version for migration in discover()]
+
+    # Reporting status never creates the bookkeeping table
+    assert not any(applied for _, applied in status(engine))
+    assert inspect(engine).get_table_names() == []
+
+    assert upgrade(engine) == versions
+    assert upgrade(engine) == []
+    assert all(applied for _, applied in status(engine))
+    assert {"users", "products", "orders", "schema_migrations"} <= set(inspect(engine).get_table_names())
+
+
+def test_models_create_all_on_sqlite(tmp_path):
+    # PostgreSQL-only DDL (the search vector) belongs in migrations, not on the models
+    engine = _sqlite_engine(tmp_path)
+    Base.metadata.create_all(engine)
+    assert "search_vector" not in {column["name"] for column in inspect(engine).get_columns("products")}
+
+
+def test_baseline_adopts_legacy_users_table(tmp_path):
+    engine = _sqlite_engine(tmp_path)
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "CREATE TABLE users (id CHAR(36) PRIMARY KEY, name VARCHAR(120) NOT NULL, "
+                "email VARCHAR(255) NOT NULL, password_hash VARCHAR(255) NOT NULL, "
+                "role VARCHAR(5) NOT NULL, created_at DATETIME)"
+            )
+        )
+
+    upgrade(engine, target=1)
+
+    columns = {column["name"] for column in inspect(engine).get_columns("users")}
+    assert {"phone", "postcode", "user_code"} <= columns
+    assert "uq_users_user_code" in {index["name"] for index in inspect(engine).get_indexes("users")}
+
+
+def test_text_guids_are_converted_to_binary(tmp_path):
+    engine = _sqlite_engine(tmp_path)
+    upgrade(engine, target=2)
+    category_id, product_id = uuid4(), uuid4()
+    with engine.begin() as conn:
+        conn.execute(
+            text("INSERT INTO categories (id, name, slug, is_active) VALUES (:id, 'Fresh', 'fresh', 1)"),
+            {"id": str(category_id)},
+        )
+        conn.execute(
+            text(
+                "INSERT INTO products (id, name, slug, price_per_kg, category_id) "
+                "VALUES (:id, 'Hake', 'hake', 9.5, :category_id)"
+            ),
+            {"id": str(product_id), "category_id": str(category_id)},
+        )
+
+    # Binary lookups would miss every text id, so workers must not start yet
+    with engine.connect() as conn:
+        blocking = [migration.version for migration in pending_migrations(conn) if migration.blocks_serving("sqlite")]
+    assert blocking == [3]
+
+    upgrade(engine)
+
+    with engine.connect() as conn:
+        assert not any(migration.blocks_serving("sqlite") for migration in pending_migrations(conn))
+        stored = conn.execute(text("SELECT typeof(id), typeof(category_id) FROM products")).one()
+    assert tuple(stored) == ("blob", "blob")
+    with Session(engine) as session:
+        product = session.scalars(select(Product).join(Product.category)).one()
+        assert (product.id, product.category_id) == (product_id, category_id)
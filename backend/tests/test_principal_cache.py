@@ -0,0 +1,84 @@
+import time
+
+from app.auth import hash_password
+from app.cache import TTLCache
+from app.database import SessionLocal
+from app.deps import principal_cache
+from app.models import RoleEnum, User
+
+
+def _create_user(email: str, role: RoleEnum = RoleEnum.user) -> str:
+    with SessionLocal() as session:
+        user = User(
+            name="Cache Tester",
+            email=email,
+            password_hash=hash_password("supersecret"),
+            role=role,
+        )
+        session.add(user)
+        session.commit()
+        return str(user.id)
+
+
+def _login_headers(client, email: str) -> dict[str, str]:
+    res = client.post(
+        "/api/auth/login",
+        data={"username": email, "password": "supersecret"},
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    assert res.status_code == 200
+    return {"Authorization": f"Bearer {res.json()['access_token']}"}
+
+
+def test_ttl_cache_expires_and_evicts():
+    cache = TTLCache(max_size=2, ttl_seconds=0.05)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.set("c", 3)
+    assert cache.get("a") is None
+    assert cache.get("c") == 3
+
+    time.sleep(0.06)
+    assert cache.get("c") is None
+
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+
+
+def test_repeat_requests_are_served_from_cache(client):
+    _create_user("cached-user@example.com")
+    headers = _login_headers(client, "cached-user@example.com")
+
+    before = principal_cache.stats()
+    assert client.get("/api/auth/me", headers=headers).status_code == 200
+    assert client.get("/api/auth/me", headers=headers).status_code == 200
+    after = principal_cache.stats()
+
+    assert after["hits"] - before["hits"] >= 1
+
+
+def test_profile_and_role_changes_invalidate_cached_principal(client):
+    user_id = _create_user("promoted@example.com")
+    _create_user("cache-admin@example.com", role=RoleEnum.admin)
+    user_headers = _login_headers(client, "promoted@example.com")
+    admin_headers = _login_headers(client, "cache-admin@example.com")
+
+    assert client.get("/api/admin/users", headers=user_headers).status_code == 403
+
+    res = client.patch("/api/auth/me", json={"name": "Renamed"}, headers=user_headers)
+    assert res.status_code == 200
+    assert client.get("/api/auth/me", headers=user_headers).json()["name"] == "Renamed"
+
+    res = client.patch(
+        f"/api/admin/users/{user_id}/role",
+        params={"role": "admin"},
+        headers=admin_headers,
+    )
+    assert res.status_code == 200
+    assert client.get("/api/admin/users", headers=user_headers).status_code == 200
+
+    metrics = client.get("/api/admin/metrics/principal-cache", headers=admin_headers)
+    assert metrics.status_code == 200
+    assert {"hits", "misses", "size"} <= metrics.json().keys()
@@ -0,0 +1,110 @@
+from app.catalog import catalog_cache
+from app.database import SessionLocal
+from app.models import Category, Product
+
+
+def _seed_catalog():
+    with SessionLocal() as session:
+        fresh = Category(name="Fresh Fish", slug="fresh-fish")
+        dried = Category(name="Dried Fish", slug="dried-fish")
+        session.add_all([fresh, dried])
+        session.flush()
+        rows = [
+            ("Anchovy", 8.0, 5.0, True, dried),
+            ("Bream", 14.0, 0.0, False, fresh),
+            ("Cod", 18.0, 12.0, False, fresh),
+            ("Dried Prawns", 22.0, 3.0, True, dried),
+            ("Emperor", 26.0, 7.0, False, fresh),
+            ("Flounder", 14.0, 9.0, False, fresh),
+        ]
+        for name, price, stock, is_dry, category in rows:
+            session.add(
+                Product(
+                    name=name,
+                    slug=name.lower().replace(" ", "-"),
+                    price_per_kg=price,
+                    stock_kg=stock,
+                    is_dry=is_dry,
+                    category_id=category.id,
+                )
+            )
+        session.add(Product(name="Retired", slug="retired", price_per_kg=1.0, category_id=fresh.id, is_active=False))
+        session.commit()
+
+
+def _names(body):
+    return [item["name"] for item in body["items"]]
+
+
+def test_browse_filters_and_facets(client):
+    _seed_catalog()
+
+    body = client.get("/api/products/browse").json()
+    assert _names(body) == ["Anchovy", "Bream", "Cod", "Dried Prawns", "Emperor", "Flounder"]
+    assert body["total"] == 6 and body["next_cursor"] is None
+    assert body["facets"]["fresh"] == 4 and body["facets"]["dry"] == 2
+
+    body = client.get(
+        "/api/products/browse",
+        params={"category": "fresh-fish", "in_stock": "true", "min_price": 10, "max_price": 20, "sort": "price_desc"},
+    ).json()
+    assert _names(body) == ["Cod", "Flounder"]
+    # Category counts ignore the category filter but honour the others
+    assert {facet["slug"]: facet["count"] for facet in body["facets"]["categories"]} == {
+        "dried-fish": 0,
+        "fresh-fish": 2,
+    }
+    assert (body["facets"]["fresh"], body["facets"]["dry"]) == (2, 0)
+
+    body = client.get("/api/products/browse", params={"is_dry": "true"}).json()
+    assert _names(body) == ["Anchovy", "Dried Prawns"]
+    assert body["facets"]["fresh"] == 4
+    assert {facet["slug"]: facet["count"] for facet in body["facets"]["categories"]}["fresh-fish"] == 0
+
+    assert client.get("/api/products/browse", params={"category": "lobster"}).json()["total"] == 0
+
+
+def test_browse_keyset_pagination(client):
+    _seed_catalog()
+
+    for sort in ("price_asc", "price_desc", "name_asc", "name_desc"):
+        pages, cursor = [], None
+        while True:
+            params = {"sort": sort, "page_size": 2}
+            if cursor:
+                params["cursor"] = cursor
+            body = client.get("/api/products/browse", params=params).json()
+            pages.append(body["items"])
+            cursor = body["next_cursor"]
+            if cursor is None:
+                break
+        items = [item for page in pages for item in page]
+        # Bream and Flounder tie on price across a page boundary; the id in
+        # the cursor keeps either from being skipped or repeated
+        assert len(pages) == 3
+        assert sorted(item["name"] for item in items) == [
+            "Anchovy", "Bream", "Cod", "Dried Prawns", "Emperor", "Flounder"
+        ]
+        field = "price_per_kg" if sort.startswith("price") else "name"
+        keys = [item[field] for item in items]
+        assert keys == sorted(keys, reverse=sort.endswith("desc"))
+
+
+def test_browse_cursor_survives_catalog_changes(client):
+    _seed_catalog()
+
+    first = client.get("/api/products/browse", params={"page_size": 2}).json()
+    assert _names(first) == ["Anchovy", "Bream"]
+
+    with SessionLocal() as session:
+        category = session.query(Category).filter_by(slug="fresh-fish").one()
+        session.add(Product(name="Arctic Char", slug="arctic-char", price_per_kg=30.0, category_id=category.id))
+        session.commit()
+    catalog_cache.invalidate()
+
+    second = client.get("/api/products/browse", params={"page_size": 2, "cursor": first["next_cursor"]}).json()
+    assert _names(second) == ["Cod", "Dried Prawns"]
+
+    res = client.get("/api/products/browse", params={"sort": "price_asc", "cursor": first["next_cursor"]})
+    assert res.status_code == 400
+    assert client.get("/api/products/browse", params={"cursor": "not-a-cursor"}).status_code == 400
@@ -0,0 +1,87 @@
+import uuid
+
+from app.database import SessionLocal
+from app.models import Category, Product
+from app.schemas import CategoryOut, ProductOut
+from app.search import SearchIndex
+
+
+def _seed_catalog():
+    with SessionLocal() as session:
+        fresh = Category(name="Fresh Fish", slug="fresh-fish")
+        dried = Category(name="Dried Seafood", slug="dried-seafood")
+        session.add_all([fresh, dried])
+        session.flush()
+        session.add_all(
+            [
+                Product(name="Atlantic Salmon", slug="atlantic-salmon", description="Farmed, skin on",
+                        price_per_kg=21.0, category_id=fresh.id),
+                Product(name="Salmon Trout", slug="salmon-trout", description="Pink flesh",
+                        price_per_kg=17.0, category_id=fresh.id),
+                Product(name="Smoked Haddock", slug="smoked-haddock", description="Pairs well with salmon",
+                        price_per_kg=15.0, category_id=fresh.id),
+                Product(name="Dried Anchovy", slug="dried-anchovy", description="Sun dried",
+                        price_per_kg=12.0, category_id=dried.id),
+                Product(name="Hidden Salmon", slug="hidden-salmon", price_per_kg=9.0,
+                        category_id=fresh.id, is_active=False),
+            ]
+        )
+        session.commit()
+
+
+def _slugs(res):
+    assert res.status_code == 200
+    return [item["slug"] for item in res.json()["items"]]
+
+
+def test_search_ranks_prefix_and_typo_matches(client):
+    _seed_catalog()
+
+    res = client.get("/api/products/search", params={"q": "salm"})
+    # Name matches rank above a description mention; inactive products never show
+    assert _slugs(res)[2] == "smoked-haddock"
+    assert set(_slugs(res)[:2]) == {"atlantic-salmon", "salmon-trout"}
+    assert res.json()["total"] == 3
+
+    assert _slugs(client.get("/api/products/search", params={"q": "salmn trou"})) == ["salmon-trout"]
+    # Terms may match across the product and its category
+    assert _slugs(client.get("/api/products/search", params={"q": "seafood anchov"})) == ["dried-anchovy"]
+    assert _slugs(client.get("/api/products/search", params={"q": "lobster"})) == []
+
+
+def test_search_paginates(client):
+    _seed_catalog()
+
+    first = client.get("/api/products/search", params={"q": "salmon", "page_size": 2}).json()
+    second = client.get("/api/products/search", params={"q": "salmon", "page": 2, "page_size": 2}).json()
+    beyond = client.get("/api/products/search", params={"q": "salmon", "page": 5, "page_size": 2}).json()
+
+    assert (first["total"], first["total_pages"], len(first["items"])) == (3, 2, 2)
+    assert [item["slug"] for item in second["items"]] == ["smoked-haddock"]
+    assert beyond["items"] == [] and beyond["total"] == 3
+    assert client.get("/api/products/search", params={"q": "s"}).status_code == 422
+
+
+def test_in_memory_index_matches_database_rules():
+    category = CategoryOut(id=uuid.uuid4(), name="Fresh Fish", slug="fresh-fish", description=None, is_active=True)
+
+    def product(name, description=None):
+        return ProductOut(
+            id=uuid.uuid4(), name=name, slug=name.lower().replace(" ", "-"), description=description,
+            price_per_kg=10.0, image_url=None, stock_kg=5.0, is_dry=False, is_active=True, category=category,
+        )
+
+    index = SearchIndex(
+        [product("Atlantic Salmon"), product("Salmon Trout"), product("Haddock", "goes well with salmon"),
+         product("King Prawns")]
+    )
+
+    total, items = index.search("salm", limit=10)
+    assert total == 3
+    assert items[-1].name == "Haddock"
+    assert [p.name for p in index.search("salmn trou", limit=10)[1]] == ["Salmon Trout"]
+    assert [p.name for p in index.search("fresh prawn", limit=10)[1]] == ["King Prawns"]
+    assert index.search("salmon", limit=1, offset=1)[0] == 3
+    assert index.search("zzz", limit=10) == (0, [])
+    assert index.corrections("prwans") == ["prawns"]
+    assert index.corrections("pra") == []
@@ -0,0 +1,98 @@
+import asyncio
+from uuid import uuid4
+
+import pytest
+from fastapi import Request
+
+from app import database
+from app.database import SessionLocal
+from app.models import Category, Product
+
+
+@pytest.fixture()
+def replica_calls(monkeypatch):
+    calls = []
+
+    def replica_session():
+        calls.append(1)
+        return database.AsyncSessionLocal()
+
+    monkeypatch.setattr(database, "ReadSessionLocal", replica_session)
+    database.recent_writers.clear()
+    return calls
+
+
+def _customer_headers(client) -> dict[str, str]:
+    payload = {
+        "name": "Replica Tester",
+        "email": "replica@example.com",
+        "password": "supersecret",
+        "phone": "07000000000",
+        "address_line1": "1 Dock Street",
+        "city": "Edinburgh",
+        "postcode": "EH6 6AA",
+    }
+    assert client.post("/api/auth/register", json=payload).status_code == 200
+    res = client.post(
+        "/api/auth/login",
+        data={"username": payload["email"], "password": payload["password"]},
+    )
+    assert res.status_code == 200
+    return {"Authorization": f"Bearer {res.json()['access_token']}"}
+
+
+def _create_product() -> str:
+    with SessionLocal() as session:
+        category = Category(name=f"Replica {uuid4()}", slug=f"replica-{uuid4()}")
+        product = Product(
+            name="Replica Mackerel",
+            slug=f"mackerel-{uuid4()}",
+            price_per_kg=9.0,
+            stock_kg=10,
+            category=category,
+        )
+        session.add_all([category, product])
+        session.commit()
+        return str(product.id)
+
+
+def test_read_db_uses_replica_unless_primary_requested(replica_calls):
+    async def open_read_session(headers):
+        request = Request({"type": "http", "headers": headers})
+        async for _ in database.get_read_db(request):
+            pass
+
+    asyncio.run(open_read_session([]))
+    assert len(replica_calls) == 1
+
+    asyncio.run(open_read_session([(b"x-read-primary", b"1")]))
+    assert len(replica_calls) == 1
+
+
+def test_orders_are_read_from_primary_right_after_checkout(client, replica_calls):
+    headers = _customer_headers(client)
+    product_id = _create_product()
+
+    assert client.get("/api/orders/my", headers=headers).status_code == 200
+    assert len(replica_calls) == 1
+
+    res = client.post(
+        "/api/orders/",
+        json={
+            "items": [{"product_id": product_id, "qty_kg": 1}],
+            "address_line": "1 Dock Street",
+            "postcode": "EH6 6AA",
+            "delivery_slot": "Evening",
+        },
+        headers=headers,
+    )
+    assert res.status_code == 200
+
+    orders = client.get("/api/orders/my", headers=headers)
+    assert orders.status_code == 200
+    assert [order["id"] for order in orders.json()] == [res.json()["id"]]
+    assert len(replica_calls) == 1
+
+    database.recent_writers.clear()
+    assert client.get("/api/orders/my", headers=headers).status_code == 200
+    assert len(replica_calls) == 2
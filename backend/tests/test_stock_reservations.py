@@ -0,0 +1,189 @@
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from app.auth import hash_password
+from app.catalog import catalog_cache
+from app.database import SessionLocal
+from app.maintenance import main as maintenance_cli
+from app.models import Category, Product, RoleEnum, StockReservation, User
+
+
+def _customer_headers(client, name: str) -> dict[str, str]:
+    email = f"{name}@example.com"
+    payload = {
+        "name": name.title(),
+        "email": email,
+        "password": "supersecret",
+        "phone": "07000000000",
+        "address_line1": "12 Harbour View",
+        "city": "Edinburgh",
+        "postcode": "EH6 7AA",
+    }
+    res = client.post("/api/auth/register", json=payload)
+    assert res.status_code == 200
+    res = client.post("/api/auth/login", data={"username": email, "password": "supersecret"})
+    assert res.status_code == 200
+    return {"Authorization": f"Bearer {res.json()['access_token']}"}
+
+
+def _create_product(stock_kg: float = 25) -> str:
+    with SessionLocal() as session:
+        category = Category(name=f"Whitefish {uuid4()}", slug=f"whitefish-{uuid4()}")
+        product = Product(
+            name="Line-caught Hake", slug=f"hake-{uuid4()}", price_per_kg=16.0, stock_kg=stock_kg, category=category
+        )
+        session.add_all([category, product])
+        session.commit()
+        return str(product.id)
+
+
+def _stock(product_id: str) -> tuple[float, float]:
+    with SessionLocal() as session:
+        product = session.get(Product, product_id)
+        return product.stock_kg, product.reserved_kg
+
+
+def _catalog_available(client, product_id: str) -> float:
+    return client.get("/api/products/availability").json()[product_id]
+
+
+def _order(client, headers, product_id: str, qty: float):
+    body = {
+        "items": [{"product_id": product_id, "qty_kg": qty}],
+        "address_line": "12 Harbour View",
+        "postcode": "EH6 7AA",
+        "delivery_slot": "Evening",
+    }
+    return client.post("/api/orders/", json=body, headers=headers)
+
+
+def test_held_stock_is_kept_for_the_cart_until_checkout(client):
+    alice = _customer_headers(client, "alice")
+    bob = _customer_headers(client, "bob")
+    product_id = _create_product()
+
+    res = client.put("/api/reservations/", json={"items": [{"product_id": product_id, "qty_kg": 20}]}, headers=alice)
+    assert res.status_code == 200
+    [held] = res.json()
+    assert (held["qty_kg"], held["available_kg"]) == (20, 5)
+    assert _stock(product_id) == (25, 20)
+    assert _catalog_available(client, product_id) == 5
+
+    res = client.put("/api/reservations/", json={"items": [{"product_id": product_id, "qty_kg": 10}]}, headers=bob)
+    assert res.status_code == 400
+    assert res.json()["detail"] == "Insufficient stock for Line-caught Hake"
+    assert client.get("/api/reservations/", headers=bob).json() == []
+    assert _order(client, bob, product_id, 10).status_code == 400
+    assert _order(client, bob, product_id, 5).status_code == 200
+
+    # Alice's hold is hers even though nothing else is left
+    res = _order(client, alice, product_id, 20)
+    assert res.status_code == 200
+    assert _stock(product_id) == (0, 0)
+    assert client.get("/api/reservations/", headers=alice).json() == []
+
+    # Shrinking and releasing a hold hands the stock back
+    other_id = _create_product(stock_kg=10)
+    client.put("/api/reservations/", json={"items": [{"product_id": other_id, "qty_kg": 8}]}, headers=bob)
+    client.put("/api/reservations/", json={"items": [{"product_id": other_id, "qty_kg": 3}]}, headers=bob)
+    assert _stock(other_id) == (10, 3)
+    assert client.delete("/api/reservations/", headers=bob).status_code == 200
+    assert _stock(other_id) == (10, 0)
+
+
+def test_expired_holds_are_released_by_the_sweeper(client):
+    alice = _customer_headers(client, "alice")
+    product_id = _create_product(stock_kg=12)
+    items = [{"product_id": product_id, "qty_kg": 2}, {"product_id": product_id, "qty_kg": 6}]
+    assert client.put("/api/reservations/", json={"items": items}, headers=alice).status_code == 200
+    assert _stock(product_id) == (12, 8)
+
+    assert maintenance_cli(["sweep"]) == 0
+    assert _stock(product_id) == (12, 8)
+
+    with SessionLocal() as session:
+        session.query(StockReservation).update({"expires_at": datetime.utcnow() - timedelta(seconds=1)})
+        session.commit()
+    assert client.get("/api/reservations/", headers=alice).json() == []
+
+    assert maintenance_cli(["sweep"]) == 0
+    assert _stock(product_id) == (12, 0)
+    assert _catalog_available(client, product_id) == 12
+    with SessionLocal() as session:
+        assert session.query(StockReservation).count() == 0
+
+
+def test_cart_changes_leave_the_catalog_snapshot_alone(client):
+    alice = _customer_headers(client, "alice")
+    product_id = _create_product(stock_kg=10)
+    slug = next(product["slug"] for product in client.get("/api/products/").json() if product["id"] == product_id)
+    rebuilds = catalog_cache.rebuilds
+    etag = client.get("/api/products/").headers["etag"]
+
+    client.put("/api/reservations/", json={"items": [{"product_id": product_id, "qty_kg": 4}]}, headers=alice)
+    assert _catalog_available(client, product_id) == 6
+    res = client.get("/api/products/browse", params={"in_stock": "true"})
+    assert [item["id"] for item in res.json()["items"]] == [product_id]
+
+    client.put("/api/reservations/", json={"items": [{"product_id": product_id, "qty_kg": 10}]}, headers=alice)
+    assert _catalog_available(client, product_id) == 0
+    assert client.get("/api/products/browse", params={"in_stock": "true"}).json()["items"] == []
+    assert _order(client, alice, product_id, 10).status_code == 200
+    assert _catalog_available(client, product_id) == 0
+
+    # Holds and checkouts only refresh the stock levels
+    assert client.get("/api/products/", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(f"/api/products/{slug}").status_code == 200
+    assert catalog_cache.rebuilds == rebuilds
+
+    availability = client.get("/api/products/availability")
+    assert availability.headers["cache-control"] == "no-cache"
+    res = client.get("/api/products/availability", headers={"If-None-Match": availability.headers["etag"]})
+    assert res.status_code == 304
+
+
+def _admin_headers(client) -> dict[str, str]:
+    with SessionLocal() as session:
+        session.add(
+            User(
+                name="Stock Admin",
+                email="stock-admin@example.com",
+                password_hash=hash_password("supersecret"),
+                role=RoleEnum.admin,
+            )
+        )
+        session.commit()
+    res = client.post("/api/auth/login", data={"username": "stock-admin@example.com", "password": "supersecret"})
+    return {"Authorization": f"Bearer {res.json()['access_token']}"}
+
+
+def test_admin_cannot_set_stock_below_held_kilos(client):
+    admin = _admin_headers(client)
+    alice = _customer_headers(client, "alice")
+    product_id = _create_product(stock_kg=10)
+    other_id = _create_product(stock_kg=10)
+    client.put("/api/reservations/", json={"items": [{"product_id": product_id, "qty_kg": 6}]}, headers=alice)
+    detail = "Stock for Line-caught Hake cannot go below the 6 kg held for customers' carts"
+
+    res = client.patch(f"/api/admin/products/{product_id}", json={"stock_kg": 5, "price_per_kg": 1}, headers=admin)
+    assert (res.status_code, res.json()["detail"]) == (400, detail)
+    assert client.patch(f"/api/admin/products/{product_id}", json={"stock_kg": 6}, headers=admin).status_code == 200
+    assert _stock(product_id) == (6, 6)
+
+    # One product short rejects the whole batch
+    items = [{"id": other_id, "stock_kg": 1}, {"id": product_id, "stock_kg": 4}]
+    res = client.patch("/api/admin/products:batch", json={"items": items}, headers=admin)
+    assert (res.status_code, res.json()["detail"]) == (400, detail)
+    assert _stock(other_id) == (10, 0)
+
+    with SessionLocal() as session:
+        slug = session.get(Product, product_id).slug
+    res = client.post(
+        "/api/admin/products/import",
+        content=f"slug,stock_kg\n{slug},2\n",
+        headers={**admin, "Content-Type": "text/csv"},
+    )
+    assert res.status_code == 422
+    assert res.json()["detail"] == [{"line": 2, "msg": "stock_kg: below the kilos held for customers' carts"}]
+    assert _stock(product_id) == (6, 6)
+    assert _catalog_available(client, product_id) == 0
@@ -1,7 +1,9 @@
+from datetime import datetime, timedelta
 from uuid import uuid4
 
 from app.database import SessionLocal
-from app.models import Category, Product
+from app.maintenance import main as maintenance_cli
+from app.models import Category, IdempotencyKey, Order, Product
 
 
 def _create_customer(client):
@@ -99,3 +101,122 @@ def test_user_can_view_and_cancel_orders(client):
     second_cancel = client.post(f"/api/orders/{order_id}/cancel", headers=headers)
     assert second_cancel.status_code == 200
     assert second_cancel.json()["status"] == "cancelled"
+
+
+def test_order_takes_stock_for_all_lines_or_none(client):
+    email, password = _create_customer(client)
+    headers = _login_headers(client, email, password)
+    product_id, product_name, price_per_kg = _create_product()
+    other_id, _, _ = _create_product()
+
+    def order(*lines):
+        items = [{"product_id": pid, "qty_kg": qty} for pid, qty in lines]
+        body = {"items": items, "address_line": "12 Harbour View", "postcode": "EH6 7AA", "delivery_slot": "Evening"}
+        return client.post("/api/orders/", json=body, headers=headers)
+
+    def stock(pid):
+        with SessionLocal() as session:
+            return session.get(Product, pid).stock_kg
+
+    first = order((product_id, 15), (other_id, 5))
+    assert first.status_code == 200
+    assert len(first.json()["items"]) == 2
+    assert (stock(product_id), stock(other_id)) == (10, 20)
+
+    # Two lines for the same product count together against its stock
+    res = order((other_id, 1), (product_id, 6), (product_id, 6))
+    assert res.status_code == 400
+    assert res.json()["detail"] == f"Insufficient stock for {product_name}"
+    assert (stock(product_id), stock(other_id)) == (10, 20)
+
+    unknown = str(uuid4())
+    assert order((unknown, 1)).json()["detail"] == f"Invalid product {unknown}"
+
+    res = order((product_id, 4), (product_id, 6))
+    assert res.status_code == 200
+    assert res.json()["total_amount"] == price_per_kg * 10
+    assert stock(product_id) == 0
+
+    client.post(f"/api/orders/{first.json()['id']}/cancel", headers=headers)
+    assert (stock(product_id), stock(other_id)) == (15, 25)
+
+
+def test_retries_with_an_idempotency_key_replay_the_first_response(client):
+    email, password = _create_customer(client)
+    headers = _login_headers(client, email, password)
+    product_id, _, _ = _create_product()
+    body = {
+        "items": [{"product_id": product_id, "qty_kg": 3}],
+        "address_line": "12 Harbour View",
+        "postcode": "EH6 7AA",
+        "delivery_slot": "Evening",
+    }
+
+    def stock():
+        with SessionLocal() as session:
+            return session.get(Product, product_id).stock_kg
+
+    keyed = {**headers, "Idempotency-Key": "checkout-1"}
+    first = client.post("/api/orders/", json=body, headers=keyed)
+    assert first.status_code == 200
+    assert "Idempotent-Replayed" not in first.headers
+    retry = client.post("/api/orders/", json=body, headers=keyed)
+    assert retry.status_code == 200
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+    assert stock() == 22
+    assert len(client.get("/api/orders/my", headers=headers).json()) == 1
+
+    # The same key with another basket is a client bug, not a retry
+    other = {**body, "items": [{"product_id": product_id, "qty_kg": 1}]}
+    assert client.post("/api/orders/", json=other, headers=keyed).status_code == 422
+    assert stock() == 22
+
+    # Rejected requests are not stored, so the retry is checked again
+    too_much = {**body, "items": [{"product_id": product_id, "qty_kg": 30}]}
+    assert client.post("/api/orders/", json=too_much, headers={**headers, "Idempotency-Key": "big"}).status_code == 400
+    with SessionLocal() as session:
+        session.query(Product).filter(Product.id == product_id).update({"stock_kg": 40})
+        session.commit()
+    assert client.post("/api/orders/", json=too_much, headers={**headers, "Idempotency-Key": "big"}).status_code == 200
+    assert stock() == 10
+
+    order_id = first.json()["id"]
+    cancel_headers = {**headers, "Idempotency-Key": "cancel-1"}
+    cancelled = client.post(f"/api/orders/{order_id}/cancel", headers=cancel_headers)
+    assert cancelled.json()["status"] == "cancelled"
+    again = client.post(f"/api/orders/{order_id}/cancel", headers=cancel_headers)
+    assert again.headers["Idempotent-Replayed"] == "true"
+    assert again.json() == cancelled.json()
+    assert stock() == 13
+
+
+def test_expired_idempotency_keys_are_swept(client):
+    email, password = _create_customer(client)
+    headers = {**_login_headers(client, email, password), "Idempotency-Key": "checkout-1"}
+    product_id, _, _ = _create_product()
+    body = {
+        "items": [{"product_id": product_id, "qty_kg": 1}],
+        "address_line": "1 Shore",
+        "postcode": "EH6 6QW",
+        "delivery_slot": "Morning",
+    }
+
+    assert client.post("/api/orders/", json=body, headers=headers).status_code == 200
+    assert maintenance_cli(["sweep"]) == 0
+    with SessionLocal() as session:
+        assert session.query(IdempotencyKey).count() == 1
+        session.query(IdempotencyKey).update({"expires_at": datetime.utcnow() - timedelta(seconds=1)})
+        session.commit()
+
+    # An expired key is free again, even before the sweep gets to it
+    res = client.post("/api/orders/", json=body, headers=headers)
+    assert "Idempotent-Replayed" not in res.headers
+    with SessionLocal() as session:
+        assert session.query(Order).count() == 2
+        session.query(IdempotencyKey).update({"expires_at": datetime.utcnow() - timedelta(seconds=1)})
+        session.commit()
+
+    assert maintenance_cli(["sweep"]) == 0
+    with SessionLocal() as session:
+        assert session.query(IdempotencyKey).count() == 0
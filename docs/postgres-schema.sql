@@ -1,5 +1,6 @@
 -- Tarel local PostgreSQL schema
 -- Run with: psql -d Tarel -f docs/postgres-schema.sql
+-- Reference only: the backend schema is managed by `python -m app.migrations upgrade`.
 
 BEGIN;
 
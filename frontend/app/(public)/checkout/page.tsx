@@ -1,7 +1,7 @@
 'use client'
 
 import Link from 'next/link'
-import { FormEvent, useCallback, useEffect, useMemo, useState } from 'react'
+import { FormEvent, useCallback, useEffect, useMemo, useRef, useState } from 'react'
 
 import { buildApiUrl } from '@/lib/api'
 import { getToken } from '@/lib/auth'
@@ -61,6 +61,8 @@ export default function Checkout() {
   const [status, setStatus] = useState<{ type: 'success' | 'error'; message: string } | null>(null)
   const [couponCode, setCouponCode] = useState('')
   const [couponMessage, setCouponMessage] = useState<string | null>(null)
+  // Reused while the basket is unchanged, so retrying after a dropped connection cannot order twice
+  const checkoutKey = useRef<{ body: string; key: string } | null>(null)
 
   const persistAddressBook = useCallback((entries: AddressOption[]) => {
     if (typeof window === 'undefined') return
@@ -265,19 +267,25 @@ export default function Checkout() {
     setStatus(null)
     setPlacing(true)
 
+    const body = JSON.stringify({
+      items: items.map((line) => ({ product_id: line.product.id, qty_kg: line.qty_kg })),
+      address_line: trimmedAddress,
+      postcode: trimmedPostcode,
+      delivery_slot: slot,
+    })
+    if (checkoutKey.current?.body !== body) {
+      checkoutKey.current = { body, key: crypto.randomUUID() }
+    }
+
     try {
       const res = await fetch(buildApiUrl('/orders/'), {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
           Authorization: `Bearer ${token}`,
+          'Idempotency-Key': checkoutKey.current.key,
         },
-        body: JSON.stringify({
-          items: items.map((line) => ({ product_id: line.product.id, qty_kg: line.qty_kg })),
-          address_line: trimmedAddress,
-          postcode: trimmedPostcode,
-          delivery_slot: slot,
-        }),
+        body,
       })
 
       if (!res.ok) {
@@ -289,6 +297,7 @@ export default function Checkout() {
         return
       }
 
+      checkoutKey.current = null
       clear()
       setStatus({
         type: 'success',
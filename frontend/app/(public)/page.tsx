@@ -7,6 +7,7 @@ import useSWR from 'swr'
 
 import { NextDeliveryCard } from '@/components/NextDeliveryCard'
 import { buildApiUrl } from '@/lib/api'
+import { availableKg, useAvailability } from '@/lib/availability'
 import type { Category, NextDeliveryInfo, Product } from '@/lib/types'
 import { useAuth } from '@/providers/AuthProvider'
 import logoImage from '@/images/logo.png'
@@ -47,12 +48,14 @@ export default function Home() {
     refreshInterval: 15 * 60 * 1000,
   })
 
+  const availability = useAvailability()
+
   const featuredProducts = useMemo(() => {
     if (!products || !products.length) return []
     return [...products]
-      .sort((a, b) => b.stock_kg - a.stock_kg)
+      .sort((a, b) => availableKg(availability, b) - availableKg(availability, a))
       .slice(0, 3)
-  }, [products])
+  }, [products, availability])
 
   const categoryShowcase = useMemo(() => {
     if (!products || !products.length) return []
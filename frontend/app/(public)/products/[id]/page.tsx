@@ -20,7 +20,15 @@ export default function ProductPage({ params }: { params: { id: string } }) {
   if (!product) return <div>Loading...</div>
   return (
     <div className="grid md:grid-cols-2 gap-6">
-      <img src={buildMediaUrl(product.image_url)} className="rounded-2xl" alt={product.name} />
+      <picture>
+        {product.image_variants?.detail?.avif && (
+          <source srcSet={buildMediaUrl(product.image_variants.detail.avif)} type="image/avif" />
+        )}
+        {product.image_variants?.detail?.webp && (
+          <source srcSet={buildMediaUrl(product.image_variants.detail.webp)} type="image/webp" />
+        )}
+        <img src={buildMediaUrl(product.image_url)} className="rounded-2xl" alt={product.name} />
+      </picture>
       <div className="space-y-3 card">
         <h1 className="text-2xl font-bold">{product.name}</h1>
         <p className="text-gray-600">{product.description || '—'}</p>
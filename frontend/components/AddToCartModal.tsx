@@ -4,6 +4,7 @@ import { useState, useEffect } from 'react'
 import type { Product } from '@/lib/types'
 import { useToast } from '@/providers/ToastProvider'
 import { buildApiUrl } from '@/lib/api'
+import { availableKg, useAvailability } from '@/lib/availability'
 
 export type CutCleanOption = string
 
@@ -40,6 +41,7 @@ export default function AddToCartModal({
   const [customNote, setCustomNote] = useState<string>('')
   const [cutCleanOptions, setCutCleanOptions] = useState<CutCleanOptionType[]>([])
   const [loadingOptions, setLoadingOptions] = useState(true)
+  const maxKg = availableKg(useAvailability(), product)
 
   // Fetch cut & clean options from API
   useEffect(() => {
@@ -193,14 +195,14 @@ export default function AddToCartModal({
                 value={quantity}
                 onChange={(e) => handleQuantityChange(e.target.value)}
                 min="0.5"
-                max={product.stock_kg}
+                max={maxKg}
                 step="0.5"
                 className="w-24 rounded-lg border-2 border-brand-olive bg-white px-4 py-2 text-center text-lg font-semibold text-brand-dark focus:border-brand-dark focus:outline-none focus:ring-2 focus:ring-brand-olive/20 [appearance:textfield] [&::-webkit-outer-spin-button]:appearance-none [&::-webkit-inner-spin-button]:appearance-none"
               />
               <button
-                onClick={() => setQuantity(Math.min(product.stock_kg, quantity + 0.5))}
+                onClick={() => setQuantity(Math.min(maxKg, quantity + 0.5))}
                 className="flex h-10 w-10 items-center justify-center rounded-full bg-brand-olive text-white transition hover:bg-brand-dark disabled:opacity-50 disabled:cursor-not-allowed"
-                disabled={quantity >= product.stock_kg}
+                disabled={quantity >= maxKg}
               >
                 +
               </button>
@@ -17,6 +17,8 @@ export default function ProductCard({ product }: { product: Product }) {
   const { add } = useCart()
   const [isModalOpen, setIsModalOpen] = useState(false)
   const badge = product.is_dry ? badgeCopy.dry : badgeCopy.fresh
+  // Resized copy of the upload; the original stays as the fallback
+  const card = product.image_variants?.card
 
   const handleAddToCart = (product: Product, options: CartItemWithOptions) => {
     const { qty_kg, cut_clean_option, instructions, custom_note } = options
@@ -31,11 +33,16 @@ export default function ProductCard({ product }: { product: Product }) {
     <>
       <div className="group flex h-full flex-col overflow-hidden rounded-3xl border border-brand-dark/10 bg-white shadow-md transition hover:-translate-y-1 hover:shadow-2xl">
         <div className="relative">
-        <img
-          src={buildMediaUrl(product.image_url)}
-          alt={product.name}
-          className="h-56 w-full object-cover transition duration-500 group-hover:scale-105"
-        />
+        <picture>
+          {card?.avif && <source srcSet={buildMediaUrl(card.avif)} type="image/avif" />}
+          {card?.webp && <source srcSet={buildMediaUrl(card.webp)} type="image/webp" />}
+          <img
+            src={buildMediaUrl(product.image_url)}
+            alt={product.name}
+            loading="lazy"
+            className="h-56 w-full object-cover transition duration-500 group-hover:scale-105"
+          />
+        </picture>
         <div className="absolute left-4 top-4 inline-flex items-center gap-2 rounded-full bg-white/90 px-3 py-1 text-xs font-semibold uppercase tracking-widest text-brand-dark">
           <span className="inline-block h-2 w-2 rounded-full bg-brand-olive" />
           {badge}
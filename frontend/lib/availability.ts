@@ -0,0 +1,21 @@
+import useSWR from 'swr'
+
+import { buildApiUrl } from '@/lib/api'
+import type { Product } from '@/lib/types'
+
+// Product id -> kilos not held for someone's cart. It changes with every cart,
+// so it is served apart from /products/ and revalidated often.
+export type Availability = Record<string, number>
+
+const fetcher = (path: string) => fetch(buildApiUrl(path)).then((res) => res.json())
+
+export function useAvailability() {
+  const { data } = useSWR<Availability>('/products/availability', fetcher, {
+    refreshInterval: 30 * 1000,
+  })
+  return data
+}
+
+export function availableKg(availability: Availability | undefined, product: Product) {
+  return availability?.[product.id] ?? product.stock_kg
+}
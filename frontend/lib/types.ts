@@ -5,12 +5,19 @@ export type Category = {
   description?: string | null
   is_active?: boolean
 }
+export type ImageVariant = {
+  width: number
+  height: number
+  avif?: string
+  webp?: string
+}
 export type Product = {
   id: string
   name: string
   slug: string
   price_per_kg: number
   image_url?: string
+  image_variants?: Record<'thumbnail' | 'card' | 'detail', ImageVariant> | null
   stock_kg: number
   is_dry: boolean
   description?: string | null
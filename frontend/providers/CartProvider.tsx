@@ -3,6 +3,8 @@
 import { createContext, useCallback, useContext, useEffect, useMemo, useState } from 'react'
 
 import type { Product, CartItemOptions } from '@/lib/types'
+import { buildApiUrl } from '@/lib/api'
+import { getToken } from '@/lib/auth'
 import { loadCart, persistCart, type CartLine as StoredLine } from '@/lib/cart'
 
 type CartLine = { 
@@ -37,6 +39,22 @@ export function CartProvider({ children }: { children: React.ReactNode }) {
     persistCart(items as StoredLine[])
   }, [items])
 
+  // Signed-in carts hold their stock on the server until checkout (or until the hold expires)
+  useEffect(() => {
+    const token = getToken()
+    if (!token) return
+    const timer = setTimeout(() => {
+      fetch(buildApiUrl('/reservations/'), {
+        method: 'PUT',
+        headers: { 'Content-Type': 'application/json', Authorization: `Bearer ${token}` },
+        body: JSON.stringify({
+          items: items.map((line) => ({ product_id: line.product.id, qty_kg: line.qty_kg })),
+        }),
+      }).catch((error) => console.warn('Could not hold cart stock', error))
+    }, 500)
+    return () => clearTimeout(timer)
+  }, [items])
+
   const add = useCallback((product: Product, qty: number, options?: CartItemOptions) => {
     if (qty <= 0) return
     setItems((prev) => {